@@ -8,15 +8,30 @@ FPS 3D Unity Project One-Click Generator
 
 Usage:
   python Tools/build_fps_project.py --target . --lines 25000
+
+As a module (no disk access with MemoryBackend):
+  import build_fps_project as g
+  mem = g.MemoryBackend()
+  stats = g.generate(lines=25000, backend=mem)    # mem.files: {"Assets/Scripts/...": bytes}
+
+Several variants in one pass (identical generated code is hard-linked between the folders):
+  python Tools/build_fps_project.py --fan-out full:out/full:25000 lite:out/lite:10000
 """
 import os
 import io
 import sys
+import json
 import argparse
+import hashlib
+import runpy
+import subprocess
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from textwrap import dedent
 
 BASE_FILES = {
-    "Assets/Scripts/Core/Bootstrap.cs": r'''
+    "Assets/Scripts/Bootstrap.cs": r'''
 using UnityEngine;
 
 public static class Bootstrap
@@ -33,7 +48,7 @@ public static class Bootstrap
 }
 ''',
 
-    "Assets/Scripts/Core/Game.cs": r'''
+    "Assets/Scripts/Game.cs": r'''
 using UnityEngine;
 
 // Main entry point: loads configs, builds level, ensures player and enemies exist.
@@ -41,8 +56,17 @@ public class Game : MonoBehaviour
 {
     void Awake()
     {
+        PerfLog.Start();
         ConfigIO.EnsureDefaultConfigs();
-        Level.LevelBuilder.BuildFromJson(ConfigIO.ReadLevelJsonPath());
+        // Endless arena when a chunk server is given (-chunkServer host:port), otherwise the level file
+        var chunkServer = Level.ChunkStreamClient.ServerAddress();
+        if (chunkServer == null || !Level.ChunkStreamClient.TryStart(chunkServer))
+        {
+            Level.LevelBuilder.BuildFromJson(ConfigIO.ReadLevelJsonPath());
+#if UNITY_EDITOR || DEVELOPMENT_BUILD
+            gameObject.AddComponent<Level.LevelHotReload>();
+#endif
+        }
         Player.PlayerFactory.EnsurePlayerAtSpawn();
         AI.EnemyFactory.SpawnInitialEnemies(5);
         Cursor.lockState = CursorLockMode.Locked;
@@ -66,18 +90,36 @@ public class Health : MonoBehaviour
     public float Current { get; private set; }
 
     public System.Action<float> OnDamaged;
+    public System.Action<float> OnChanged; // any change to Current (damage, heal, reset)
     public System.Action OnDied;
 
+    private float pendingDamage;
+    private bool queued;
+
     void Awake()
     {
         Current = maxHealth;
     }
 
+    // Queued: DamageQueue applies the frame's total for this target once, late in the frame
     public void Damage(float amount)
     {
         if (Current <= 0f) return;
-        Current -= Mathf.Max(0f, amount);
+        pendingDamage += Mathf.Max(0f, amount);
+        if (queued) return;
+        queued = true;
+        DamageQueue.Add(this);
+    }
+
+    internal void ApplyQueuedDamage()
+    {
+        float amount = pendingDamage;
+        pendingDamage = 0f;
+        queued = false;
+        if (Current <= 0f) return;
+        Current -= amount;
         OnDamaged?.Invoke(Current);
+        OnChanged?.Invoke(Current);
         if (Current <= 0f)
         {
             OnDied?.Invoke();
@@ -89,13 +131,198 @@ public class Health : MonoBehaviour
     {
         if (Current <= 0f) return;
         Current = Mathf.Min(maxHealth, Current + Mathf.Max(0f, amount));
+        OnChanged?.Invoke(Current);
     }
 
     public void SetMaxHealth(float value, bool heal = true)
     {
         maxHealth = Mathf.Max(1f, value);
-        if (heal) Current = maxHealth;
+        if (heal)
+        {
+            Current = maxHealth;
+            OnChanged?.Invoke(Current);
+        }
+    }
+}
+''',
+
+    "Assets/Scripts/Core/DamageQueue.cs": r'''
+using UnityEngine;
+
+// Deferred damage. Health.Damage only records the hit; once per frame, after every Update and after ShotBatch
+// has resolved the frame's rays, the queue applies each target's summed damage in one pass, so
+// OnDamaged/OnChanged/OnDied fire at most once per target per frame and deaths are destroyed in one place.
+// Targets go into a preallocated array (doubled if it ever fills); each Health accumulates its own pending
+// amount, so merging several hits on one target needs no lookup.
+[DefaultExecutionOrder(2000)]
+public class DamageQueue : MonoBehaviour
+{
+    public const int InitialCapacity = 256;
+
+    static DamageQueue instance;
+    static Health[] queued = new Health[InitialCapacity];
+    static int count;
+
+    public static int Pending => count;
+
+    // Called by Health the first time it is damaged in a frame
+    internal static void Add(Health target)
+    {
+        if (instance == null)
+        {
+            var go = new GameObject("DamageQueue");
+            DontDestroyOnLoad(go);
+            instance = go.AddComponent<DamageQueue>();
+        }
+        if (count == queued.Length) System.Array.Resize(ref queued, count * 2);
+        queued[count++] = target;
+    }
+
+    // Applies everything queued before the flush began. Damage dealt from the callbacks (OnDied splash,
+    // thorns etc.) queues its targets again and is applied by the next flush, so a target's callbacks
+    // still fire at most once per flush.
+    public static void Flush()
+    {
+        int n = count;
+        for (int i = 0; i < n; i++)
+        {
+            var h = queued[i];
+            queued[i] = null;
+            if (h != null) h.ApplyQueuedDamage();
+        }
+        int added = count - n;
+        System.Array.Copy(queued, n, queued, 0, added);
+        System.Array.Clear(queued, added, count - added);
+        count = added;
+    }
+
+    void LateUpdate()
+    {
+        Flush();
+    }
+
+    void OnDestroy()
+    {
+        if (instance == this) instance = null;
+    }
+}
+''',
+
+    "Assets/Scripts/Core/PerfLog.cs": r'''
+using System.Diagnostics;
+using System.IO;
+using UnityEngine;
+#if FPS_PERF
+using Unity.Profiling;
+#endif
+
+// Frame-time instrumentation. Begin/End calls compile away unless FPS_PERF is defined
+// (the generator's --instrument flag writes it to the csc.rsp files). When enabled, each section is a
+// ProfilerMarker for the Unity Profiler and a Stopwatch accumulator; once per frame PerfRecorder appends a
+// fixed-size record to <persistentDataPath>/perf/perf_<time>.bin for Tools/perf_analyzer.py.
+// File: "FPSP" u16 version u16 sections, then per section u8 length + ASCII name; per frame (little-endian):
+// u32 frame, f32 frame ms, i32 GC collections (gen 0, cumulative), i64 mono heap bytes, per section f32 ms + u32 calls.
+public static class PerfLog
+{
+    public enum Section { LevelBuild, ChaserAI, HitscanFire, HudGui, Count }
+
+    public const int Version = 1;
+
+#if FPS_PERF
+    static readonly ProfilerMarker[] markers =
+    {
+        new ProfilerMarker("FPS.LevelBuild"),
+        new ProfilerMarker("FPS.ChaserAI"),
+        new ProfilerMarker("FPS.HitscanFire"),
+        new ProfilerMarker("FPS.HudGui"),
+    };
+    static readonly long[] started = new long[(int)Section.Count];
+    static readonly long[] elapsed = new long[(int)Section.Count];
+    static readonly uint[] calls = new uint[(int)Section.Count];
+    static readonly Stopwatch clock = Stopwatch.StartNew();
+#endif
+
+    [Conditional("FPS_PERF")]
+    public static void Begin(Section s)
+    {
+#if FPS_PERF
+        markers[(int)s].Begin();
+        started[(int)s] = clock.ElapsedTicks;
+#endif
+    }
+
+    [Conditional("FPS_PERF")]
+    public static void End(Section s)
+    {
+#if FPS_PERF
+        elapsed[(int)s] += clock.ElapsedTicks - started[(int)s];
+        calls[(int)s]++;
+        markers[(int)s].End();
+#endif
+    }
+
+    // Creates the recorder; a no-op without FPS_PERF
+    [Conditional("FPS_PERF")]
+    public static void Start()
+    {
+#if FPS_PERF
+        if (Object.FindObjectOfType<PerfRecorder>() != null) return;
+        var go = new GameObject("PerfRecorder");
+        Object.DontDestroyOnLoad(go);
+        go.AddComponent<PerfRecorder>();
+#endif
+    }
+
+#if FPS_PERF
+    // Runs before every other script: closes the previous frame's record (so OnGUI work of frame N is in record N)
+    [DefaultExecutionOrder(-32000)]
+    class PerfRecorder : MonoBehaviour
+    {
+        private BinaryWriter writer;
+        private uint frame;
+
+        void Awake()
+        {
+            var dir = Path.Combine(Application.persistentDataPath, "perf");
+            Directory.CreateDirectory(dir);
+            var path = Path.Combine(dir, "perf_" + System.DateTime.Now.ToString("yyyyMMdd_HHmmss") + ".bin");
+            writer = new BinaryWriter(new FileStream(path, FileMode.Create, FileAccess.Write, FileShare.Read, 64 * 1024));
+            writer.Write((byte)'F'); writer.Write((byte)'P'); writer.Write((byte)'S'); writer.Write((byte)'P');
+            writer.Write((ushort)Version);
+            writer.Write((ushort)Section.Count);
+            for (int i = 0; i < (int)Section.Count; i++)
+            {
+                var name = ((Section)i).ToString();
+                writer.Write((byte)name.Length);
+                for (int c = 0; c < name.Length; c++) writer.Write((byte)name[c]);
+            }
+            UnityEngine.Debug.Log("PerfLog writing " + path);
+        }
+
+        void Update()
+        {
+            if (writer == null) return;
+            double toMs = 1000.0 / Stopwatch.Frequency;
+            writer.Write(frame++);
+            writer.Write(Time.unscaledDeltaTime * 1000f);
+            writer.Write(System.GC.CollectionCount(0));
+            writer.Write(UnityEngine.Profiling.Profiler.GetMonoUsedSizeLong());
+            for (int i = 0; i < (int)Section.Count; i++)
+            {
+                writer.Write((float)(elapsed[i] * toMs));
+                writer.Write(calls[i]);
+                elapsed[i] = 0;
+                calls[i] = 0;
+            }
+        }
+
+        void OnDestroy()
+        {
+            if (writer != null) writer.Dispose();
+            writer = null;
+        }
     }
+#endif
 }
 ''',
 
@@ -142,6 +369,10 @@ public static class ConfigIO
 {
     private const string LevelFile = "level1.json";
     private const string WeaponsFile = "weapons.json";
+    private const string BundleFile = "configs.bundle";
+
+    private static ConfigBundle bundle;
+    private static bool bundleChecked;
 
     public static string ConfigsDir()
     {
@@ -176,6 +407,36 @@ public static class ConfigIO
         return Path.Combine(ConfigsDir(), WeaponsFile);
     }
 
+    // Compiled configs (Tools/config_bundle.py), or null when there is none or any JSON config is newer than it.
+    // Opened once and kept mapped for the session.
+    public static ConfigBundle Bundle()
+    {
+        if (bundleChecked) return bundle;
+        bundleChecked = true;
+        var path = Path.Combine(ConfigsDir(), BundleFile);
+        if (!File.Exists(path)) return null;
+
+        var stamp = File.GetLastWriteTimeUtc(path);
+        foreach (var json in Directory.GetFiles(ConfigsDir(), "*.json"))
+        {
+            if (json.EndsWith(".delta.json")) continue; // hot-reload deltas, never bundled
+            if (File.GetLastWriteTimeUtc(json) > stamp)
+            {
+                Debug.LogWarning($"{BundleFile} is older than {Path.GetFileName(json)}; reading JSON (re-run Tools/config_bundle.py compile).");
+                return null;
+            }
+        }
+        try
+        {
+            bundle = ConfigBundle.Open(path);
+        }
+        catch (System.Exception e)
+        {
+            Debug.LogWarning("Config bundle unreadable, reading JSON. " + e.Message);
+        }
+        return bundle;
+    }
+
     private static string DefaultLevelJson()
     {
         // Simple 12x12 with walls border, player spawn, a few doors/enemies.
@@ -223,16 +484,136 @@ public static class ConfigIO
       ""reloadTime"": 1.7,
       ""range"": 110,
       ""spreadDegrees"": 1.2,
+      ""pellets"": 1,
       ""isHitscan"": true
     }
   ]
 }";
     }
 }
+''',
+
+    "Assets/Scripts/Core/ConfigBundle.cs": r'''
+using System;
+using System.Collections.Generic;
+using System.IO;
+using System.IO.MemoryMappedFiles;
+using System.Text;
+
+// Read-only view of the binary config bundle written by Tools/config_bundle.py (layout documented there).
+// The file is memory-mapped and sections are located through its offset table and read in place,
+// so opening it costs the same whatever the configs contain.
+public sealed class ConfigBundle : IDisposable
+{
+    public const int Version = 1;
+    const int HeaderSize = 16;
+    const int EntrySize = 48;
+    const int NameSize = 32;
+
+    struct Section
+    {
+        public long Offset;
+        public int Length;
+    }
+
+    private readonly MemoryMappedFile file;
+    private readonly MemoryMappedViewAccessor view;
+    private readonly Dictionary<string, Section> sections = new Dictionary<string, Section>();
+
+    ConfigBundle(MemoryMappedFile file, MemoryMappedViewAccessor view)
+    {
+        this.file = file;
+        this.view = view;
+    }
+
+    public static ConfigBundle Open(string path)
+    {
+        long size = new FileInfo(path).Length;
+        if (size < HeaderSize) throw new InvalidDataException("config bundle truncated");
+        var file = MemoryMappedFile.CreateFromFile(path, FileMode.Open, null, 0, MemoryMappedFileAccess.Read);
+        var bundle = new ConfigBundle(file, file.CreateViewAccessor(0, 0, MemoryMappedFileAccess.Read));
+        try
+        {
+            bundle.ReadTable(size);
+        }
+        catch
+        {
+            bundle.Dispose();
+            throw;
+        }
+        return bundle;
+    }
+
+    void ReadTable(long size)
+    {
+        if (view.ReadByte(0) != 'F' || view.ReadByte(1) != 'P' || view.ReadByte(2) != 'S' || view.ReadByte(3) != 'B')
+            throw new InvalidDataException("not a config bundle");
+        int version = view.ReadUInt16(4);
+        if (version != Version) throw new InvalidDataException($"config bundle version {version}, expected {Version}");
+        int count = view.ReadUInt16(6);
+        if (view.ReadUInt32(8) != size || HeaderSize + (long)count * EntrySize > size)
+            throw new InvalidDataException("config bundle truncated");
+
+        var name = new byte[NameSize];
+        for (int i = 0; i < count; i++)
+        {
+            long e = HeaderSize + (long)i * EntrySize;
+            var s = new Section { Offset = view.ReadUInt32(e + 4), Length = (int)view.ReadUInt32(e + 8) };
+            if (s.Offset + s.Length > size) throw new InvalidDataException("config bundle section out of range");
+            view.ReadArray(e + 16, name, 0, NameSize);
+            sections[Key(Ascii(e, 4), Utf8(name))] = s;
+        }
+    }
+
+    // kind is the four-character section tag ("GRID", "WEAP", ...), name the source file without extension
+    public bool TryGetSection(string kind, string name, out long offset, out int length)
+    {
+        Section s;
+        bool found = sections.TryGetValue(Key(kind, name), out s);
+        offset = s.Offset;
+        length = s.Length;
+        return found;
+    }
+
+    public int ReadInt(long pos) => view.ReadInt32(pos);
+    public float ReadFloat(long pos) => view.ReadSingle(pos);
+    public void ReadBytes(long pos, byte[] into, int index, int count) => view.ReadArray(pos, into, index, count);
+    public void ReadInts(long pos, int[] into, int index, int count) => view.ReadArray(pos, into, index, count);
+
+    // Zero-padded UTF-8 field of fixed size
+    public string ReadText(long pos, int size)
+    {
+        var b = new byte[size];
+        view.ReadArray(pos, b, 0, size);
+        return Utf8(b);
+    }
+
+    public void Dispose()
+    {
+        view.Dispose();
+        file.Dispose();
+    }
+
+    static string Key(string kind, string name) => kind + "/" + name;
+
+    string Ascii(long pos, int n)
+    {
+        var c = new char[n];
+        for (int i = 0; i < n; i++) c[i] = (char)view.ReadByte(pos + i);
+        return new string(c);
+    }
+
+    static string Utf8(byte[] b)
+    {
+        int n = Array.IndexOf(b, (byte)0);
+        return Encoding.UTF8.GetString(b, 0, n < 0 ? b.Length : n);
+    }
+}
 ''',
 
     "Assets/Scripts/Level/LevelModels.cs": r'''
 using System;
+using System.Collections.Generic;
 using UnityEngine;
 
 namespace Level
@@ -243,88 +624,1697 @@ namespace Level
         public string type; // wall, floor, door, enemy, player
     }
 
+    [Serializable]
+    public class SpawnPoint
+    {
+        public int x;
+        public int y;
+        public int z; // storey, 0 = ground
+    }
+
+    // Explicit spawn table written by Tools/map_generator.py; optional in older level files
+    [Serializable]
+    public class LevelSpawns
+    {
+        public SpawnPoint[] player;
+        public SpawnPoint[] enemies;
+    }
+
+    // One storey above (or below) the ground grid: run-length encoded cell codes, row-major over width x height,
+    // as pairs [code, count, code, count, ...]. Code 0 (Empty) cells have no geometry.
+    [Serializable]
+    public class LevelFloorData
+    {
+        public int z;
+        public int[] runs;
+    }
+
     [Serializable]
     public class LevelData
     {
         public int width;
         public int height;
-        public LevelCell[] cells;
+        public LevelSpawns spawns;
+        public LevelCell[] cells;      // ground storey (z = 0)
+        public float storeyHeight;     // world units between storeys (default 3)
+        public LevelFloorData[] floors; // optional extra storeys
+    }
+
+    // Cell delta written by Tools/level_diff.py (hashes are LevelGrid.ContentHash before/after)
+    [Serializable]
+    public class LevelDelta
+    {
+        public int width;
+        public int height;
+        public long baseHash;
+        public long resultHash;
+        public int[] indices;
+        public string[] types;
+        public bool hasSpawns;         // JsonUtility always creates spawns; only this says the delta carries them
+        public LevelSpawns spawns;
+    }
+
+    // One byte per cell in LevelGrid.Cells
+    public enum CellType : byte
+    {
+        Empty = 0,
+        Wall = 1,
+        Floor = 2,
+        Door = 3,
+        Enemy = 4,
+        Player = 5
+    }
+
+    // Sparse storey: only the runs are kept, so memory follows the number of runs, not width x height.
+    // Lookups binary-search the run start offsets; LevelBuilder walks the runs directly when building.
+    public class LevelFloor
+    {
+        public int Z;
+        public int[] Runs; // code, count pairs
+        private int[] starts;
+
+        public int RunCount => Runs.Length / 2;
+
+        // Sum of run lengths (must equal Width * Height of the grid)
+        public int CellCount()
+        {
+            int n = 0;
+            for (int i = 1; i < Runs.Length; i += 2) n += Runs[i];
+            return n;
+        }
+
+        public CellType Get(int idx)
+        {
+            if (starts == null)
+            {
+                starts = new int[RunCount];
+                for (int r = 0, at = 0; r < starts.Length; r++) { starts[r] = at; at += Runs[2 * r + 1]; }
+            }
+            int lo = 0, hi = starts.Length - 1;
+            while (lo < hi)
+            {
+                int mid = (lo + hi + 1) >> 1;
+                if (starts[mid] <= idx) lo = mid; else hi = mid - 1;
+            }
+            return (CellType)Runs[2 * lo];
+        }
+
+        public bool SameRuns(LevelFloor other)
+        {
+            if (other == null || other.Z != Z || other.Runs.Length != Runs.Length) return false;
+            for (int i = 0; i < Runs.Length; i++)
+                if (Runs[i] != other.Runs[i]) return false;
+            return true;
+        }
+    }
+
+    // Compact parsed level produced by LevelJsonReader: row-major CellType bytes (idx = y * Width + x)
+    // for the ground storey, plus sparse LevelFloors for any other storeys
+    public class LevelGrid
+    {
+        public int Width;
+        public int Height;
+        public byte[] Cells;
+
+        public float StoreyHeight = 3f;
+        public readonly List<LevelFloor> Floors = new List<LevelFloor>(); // sorted by Z, never Z = 0
+
+        // Spawn table from the level file (empty when the file has none); z = storey
+        public readonly List<Vector3Int> PlayerSpawns = new List<Vector3Int>();
+        public readonly List<Vector3Int> EnemySpawns = new List<Vector3Int>();
+
+        // Baked potentially-visible set (Tools/pvs_bake.py), or null: bit j of row i (MSB first) = cell j visible from cell i
+        public byte[] Pvs;
+        public int PvsRowBytes;
+
+        public CellType Get(int x, int y) => (CellType)Cells[y * Width + x];
+
+        public CellType Get(int x, int y, int z)
+        {
+            if (z == 0) return Get(x, y);
+            var f = Floor(z);
+            return f != null ? f.Get(y * Width + x) : CellType.Empty;
+        }
+
+        public LevelFloor Floor(int z)
+        {
+            for (int i = 0; i < Floors.Count; i++)
+                if (Floors[i].Z == z) return Floors[i];
+            return null;
+        }
+
+        public bool InBounds(int x, int y) => x >= 0 && y >= 0 && x < Width && y < Height;
+
+        public bool SameFloors(LevelGrid other)
+        {
+            if (other.Floors.Count != Floors.Count || other.StoreyHeight != StoreyHeight) return false;
+            for (int i = 0; i < Floors.Count; i++)
+                if (!Floors[i].SameRuns(other.Floors[i])) return false;
+            return true;
+        }
+
+        // FNV-1a over Cells; Tools/level_diff.py computes the same value to tag deltas
+        public uint ContentHash()
+        {
+            uint h = 2166136261;
+            for (int i = 0; i < Cells.Length; i++)
+            {
+                h ^= Cells[i];
+                h *= 16777619;
+            }
+            return h;
+        }
+
+        public static bool IsSolid(CellType t) => t == CellType.Wall || t == CellType.Door;
+
+        // Walkable: has a floor tile and nothing blocking it
+        public static bool IsOpen(CellType t) => t != CellType.Empty && !IsSolid(t);
+
+        // Same mapping as LevelJsonReader: unknown names are plain floor
+        public static CellType TypeFromName(string name)
+        {
+            switch (name)
+            {
+                case "wall": return CellType.Wall;
+                case "door": return CellType.Door;
+                case "enemy": return CellType.Enemy;
+                case "player": return CellType.Player;
+                default: return CellType.Floor;
+            }
+        }
     }
 }
 ''',
 
-    "Assets/Scripts/Level/LevelBuilder.cs": r'''
+    "Assets/Scripts/Level/LevelJsonReader.cs": r'''
+using System;
+using System.Collections.Generic;
 using System.IO;
+using System.IO.Compression;
 using UnityEngine;
 
 namespace Level
 {
-    // Builds a simple blocky level from JSON (cubes for walls/floors/doors)
-    public static class LevelBuilder
+    // Streaming reader for the level JSON format ({width, height, spawns?, cells: [{type}], storeyHeight?, floors?, pvs?}).
+    // Bytes are scanned through a reused buffer and each cell's type string is matched in place and
+    // written to the grid as a CellType byte: no full-text string, no LevelCell objects, no per-cell strings.
+    // Keys may appear in any order and unknown keys are skipped. Scratch buffers are per thread.
+    public static class LevelJsonReader
     {
-        public static Transform Root;
+        const int BufferSize = 64 * 1024;
+
+        static readonly byte[] KeyWidth = Ascii("width");
+        static readonly byte[] KeyHeight = Ascii("height");
+        static readonly byte[] KeyCells = Ascii("cells");
+        static readonly byte[] KeySpawns = Ascii("spawns");
+        static readonly byte[] KeyType = Ascii("type");
+        static readonly byte[] KeyPlayer = Ascii("player");
+        static readonly byte[] KeyEnemies = Ascii("enemies");
+        static readonly byte[] KeyX = Ascii("x");
+        static readonly byte[] KeyY = Ascii("y");
+        static readonly byte[] KeyZ = Ascii("z");
+        static readonly byte[] KeyFloors = Ascii("floors");
+        static readonly byte[] KeyRuns = Ascii("runs");
+        static readonly byte[] KeyStoreyHeight = Ascii("storeyHeight");
+        static readonly byte[] KeyPvs = Ascii("pvs");
+        static readonly byte[] KeyRowBytes = Ascii("rowBytes");
+        static readonly byte[] KeyData = Ascii("data");
+
+        static readonly byte[] TypeWall = Ascii("wall");
+        static readonly byte[] TypeFloor = Ascii("floor");
+        static readonly byte[] TypeDoor = Ascii("door");
+        static readonly byte[] TypeEnemy = Ascii("enemy");
+        static readonly byte[] TypePlayer = Ascii("player");
+
+        [ThreadStatic] static Scanner cached;
+
+        public static LevelGrid Read(string path)
+        {
+            // Unbuffered FileStream: the scanner's own buffer is the only one
+            using (var fs = new FileStream(path, FileMode.Open, FileAccess.Read, FileShare.Read, 1, FileOptions.SequentialScan))
+            {
+                return Read(fs);
+            }
+        }
 
-        public static void BuildFromJson(string levelJsonPath)
+        public static LevelGrid Read(Stream stream)
         {
-            if (Root != null) Object.Destroy(Root.gameObject);
-            var rootGo = new GameObject("LevelRoot");
-            Root = rootGo.transform;
+            var s = cached ?? (cached = new Scanner());
+            s.Reset(stream);
+            try { return Parse(s); }
+            finally { s.Release(); }
+        }
 
-            var json = File.ReadAllText(levelJsonPath);
-            var data = JsonUtility.FromJson<LevelData>(json);
-            if (data == null || data.cells == null) { Debug.LogError("Invalid level JSON."); return; }
+        public static LevelGrid Read(byte[] bytes, int offset, int count)
+        {
+            var s = cached ?? (cached = new Scanner());
+            s.Reset(bytes, offset, count);
+            try { return Parse(s); }
+            finally { s.Release(); }
+        }
 
-            float tile = 2f;
-            GameObject spawnMarker = null;
+        static LevelGrid Parse(Scanner s)
+        {
+            var grid = new LevelGrid();
+            int width = -1, height = -1, count = 0, pvsCells = 0;
+            byte[] cells = null;
 
-            for (int y = 0; y < data.height; y++)
+            s.Expect('{');
+            if (!s.TryClose('}'))
             {
-                for (int x = 0; x < data.width; x++)
+                do
                 {
-                    int idx = y * data.width + x;
-                    string t = data.cells[idx].type;
-                    Vector3 pos = new Vector3(x * tile, 0f, y * tile);
-
-                    // Floor
-                    var floor = GameObject.CreatePrimitive(PrimitiveType.Cube);
-                    floor.transform.SetParent(Root);
-                    floor.transform.position = pos + new Vector3(0f, -0.51f, 0f);
-                    floor.transform.localScale = new Vector3(tile, 0.02f, tile);
-                    floor.name = $"floor_{x}_{y}";
-
-                    if (t == "wall" || t == "door")
+                    s.ReadString();
+                    s.Expect(':');
+                    if (s.KeyIs(KeyWidth)) width = s.ReadInt();
+                    else if (s.KeyIs(KeyHeight)) height = s.ReadInt();
+                    else if (s.KeyIs(KeyCells)) ReadCells(s, width, height, ref cells, ref count);
+                    else if (s.KeyIs(KeySpawns)) ReadSpawns(s, grid);
+                    else if (s.KeyIs(KeyPvs)) pvsCells = ReadPvs(s, grid);
+                    else if (s.KeyIs(KeyFloors)) ReadFloors(s, grid);
+                    else if (s.KeyIs(KeyStoreyHeight))
                     {
-                        var wall = GameObject.CreatePrimitive(PrimitiveType.Cube);
-                        wall.transform.SetParent(Root);
-                        wall.transform.position = pos + new Vector3(0f, 1f, 0f);
-                        wall.transform.localScale = new Vector3(tile, 2f, tile);
-                        wall.name = t + $"_{x}_{y}";
+                        grid.StoreyHeight = s.ReadFloat();
+                        if (!(grid.StoreyHeight > 0f)) throw s.Error("storeyHeight must be positive");
                     }
-                    else if (t == "player")
+                    else s.SkipValue();
+                } while (s.Comma('}'));
+            }
+
+            if (width <= 0 || height <= 0) throw s.Error("missing or invalid width/height");
+            CheckFloors(s, grid, width * height, ref cells, ref count);
+            if (cells == null || count != width * height)
+                throw s.Error($"expected {width * height} cells, found {count}");
+            if (cells.Length != count) Array.Resize(ref cells, count);
+
+            grid.Width = width;
+            grid.Height = height;
+            grid.Cells = cells;
+
+            // A PVS baked for another layout is useless: build without culling rather than fail
+            if (grid.Pvs != null && (pvsCells != count || grid.PvsRowBytes != (count + 7) / 8))
+            {
+                Debug.LogWarning("Level PVS does not match the grid size; ignoring it (re-run Tools/pvs_bake.py).");
+                grid.Pvs = null;
+            }
+            return grid;
+        }
+
+        static void ReadCells(Scanner s, int width, int height, ref byte[] cells, ref int count)
+        {
+            // Exact allocation when width/height came first (the generator's order); grow otherwise
+            if (cells == null) cells = new byte[width > 0 && height > 0 ? width * height : 1024];
+            s.Expect('[');
+            if (s.TryClose(']')) return;
+            do
+            {
+                byte type = (byte)CellType.Floor; // missing/unknown type behaves like plain floor
+                s.Expect('{');
+                if (!s.TryClose('}'))
+                {
+                    do
                     {
-                        var marker = GameObject.CreatePrimitive(PrimitiveType.Cylinder);
-                        marker.transform.SetParent(Root);
-                        marker.transform.position = pos + new Vector3(0f, 0f, 0f);
-                        marker.transform.localScale = new Vector3(0.5f, 0.2f, 0.5f);
-                        marker.name = $"playerSpawn_{x}_{y}";
-                        spawnMarker = marker;
-                    }
-                    else if (t == "enemy")
+                        s.ReadString();
+                        s.Expect(':');
+                        if (s.KeyIs(KeyType) && s.PeekNonWs() == '"')
+                        {
+                            s.ReadString();
+                            type = (byte)MatchType(s);
+                        }
+                        else s.SkipValue();
+                    } while (s.Comma('}'));
+                }
+                if (count == cells.Length) Array.Resize(ref cells, cells.Length * 2);
+                cells[count++] = type;
+            } while (s.Comma(']'));
+        }
+
+        static CellType MatchType(Scanner s)
+        {
+            if (s.KeyIs(TypeFloor)) return CellType.Floor;
+            if (s.KeyIs(TypeWall)) return CellType.Wall;
+            if (s.KeyIs(TypeDoor)) return CellType.Door;
+            if (s.KeyIs(TypeEnemy)) return CellType.Enemy;
+            if (s.KeyIs(TypePlayer)) return CellType.Player;
+            return CellType.Floor;
+        }
+
+        // [{"z": 1, "runs": [code, count, ...]}, ...]
+        static void ReadFloors(Scanner s, LevelGrid grid)
+        {
+            if (s.PeekNonWs() == 'n') { s.SkipValue(); return; }
+            s.Expect('[');
+            if (s.TryClose(']')) return;
+            do
+            {
+                var floor = new LevelFloor();
+                s.Expect('{');
+                if (!s.TryClose('}'))
+                {
+                    do
                     {
-                        var marker = GameObject.CreatePrimitive(PrimitiveType.Sphere);
-                        marker.transform.SetParent(Root);
-                        marker.transform.position = pos + new Vector3(0f, 0.5f, 0f);
-                        marker.transform.localScale = new Vector3(0.6f, 0.6f, 0.6f);
-                        marker.name = $"enemySpawn_{x}_{y}";
-                    }
+                        s.ReadString();
+                        s.Expect(':');
+                        if (s.KeyIs(KeyZ)) floor.Z = s.ReadInt();
+                        else if (s.KeyIs(KeyRuns)) floor.Runs = ReadRuns(s);
+                        else s.SkipValue();
+                    } while (s.Comma('}'));
+                }
+                if (floor.Runs == null) throw s.Error($"floor {floor.Z} has no runs");
+                grid.Floors.Add(floor);
+            } while (s.Comma(']'));
+        }
+
+        static int[] ReadRuns(Scanner s)
+        {
+            var runs = new int[64];
+            int n = 0;
+            s.Expect('[');
+            if (!s.TryClose(']'))
+            {
+                do
+                {
+                    int v = s.ReadInt();
+                    // Even slots are cell codes, odd slots run lengths
+                    if ((n & 1) == 0 ? v < 0 || v > (int)CellType.Player : v <= 0) throw s.Error("invalid floor run");
+                    if (n == runs.Length) Array.Resize(ref runs, runs.Length * 2);
+                    runs[n++] = v;
+                } while (s.Comma(']'));
+            }
+            if ((n & 1) != 0) throw s.Error("floor runs must be code/count pairs");
+            Array.Resize(ref runs, n);
+            return runs;
+        }
+
+        // Validates storeys once width/height are known. A z = 0 floor stands in for "cells" (and is expanded into them).
+        static void CheckFloors(Scanner s, LevelGrid grid, int area, ref byte[] cells, ref int count)
+        {
+            var floors = grid.Floors;
+            floors.Sort((a, b) => a.Z.CompareTo(b.Z));
+            for (int i = floors.Count - 1; i >= 0; i--)
+            {
+                var f = floors[i];
+                if (i > 0 && floors[i - 1].Z == f.Z) throw s.Error($"duplicate floor {f.Z}");
+                if (f.CellCount() != area) throw s.Error($"floor {f.Z}: runs cover {f.CellCount()} cells, expected {area}");
+                if (f.Z != 0) continue;
+                if (cells != null) throw s.Error("both cells and floor 0 given");
+                cells = new byte[area];
+                for (int r = 0, at = 0; r < f.RunCount; r++)
+                {
+                    int len = f.Runs[2 * r + 1];
+                    for (int k = 0; k < len; k++) cells[at + k] = (byte)f.Runs[2 * r];
+                    at += len;
                 }
+                count = area;
+                floors.RemoveAt(i);
+            }
+        }
+
+        static void ReadSpawns(Scanner s, LevelGrid grid)
+        {
+            if (s.PeekNonWs() == 'n') { s.SkipValue(); return; } // null
+            s.Expect('{');
+            if (s.TryClose('}')) return;
+            do
+            {
+                s.ReadString();
+                s.Expect(':');
+                if (s.KeyIs(KeyPlayer)) ReadPoints(s, grid.PlayerSpawns);
+                else if (s.KeyIs(KeyEnemies)) ReadPoints(s, grid.EnemySpawns);
+                else s.SkipValue();
+            } while (s.Comma('}'));
+        }
+
+        static void ReadPoints(Scanner s, List<Vector3Int> into)
+        {
+            if (s.PeekNonWs() == 'n') { s.SkipValue(); return; }
+            s.Expect('[');
+            if (s.TryClose(']')) return;
+            do
+            {
+                int x = 0, y = 0, z = 0;
+                s.Expect('{');
+                if (!s.TryClose('}'))
+                {
+                    do
+                    {
+                        s.ReadString();
+                        s.Expect(':');
+                        if (s.KeyIs(KeyX)) x = s.ReadInt();
+                        else if (s.KeyIs(KeyY)) y = s.ReadInt();
+                        else if (s.KeyIs(KeyZ)) z = s.ReadInt();
+                        else s.SkipValue();
+                    } while (s.Comma('}'));
+                }
+                into.Add(new Vector3Int(x, y, z));
+            } while (s.Comma(']'));
+        }
+
+        // {"cells": n, "rowBytes": b, "encoding": "deflate-base64", "data": "..."}; returns n
+        static int ReadPvs(Scanner s, LevelGrid grid)
+        {
+            if (s.PeekNonWs() == 'n') { s.SkipValue(); return 0; }
+            int n = 0, rowBytes = 0;
+            string data = null;
+            s.Expect('{');
+            if (!s.TryClose('}'))
+            {
+                do
+                {
+                    s.ReadString();
+                    s.Expect(':');
+                    if (s.KeyIs(KeyCells)) n = s.ReadInt();
+                    else if (s.KeyIs(KeyRowBytes)) rowBytes = s.ReadInt();
+                    else if (s.KeyIs(KeyData)) data = s.ReadStringValue();
+                    else s.SkipValue();
+                } while (s.Comma('}'));
+            }
+            if (n <= 0 || rowBytes <= 0 || data == null) return 0;
+
+            var raw = new byte[n * rowBytes];
+            using (var packed = new MemoryStream(Convert.FromBase64String(data)))
+            using (var inflate = new DeflateStream(packed, CompressionMode.Decompress))
+            {
+                int read = 0, got;
+                while (read < raw.Length && (got = inflate.Read(raw, read, raw.Length - read)) > 0) read += got;
+                if (read != raw.Length) throw s.Error("truncated pvs data");
+            }
+            grid.Pvs = raw;
+            grid.PvsRowBytes = rowBytes;
+            return n;
+        }
+
+        static byte[] Ascii(string s)
+        {
+            var b = new byte[s.Length];
+            for (int i = 0; i < s.Length; i++) b[i] = (byte)s[i];
+            return b;
+        }
+
+        // Byte cursor over either a refilled stream buffer or a caller-owned byte range.
+        // The last string read (key or value) is kept in Text/TextLength for in-place comparison.
+        sealed class Scanner
+        {
+            public readonly byte[] Text = new byte[64];
+            public int TextLength;
+            char[] chars = new char[256]; // scratch for the rare string values that are kept (pvs data)
+
+            readonly byte[] own = new byte[BufferSize];
+            byte[] buf;
+            Stream stream;
+            int pos, end;
+            long origin; // absolute offset of buf[0], for error messages
+
+            public void Reset(Stream s)
+            {
+                stream = s; buf = own; pos = end = 0; origin = 0;
+            }
+
+            public void Reset(byte[] bytes, int offset, int count)
+            {
+                stream = null; buf = bytes; pos = offset; end = offset + count; origin = -offset;
+            }
+
+            public void Release()
+            {
+                stream = null; buf = own; pos = end = 0;
+            }
+
+            public int Peek()
+            {
+                if (pos < end) return buf[pos];
+                if (stream == null) return -1;
+                origin += end;
+                pos = 0;
+                end = stream.Read(buf, 0, buf.Length);
+                return end > 0 ? buf[0] : -1;
+            }
+
+            public int Next()
+            {
+                int c = Peek();
+                if (c >= 0) pos++;
+                return c;
+            }
+
+            public int PeekNonWs()
+            {
+                int c;
+                while ((c = Peek()) == ' ' || c == '\n' || c == '\r' || c == '\t') pos++;
+                return c;
+            }
+
+            public void Expect(char ch)
+            {
+                if (PeekNonWs() != ch) throw Error("expected '" + ch + "'");
+                pos++;
+            }
+
+            // Consumes the closing bracket of an empty object/array
+            public bool TryClose(char close)
+            {
+                if (PeekNonWs() != close) return false;
+                pos++;
+                return true;
+            }
+
+            // After a member/element: true on ',', false on the closing bracket
+            public bool Comma(char close)
+            {
+                int c = PeekNonWs();
+                pos++;
+                if (c == ',') return true;
+                if (c == close) return false;
+                throw Error("expected ',' or '" + close + "'");
+            }
+
+            public void ReadString()
+            {
+                Expect('"');
+                TextLength = 0;
+                while (true)
+                {
+                    int c = Next();
+                    if (c < 0) throw Error("unterminated string");
+                    if (c == '"') return;
+                    if (c == '\\')
+                    {
+                        c = Next();
+                        if (c == 'u') { for (int i = 0; i < 4; i++) Next(); c = 0xFF; } // never part of a known name
+                        else if (c < 0) throw Error("unterminated string");
+                    }
+                    // Longer strings keep counting so they can never match a (short) known name
+                    if (TextLength < Text.Length) Text[TextLength] = (byte)c;
+                    TextLength++;
+                }
+            }
+
+            // Reads a whole string value (ASCII payloads such as base64; \uXXXX escapes are not decoded)
+            public string ReadStringValue()
+            {
+                Expect('"');
+                int n = 0;
+                while (true)
+                {
+                    int c = Next();
+                    if (c < 0) throw Error("unterminated string");
+                    if (c == '"') return new string(chars, 0, n);
+                    if (c == '\\')
+                    {
+                        c = Next();
+                        if (c < 0) throw Error("unterminated string");
+                    }
+                    if (n == chars.Length) Array.Resize(ref chars, chars.Length * 2);
+                    chars[n++] = (char)c;
+                }
+            }
+
+            public bool KeyIs(byte[] name)
+            {
+                if (TextLength != name.Length) return false;
+                for (int i = 0; i < name.Length; i++)
+                    if (Text[i] != name[i]) return false;
+                return true;
+            }
+
+            public int ReadInt()
+            {
+                int c = PeekNonWs();
+                bool neg = c == '-';
+                if (neg) { pos++; c = Peek(); }
+                if (c < '0' || c > '9') throw Error("expected integer");
+                long v = 0;
+                while ((c = Peek()) >= '0' && c <= '9')
+                {
+                    v = v * 10 + (c - '0');
+                    if (v > int.MaxValue) throw Error("integer too large");
+                    pos++;
+                }
+                if (c == '.' || c == 'e' || c == 'E') throw Error("expected integer");
+                return (int)(neg ? -v : v);
+            }
+
+            public float ReadFloat()
+            {
+                PeekNonWs();
+                int c, n = 0;
+                while ((c = Peek()) == '-' || c == '+' || c == '.' || c == 'e' || c == 'E' || (c >= '0' && c <= '9'))
+                {
+                    if (n == chars.Length) Array.Resize(ref chars, chars.Length * 2);
+                    chars[n++] = (char)c;
+                    pos++;
+                }
+                float v;
+                if (n == 0 || !float.TryParse(new string(chars, 0, n), System.Globalization.NumberStyles.Float,
+                        System.Globalization.CultureInfo.InvariantCulture, out v))
+                    throw Error("expected number");
+                return v;
+            }
+
+            public void SkipValue()
+            {
+                int c = PeekNonWs();
+                if (c == '"') { ReadString(); return; }
+                if (c == '{' || c == '[')
+                {
+                    int depth = 0;
+                    do
+                    {
+                        c = Next();
+                        if (c < 0) throw Error("unexpected end of input");
+                        if (c == '"') { pos--; ReadString(); }
+                        else if (c == '{' || c == '[') depth++;
+                        else if (c == '}' || c == ']') depth--;
+                    } while (depth > 0);
+                    return;
+                }
+                // number, true, false, null
+                int n = 0;
+                while ((c = Peek()) >= 0 && c != ',' && c != '}' && c != ']' && c != ' ' && c != '\n' && c != '\r' && c != '\t')
+                {
+                    pos++;
+                    n++;
+                }
+                if (n == 0) throw Error("expected value");
+            }
+
+            public FormatException Error(string what)
+            {
+                return new FormatException("Level JSON: " + what + " at byte " + (origin + pos));
+            }
+        }
+    }
+}
+''',
+
+    "Assets/Scripts/Level/LevelBundleReader.cs": r'''
+using System.Collections.Generic;
+using System.IO;
+using UnityEngine;
+
+namespace Level
+{
+    // Builds a LevelGrid from the compiled config bundle (Tools/config_bundle.py): the cells are one bulk copy out
+    // of the mapped file and storeys, spawns and PVS are read field by field. Nothing is parsed or inflated.
+    public static class LevelBundleReader
+    {
+        // False when the bundle has no level of that name (level file name without extension)
+        public static bool TryRead(ConfigBundle bundle, string name, out LevelGrid grid)
+        {
+            grid = null;
+            long at;
+            int length;
+            if (!bundle.TryGetSection("GRID", name, out at, out length)) return false;
+
+            var g = new LevelGrid
+            {
+                Width = bundle.ReadInt(at),
+                Height = bundle.ReadInt(at + 4),
+                StoreyHeight = bundle.ReadFloat(at + 8)
+            };
+            int area = g.Width * g.Height;
+            if (g.Width <= 0 || g.Height <= 0 || length != 16 + area) throw new InvalidDataException($"level {name}: bad GRID section");
+            g.Cells = new byte[area];
+            bundle.ReadBytes(at + 16, g.Cells, 0, area);
+            for (int i = 0; i < area; i++)
+            {
+                if (g.Cells[i] > (byte)CellType.Player) throw new InvalidDataException($"level {name}: invalid cell code {g.Cells[i]}");
+            }
+
+            // Counts come from the file: each is bounded by what is left of its section before anything is allocated
+            if (bundle.TryGetSection("FLRS", name, out at, out length))
+            {
+                long end = at + length;
+                int count = length >= 4 ? bundle.ReadInt(at) : -1;
+                if (count < 0 || count > (length - 4) / 8) throw new InvalidDataException($"level {name}: bad FLRS section");
+                at += 4;
+                for (int i = 0; i < count; i++)
+                {
+                    int runs = end - at >= 8 ? bundle.ReadInt(at + 4) : -1;
+                    if (runs < 0 || runs > (end - at - 8) / 8) throw new InvalidDataException($"level {name}: bad FLRS section");
+                    var f = new LevelFloor { Z = bundle.ReadInt(at), Runs = new int[runs * 2] };
+                    bundle.ReadInts(at + 8, f.Runs, 0, f.Runs.Length);
+                    at += 8 + 4L * f.Runs.Length;
+                    long covered = 0;
+                    for (int r = 0; r < f.Runs.Length; r += 2)
+                    {
+                        // Same rules as LevelJsonReader: codes are CellType values, lengths are positive
+                        if (f.Runs[r] < 0 || f.Runs[r] > (int)CellType.Player || f.Runs[r + 1] <= 0)
+                            throw new InvalidDataException($"level {name}: invalid run on storey {f.Z}");
+                        covered += f.Runs[r + 1];
+                    }
+                    if (covered != area) throw new InvalidDataException($"level {name}: storey {f.Z} runs cover {covered} cells, expected {area}");
+                    g.Floors.Add(f);
+                }
+                if (at != end) throw new InvalidDataException($"level {name}: bad FLRS section");
+            }
+
+            if (bundle.TryGetSection("SPWN", name, out at, out length))
+            {
+                int players = length >= 8 ? bundle.ReadInt(at) : -1, enemies = length >= 8 ? bundle.ReadInt(at + 4) : -1;
+                if (players < 0 || enemies < 0 || length != 8 + 12L * ((long)players + enemies))
+                    throw new InvalidDataException($"level {name}: bad SPWN section");
+                at += 8;
+                ReadPoints(bundle, ref at, players, g.PlayerSpawns);
+                ReadPoints(bundle, ref at, enemies, g.EnemySpawns);
+            }
+
+            if (bundle.TryGetSection("PVS ", name, out at, out length))
+            {
+                int cells = bundle.ReadInt(at), rowBytes = bundle.ReadInt(at + 4);
+                if (cells == area && rowBytes == (area + 7) / 8 && length == 8 + cells * rowBytes)
+                {
+                    g.Pvs = new byte[cells * rowBytes];
+                    g.PvsRowBytes = rowBytes;
+                    bundle.ReadBytes(at + 8, g.Pvs, 0, g.Pvs.Length);
+                }
+                else Debug.LogWarning($"Bundled PVS for {name} does not match the grid size; ignoring it (re-run Tools/pvs_bake.py).");
+            }
+
+            grid = g;
+            return true;
+        }
+
+        static void ReadPoints(ConfigBundle bundle, ref long at, int count, List<Vector3Int> into)
+        {
+            for (int i = 0; i < count; i++, at += 12)
+                into.Add(new Vector3Int(bundle.ReadInt(at), bundle.ReadInt(at + 4), bundle.ReadInt(at + 8)));
+        }
+    }
+}
+''',
+
+    "Assets/Scripts/Level/LevelBuilder.cs": r'''
+using System.Collections.Generic;
+using System.IO;
+using UnityEngine;
+
+namespace Level
+{
+    // Builds a simple blocky level from JSON (cubes for walls/floors/doors).
+    // The ground storey is always built; other storeys are built on demand (LoadFloor/UnloadFloor,
+    // driven by FloorStreamer) straight from their runs, under one LevelRoot child per storey.
+    public static class LevelBuilder
+    {
+        public const float Tile = 2f;
+
+        public static Transform Root;
+        public static LevelGrid Grid; // last built grid
+
+        // Storeys loaded within this many levels of the player's storey
+        public static int FloorLoadRadius = 1;
+        public static readonly Dictionary<int, Transform> LoadedFloors = new Dictionary<int, Transform>();
+
+        // Spawn index filled while building (cell centers on the floor surface); consumers never search the hierarchy
+        public static readonly List<Vector3> PlayerSpawns = new List<Vector3>();
+        public static readonly List<Vector3> EnemySpawns = new List<Vector3>();
+        public static readonly List<Vector3> OpenCells = new List<Vector3>(); // walkable cells (not empty/wall/door)
+
+        // Ground storey objects per cell (idx = y * width + x): the floor tile and the wall/door/spawn marker on it, if any
+        public static GameObject[] CellFloors = new GameObject[0];
+        public static GameObject[] CellBlocks = new GameObject[0];
+        public static int Revision; // bumped whenever the ground cell objects change
+
+        public static float StoreyHeight => Grid != null ? Grid.StoreyHeight : 3f;
+
+        public static Vector3 CellToWorld(int x, int y, int z = 0) => new Vector3(x * Tile, z * StoreyHeight, y * Tile);
+
+        // Storey whose floor surface is nearest below a world position (feet may sit slightly under it)
+        public static int WorldToStorey(Vector3 pos) => Mathf.FloorToInt((pos.y + 0.5f) / StoreyHeight);
+
+        // Ground cell index under a world position, or -1 outside the grid
+        public static int WorldToCell(Vector3 pos)
+        {
+            if (Grid == null) return -1;
+            int x = Mathf.FloorToInt(pos.x / Tile + 0.5f);
+            int y = Mathf.FloorToInt(pos.z / Tile + 0.5f);
+            return Grid.InBounds(x, y) ? y * Grid.Width + x : -1;
+        }
+
+        // Reads the level from the compiled config bundle when it has a current copy, else parses the JSON
+        public static void BuildFromJson(string levelJsonPath)
+        {
+            PerfLog.Begin(PerfLog.Section.LevelBuild);
+            LevelGrid grid = null;
+            var bundle = ConfigIO.Bundle();
+            if (bundle != null)
+            {
+                try
+                {
+                    LevelBundleReader.TryRead(bundle, Path.GetFileNameWithoutExtension(levelJsonPath), out grid);
+                }
+                catch (System.Exception e)
+                {
+                    Debug.LogWarning("Bundled level unreadable, reading JSON. " + e.Message);
+                    grid = null;
+                }
+            }
+            if (grid == null)
+            {
+                try
+                {
+                    grid = LevelJsonReader.Read(levelJsonPath);
+                }
+                catch (System.Exception e)
+                {
+                    Debug.LogError("Invalid level JSON. " + e.Message);
+                    PerfLog.End(PerfLog.Section.LevelBuild);
+                    return;
+                }
+            }
+            BuildFromGrid(grid);
+            PerfLog.End(PerfLog.Section.LevelBuild);
+        }
+
+        // Replaces LevelRoot with an empty one and forgets the current grid and spawn index
+        public static Transform ResetRoot()
+        {
+            if (Root != null) Object.Destroy(Root.gameObject);
+            Root = new GameObject("LevelRoot").transform;
+            Grid = null;
+            LoadedFloors.Clear();
+            PlayerSpawns.Clear();
+            EnemySpawns.Clear();
+            OpenCells.Clear();
+            CellFloors = new GameObject[0];
+            CellBlocks = new GameObject[0];
+            Revision++;
+            return Root;
+        }
+
+        public static void BuildFromGrid(LevelGrid grid)
+        {
+            var rootGo = ResetRoot().gameObject;
+            Grid = grid;
+            CellFloors = new GameObject[grid.Width * grid.Height];
+            CellBlocks = new GameObject[grid.Width * grid.Height];
+
+            for (int y = 0; y < grid.Height; y++)
+            {
+                for (int x = 0; x < grid.Width; x++)
+                {
+                    BuildCell(x, y, grid.Get(x, y));
+                }
+            }
+            Revision++;
+
+            RebuildSpawnIndex();
+            if (grid.Floors.Count > 0)
+            {
+                // Storeys around the player's start now, the rest as the player moves
+                int start = PlayerSpawns.Count > 0 ? WorldToStorey(PlayerSpawns[0]) : 0;
+                UpdateLoadedFloors(start);
+                rootGo.AddComponent<FloorStreamer>();
+            }
+            EnsureCuller();
+        }
+
+        // Loads the storeys within FloorLoadRadius of the given one and unloads the others
+        public static void UpdateLoadedFloors(int storey)
+        {
+            if (Grid == null) return;
+            for (int i = 0; i < Grid.Floors.Count; i++)
+            {
+                int z = Grid.Floors[i].Z;
+                if (Mathf.Abs(z - storey) <= FloorLoadRadius) LoadFloor(z);
+                else UnloadFloor(z);
+            }
+        }
+
+        public static void LoadFloor(int z)
+        {
+            if (Grid == null || Root == null || LoadedFloors.ContainsKey(z)) return;
+            var floor = Grid.Floor(z);
+            if (floor == null) return;
+            var parent = new GameObject($"Floor_{z}").transform;
+            parent.SetParent(Root);
+            LoadedFloors[z] = parent;
+
+            int w = Grid.Width;
+            for (int r = 0, idx = 0; r < floor.RunCount; r++)
+            {
+                var t = (CellType)floor.Runs[2 * r];
+                int len = floor.Runs[2 * r + 1];
+                if (t != CellType.Empty)
+                {
+                    for (int k = idx; k < idx + len; k++) CreateCell(parent, k % w, k / w, z, t, out _, out _);
+                }
+                idx += len;
+            }
+        }
+
+        public static void UnloadFloor(int z)
+        {
+            Transform parent;
+            if (!LoadedFloors.TryGetValue(z, out parent)) return;
+            LoadedFloors.Remove(z);
+            if (parent != null) Object.Destroy(parent.gameObject);
+        }
+
+        // Rebuilds only the given ground cells (hot-reload); every other object under LevelRoot is left untouched.
+        // A change in solidity invalidates the baked PVS, which is dropped until the level is re-baked.
+        public static void ApplyCellChanges(IList<int> indices, IList<CellType> types)
+        {
+            if (Grid == null || Root == null) return;
+            bool solidChanged = false;
+            for (int i = 0; i < indices.Count; i++)
+            {
+                int idx = indices[i];
+                if (idx < 0 || idx >= Grid.Cells.Length) continue;
+                var t = types[i];
+                if (LevelGrid.IsSolid(t) != LevelGrid.IsSolid((CellType)Grid.Cells[idx])) solidChanged = true;
+                Grid.Cells[idx] = (byte)t;
+                if (CellFloors[idx] != null) Object.Destroy(CellFloors[idx]);
+                if (CellBlocks[idx] != null) Object.Destroy(CellBlocks[idx]);
+                BuildCell(idx % Grid.Width, idx / Grid.Width, t);
+            }
+            if (solidChanged) Grid.Pvs = null;
+            Revision++;
+            RebuildSpawnIndex();
+        }
+
+        // Adds the PVS culler when the current grid carries visibility data
+        public static void EnsureCuller()
+        {
+            if (Root != null && Grid != null && Grid.Pvs != null && Root.GetComponent<PvsCuller>() == null)
+                Root.gameObject.AddComponent<PvsCuller>();
+        }
+
+        // Refills PlayerSpawns/EnemySpawns/OpenCells from the grid bytes, the storey runs and the spawn table (no objects touched)
+        static void RebuildSpawnIndex()
+        {
+            var grid = Grid;
+            PlayerSpawns.Clear();
+            EnemySpawns.Clear();
+            OpenCells.Clear();
+
+            bool tablePlayer = grid.PlayerSpawns.Count > 0;
+            bool tableEnemies = grid.EnemySpawns.Count > 0;
+            Vector3? firstPlayerCell = null;
+
+            for (int y = 0; y < grid.Height; y++)
+            {
+                for (int x = 0; x < grid.Width; x++)
+                {
+                    IndexCell(CellToWorld(x, y), grid.Get(x, y), tablePlayer, tableEnemies, ref firstPlayerCell);
+                }
+            }
+            for (int i = 0; i < grid.Floors.Count; i++)
+            {
+                var floor = grid.Floors[i];
+                for (int r = 0, idx = 0; r < floor.RunCount; r++)
+                {
+                    var t = (CellType)floor.Runs[2 * r];
+                    int len = floor.Runs[2 * r + 1];
+                    if (LevelGrid.IsOpen(t))
+                    {
+                        for (int k = idx; k < idx + len; k++)
+                            IndexCell(CellToWorld(k % grid.Width, k / grid.Width, floor.Z), t, tablePlayer, tableEnemies, ref firstPlayerCell);
+                    }
+                    idx += len;
+                }
+            }
+
+            if (tablePlayer) AddSpawns(grid, grid.PlayerSpawns, PlayerSpawns);
+            if (tableEnemies) AddSpawns(grid, grid.EnemySpawns, EnemySpawns);
+
+            if (PlayerSpawns.Count > 0)
+            {
+                Player.PlayerFactory.SetPreferredSpawn(PlayerSpawns[0]);
+            }
+            else if (firstPlayerCell != null)
+            {
+                Player.PlayerFactory.SetPreferredSpawn(firstPlayerCell.Value);
+            }
+        }
+
+        static void IndexCell(Vector3 pos, CellType t, bool tablePlayer, bool tableEnemies, ref Vector3? firstPlayerCell)
+        {
+            if (!LevelGrid.IsOpen(t)) return;
+            OpenCells.Add(pos);
+            if (t == CellType.Player)
+            {
+                if (firstPlayerCell == null) firstPlayerCell = pos;
+                if (!tablePlayer) PlayerSpawns.Add(pos);
+            }
+            else if (t == CellType.Enemy)
+            {
+                if (!tableEnemies) EnemySpawns.Add(pos);
+            }
+        }
+
+        // Creates the ground floor tile and the block on top of it for one cell, recording both in CellFloors/CellBlocks
+        static void BuildCell(int x, int y, CellType t)
+        {
+            int idx = y * Grid.Width + x;
+            CreateCell(Root, x, y, 0, t, out CellFloors[idx], out CellBlocks[idx]);
+        }
+
+        // Floor tile plus wall/door/spawn marker for one cell of storey z (nothing for Empty); also used by ChunkStreamClient
+        public static void CreateCell(Transform parent, int x, int y, int z, CellType t, out GameObject floor, out GameObject block)
+        {
+            float tile = Tile;
+            Vector3 pos = CellToWorld(x, y, z);
+            floor = null;
+            block = null;
+            if (t == CellType.Empty) return;
+
+            // Floor
+            floor = GameObject.CreatePrimitive(PrimitiveType.Cube);
+            floor.transform.SetParent(parent);
+            floor.transform.position = pos + new Vector3(0f, -0.51f, 0f);
+            floor.transform.localScale = new Vector3(tile, 0.02f, tile);
+            floor.name = $"floor_{x}_{y}";
+
+            if (LevelGrid.IsSolid(t))
+            {
+                block = GameObject.CreatePrimitive(PrimitiveType.Cube);
+                block.transform.SetParent(parent);
+                block.transform.position = pos + new Vector3(0f, 1f, 0f);
+                block.transform.localScale = new Vector3(tile, 2f, tile);
+                block.name = (t == CellType.Wall ? "wall" : "door") + $"_{x}_{y}";
+            }
+            else if (t == CellType.Player)
+            {
+                block = GameObject.CreatePrimitive(PrimitiveType.Cylinder);
+                block.transform.SetParent(parent);
+                block.transform.position = pos + new Vector3(0f, 0f, 0f);
+                block.transform.localScale = new Vector3(0.5f, 0.2f, 0.5f);
+                block.name = $"playerSpawn_{x}_{y}";
+            }
+            else if (t == CellType.Enemy)
+            {
+                block = GameObject.CreatePrimitive(PrimitiveType.Sphere);
+                block.transform.SetParent(parent);
+                block.transform.position = pos + new Vector3(0f, 0.5f, 0f);
+                block.transform.localScale = new Vector3(0.6f, 0.6f, 0.6f);
+                block.name = $"enemySpawn_{x}_{y}";
+            }
+        }
+
+        static void AddSpawns(LevelGrid grid, List<Vector3Int> points, List<Vector3> into)
+        {
+            for (int i = 0; i < points.Count; i++)
+            {
+                var p = points[i];
+                if (!grid.InBounds(p.x, p.y))
+                {
+                    Debug.LogWarning("Level spawn table entry out of bounds; skipped.");
+                    continue;
+                }
+                var t = grid.Get(p.x, p.y, p.z);
+                if (!LevelGrid.IsOpen(t))
+                {
+                    Debug.LogWarning($"Level spawn ({p.x},{p.y},{p.z}) is on a {t} cell; skipped.");
+                    continue;
+                }
+                into.Add(CellToWorld(p.x, p.y, p.z));
+            }
+        }
+    }
+}
+''',
+
+    "Assets/Scripts/Level/FloorStreamer.cs": r'''
+using UnityEngine;
+
+namespace Level
+{
+    // Keeps the storeys near the player built: when the player's storey changes, loads the ones within
+    // LevelBuilder.FloorLoadRadius and destroys the rest. Added to LevelRoot for multi-storey levels.
+    public class FloorStreamer : MonoBehaviour
+    {
+        public float pollInterval = 0.25f;
+
+        private Transform player;
+        private int currentStorey = int.MinValue;
+        private float nextPoll;
+
+        void Update()
+        {
+            if (Time.unscaledTime < nextPoll) return;
+            nextPoll = Time.unscaledTime + pollInterval;
+            if (player == null)
+            {
+                var p = GameObject.FindGameObjectWithTag("Player");
+                if (p == null) return;
+                player = p.transform;
+            }
+            int storey = LevelBuilder.WorldToStorey(player.position);
+            if (storey == currentStorey) return;
+            currentStorey = storey;
+            LevelBuilder.UpdateLoadedFloors(storey);
+        }
+    }
+}
+''',
+
+    "Assets/Scripts/Level/LevelHotReload.cs": r'''
+using System.Collections.Generic;
+using System.IO;
+using UnityEngine;
+
+namespace Level
+{
+    // Development hot-reload. Polls the level file and its delta (<level>.delta.json, written by
+    // Tools/level_diff.py) and rebuilds only the cells that changed:
+    // - a delta is applied directly when its baseHash matches the running grid, otherwise the level file is re-read;
+    // - a rewritten level file is parsed and diffed against the running grid in memory;
+    // - a size change or any change to the other storeys falls back to a full LevelBuilder.BuildFromGrid.
+    public class LevelHotReload : MonoBehaviour
+    {
+        public float pollInterval = 0.25f;
+        public string levelPath;
+
+        private string deltaPath;
+        private System.DateTime levelStamp;
+        private System.DateTime deltaStamp;
+        private float nextPoll;
+        private readonly List<int> changed = new List<int>();
+        private readonly List<CellType> changedTypes = new List<CellType>();
+
+        void Start()
+        {
+            if (string.IsNullOrEmpty(levelPath)) levelPath = ConfigIO.ReadLevelJsonPath();
+            deltaPath = Path.ChangeExtension(levelPath, ".delta.json");
+            levelStamp = Stamp(levelPath);
+            deltaStamp = Stamp(deltaPath);
+        }
+
+        void Update()
+        {
+            if (Time.unscaledTime < nextPoll) return;
+            nextPoll = Time.unscaledTime + pollInterval;
+
+            var d = Stamp(deltaPath);
+            if (d != deltaStamp)
+            {
+                deltaStamp = d;
+                if (d != default(System.DateTime)) ApplyDeltaFile();
+            }
+            var l = Stamp(levelPath);
+            if (l != levelStamp)
+            {
+                levelStamp = l;
+                ReloadLevelFile();
+            }
+        }
+
+        static System.DateTime Stamp(string path)
+        {
+            return File.Exists(path) ? File.GetLastWriteTimeUtc(path) : default(System.DateTime);
+        }
+
+        void ApplyDeltaFile()
+        {
+            LevelDelta delta;
+            try
+            {
+                delta = JsonUtility.FromJson<LevelDelta>(File.ReadAllText(deltaPath));
+            }
+            catch (System.Exception e)
+            {
+                Debug.LogWarning("Level delta unreadable: " + e.Message);
+                return;
+            }
+            var grid = LevelBuilder.Grid;
+            if (grid == null || delta == null || delta.indices == null || delta.types == null || delta.indices.Length != delta.types.Length)
+                return;
+            if (delta.width != grid.Width || delta.height != grid.Height || (uint)delta.baseHash != grid.ContentHash())
+            {
+                Debug.Log("Level delta was made for a different layout; re-reading " + levelPath);
+                ReloadLevelFile();
+                return;
+            }
+
+            var sw = System.Diagnostics.Stopwatch.StartNew();
+            changed.Clear();
+            changedTypes.Clear();
+            for (int i = 0; i < delta.indices.Length; i++)
+            {
+                changed.Add(delta.indices[i]);
+                changedTypes.Add(LevelGrid.TypeFromName(delta.types[i]));
+            }
+            if (delta.hasSpawns && delta.spawns != null)
+            {
+                CopyPoints(delta.spawns.player, grid.PlayerSpawns);
+                CopyPoints(delta.spawns.enemies, grid.EnemySpawns);
+            }
+            LevelBuilder.ApplyCellChanges(changed, changedTypes);
+            Debug.Log($"Level hot-reload (delta): {changed.Count} cells in {sw.ElapsedMilliseconds} ms");
+        }
+
+        void ReloadLevelFile()
+        {
+            LevelGrid fresh;
+            try
+            {
+                fresh = LevelJsonReader.Read(levelPath);
+            }
+            catch (System.Exception e)
+            {
+                Debug.LogWarning("Level reload skipped: " + e.Message);
+                return;
+            }
+
+            var sw = System.Diagnostics.Stopwatch.StartNew();
+            var grid = LevelBuilder.Grid;
+            if (grid == null || fresh.Width != grid.Width || fresh.Height != grid.Height || !fresh.SameFloors(grid))
+            {
+                LevelBuilder.BuildFromGrid(fresh);
+                Debug.Log($"Level hot-reload (full rebuild, size or storeys changed) in {sw.ElapsedMilliseconds} ms");
+                return;
+            }
+
+            changed.Clear();
+            changedTypes.Clear();
+            var a = grid.Cells;
+            var b = fresh.Cells;
+            for (int i = 0; i < b.Length; i++)
+            {
+                if (a[i] == b[i]) continue;
+                changed.Add(i);
+                changedTypes.Add((CellType)b[i]);
+            }
+            grid.PlayerSpawns.Clear();
+            grid.PlayerSpawns.AddRange(fresh.PlayerSpawns);
+            grid.EnemySpawns.Clear();
+            grid.EnemySpawns.AddRange(fresh.EnemySpawns);
+            LevelBuilder.ApplyCellChanges(changed, changedTypes); // also refreshes the spawn index
+
+            // A PVS in the file was baked for the file's layout
+            if (fresh.Pvs != null)
+            {
+                grid.Pvs = fresh.Pvs;
+                grid.PvsRowBytes = fresh.PvsRowBytes;
+                LevelBuilder.EnsureCuller();
+            }
+            Debug.Log($"Level hot-reload (file diff): {changed.Count} cells in {sw.ElapsedMilliseconds} ms");
+        }
+
+        static void CopyPoints(SpawnPoint[] from, List<Vector3Int> into)
+        {
+            into.Clear();
+            if (from == null) return;
+            for (int i = 0; i < from.Length; i++)
+            {
+                if (from[i] != null) into.Add(new Vector3Int(from[i].x, from[i].y, from[i].z));
+            }
+        }
+    }
+}
+''',
+
+    "Assets/Scripts/Level/PvsCuller.cs": r'''
+using UnityEngine;
+
+namespace Level
+{
+    // Applies the baked potentially-visible set (Tools/pvs_bake.py): when the player enters a different cell,
+    // enables the renderers of the cells visible from it and disables the rest. Only cells whose bit
+    // changed are touched. Added to LevelRoot by LevelBuilder when the level carries PVS data.
+    public class PvsCuller : MonoBehaviour
+    {
+        private Transform player;
+        private int currentCell = -2;
+        private int cachedRevision = -1;
+        private Renderer[] floorRenderers;
+        private Renderer[] blockRenderers;
+        private byte[] shown; // bitset of cells whose renderers are currently enabled
+
+        void Update()
+        {
+            var grid = LevelBuilder.Grid;
+            if (grid == null || grid.Pvs == null)
+            {
+                // PVS dropped (e.g. hot-reloaded layout): undo any culling once
+                if (shown != null) { ShowAll(); shown = null; cachedRevision = -1; }
+                return;
+            }
+            if (player == null)
+            {
+                if (Time.frameCount % 30 != 0) return; // player is created after the level; don't search every frame
+                var p = GameObject.FindGameObjectWithTag("Player");
+                if (p == null) return;
+                player = p.transform;
+            }
+            if (cachedRevision != LevelBuilder.Revision) CacheRenderers(grid);
+
+            int cell = LevelBuilder.WorldToCell(player.position);
+            if (cell == currentCell) return;
+            currentCell = cell;
+
+            // Outside the grid or inside a solid cell: nothing baked for it, show everything
+            if (cell < 0 || LevelGrid.IsSolid((CellType)grid.Cells[cell])) ShowAll();
+            else Apply(grid.Pvs, cell * grid.PvsRowBytes);
+        }
+
+        void CacheRenderers(LevelGrid grid)
+        {
+            int n = grid.Width * grid.Height;
+            floorRenderers = new Renderer[n];
+            blockRenderers = new Renderer[n];
+            for (int i = 0; i < n; i++)
+            {
+                if (LevelBuilder.CellFloors[i] != null) floorRenderers[i] = LevelBuilder.CellFloors[i].GetComponent<Renderer>();
+                if (LevelBuilder.CellBlocks[i] != null) blockRenderers[i] = LevelBuilder.CellBlocks[i].GetComponent<Renderer>();
+            }
+            // Cells may have been rebuilt (visible) or kept (possibly culled): start from a known all-visible state
+            for (int i = 0; i < n; i++)
+            {
+                if (floorRenderers[i] != null) floorRenderers[i].enabled = true;
+                if (blockRenderers[i] != null) blockRenderers[i].enabled = true;
+            }
+            shown = new byte[grid.PvsRowBytes];
+            for (int b = 0; b < shown.Length; b++) shown[b] = 0xFF;
+            cachedRevision = LevelBuilder.Revision;
+            currentCell = -2;
+        }
+
+        void ShowAll()
+        {
+            if (floorRenderers == null) return;
+            for (int b = 0; b < shown.Length; b++) Toggle(b, 0xFF);
+        }
+
+        void Apply(byte[] pvs, int rowStart)
+        {
+            for (int b = 0; b < shown.Length; b++) Toggle(b, pvs[rowStart + b]);
+        }
+
+        // Bits are MSB-first within each byte (numpy.packbits order)
+        void Toggle(int b, int want)
+        {
+            int diff = (want ^ shown[b]) & 0xFF;
+            if (diff == 0) return;
+            for (int bit = 0; bit < 8; bit++)
+            {
+                if ((diff & (0x80 >> bit)) == 0) continue;
+                int cell = b * 8 + bit;
+                if (cell >= floorRenderers.Length) break;
+                bool on = (want & (0x80 >> bit)) != 0;
+                if (floorRenderers[cell] != null) floorRenderers[cell].enabled = on;
+                if (blockRenderers[cell] != null) blockRenderers[cell].enabled = on;
+            }
+            shown[b] = (byte)want;
+        }
+    }
+}
+''',
+
+    "Assets/Scripts/Level/ChunkStreamClient.cs": r'''
+using System;
+using System.Collections.Concurrent;
+using System.Collections.Generic;
+using System.Net.Sockets;
+using System.Threading;
+using UnityEngine;
+
+namespace Level
+{
+    // Endless-arena client for Tools/chunk_server.py. Requests the chunks around the player's chunk ahead of
+    // time (nearest first), builds arrivals a few per frame under LevelRoot and destroys chunks that fall out of
+    // range, so the world is unbounded while the number of live chunks stays fixed.
+    // Protocol (little-endian): hello "FPSC" u16 version u16 size; request i32 cx, i32 cy;
+    // reply i32 cx, i32 cy + size*size cell codes (row-major). Chunk (cx, cy) covers cells [cx*size, cx*size + size).
+    public class ChunkStreamClient : MonoBehaviour
+    {
+        public const int ProtocolVersion = 1;
+
+        // host:port of a running chunk server; when null, the -chunkServer command-line argument is used
+        public static string Address;
+
+        public int viewRadius = 2;      // chunks kept around the player's chunk (Chebyshev distance)
+        public int maxInFlight = 32;    // outstanding requests
+        public int buildsPerFrame = 2;
+
+        private TcpClient client;
+        private NetworkStream stream;
+        private Thread reader;
+        private volatile bool closing;
+        private volatile string error;
+        private int chunkSize;
+
+        private readonly ConcurrentQueue<KeyValuePair<Vector2Int, byte[]>> arrived = new ConcurrentQueue<KeyValuePair<Vector2Int, byte[]>>();
+        private readonly Dictionary<Vector2Int, GameObject> loaded = new Dictionary<Vector2Int, GameObject>();
+        private readonly HashSet<Vector2Int> requested = new HashSet<Vector2Int>();
+        private readonly List<Vector2Int> unload = new List<Vector2Int>();
+        private readonly byte[] request = new byte[8];
+        private Vector2Int[] offsets; // ring offsets within viewRadius, nearest first
+        private Vector2Int center;
+        private Transform player;
+
+        public static string ServerAddress()
+        {
+            if (!string.IsNullOrEmpty(Address)) return Address;
+            var args = Environment.GetCommandLineArgs();
+            for (int i = 0; i < args.Length - 1; i++)
+            {
+                if (args[i] == "-chunkServer") return args[i + 1];
+            }
+            return null;
+        }
+
+        // Connects, loads the chunks around the spawn synchronously (so the player has ground to stand on)
+        // and leaves the client streaming on a new LevelRoot. Returns false when no server answers.
+        public static bool TryStart(string address)
+        {
+            int colon = address.LastIndexOf(':');
+            int port;
+            if (colon <= 0 || !int.TryParse(address.Substring(colon + 1), out port))
+            {
+                Debug.LogError("Chunk server address must be host:port, got " + address);
+                return false;
+            }
+
+            var tcp = new TcpClient { NoDelay = true, ReceiveTimeout = 2000 };
+            int size;
+            try
+            {
+                if (!tcp.ConnectAsync(address.Substring(0, colon), port).Wait(2000)) throw new TimeoutException("connect timed out");
+                var hello = new byte[8];
+                ReadExactly(tcp.GetStream(), hello, 8);
+                if (hello[0] != 'F' || hello[1] != 'P' || hello[2] != 'S' || hello[3] != 'C' || (hello[4] | hello[5] << 8) != ProtocolVersion)
+                    throw new InvalidOperationException("not a chunk server (protocol " + ProtocolVersion + ")");
+                size = hello[6] | hello[7] << 8;
+            }
+            catch (Exception e)
+            {
+                tcp.Close();
+                Debug.LogError($"Chunk server {address} unavailable ({e.GetBaseException().Message}); loading the level file instead.");
+                return false;
+            }
+
+            var c = LevelBuilder.ResetRoot().gameObject.AddComponent<ChunkStreamClient>();
+            c.client = tcp;
+            c.stream = tcp.GetStream();
+            c.chunkSize = size;
+            try
+            {
+                c.LoadInitial();
+            }
+            catch (Exception e)
+            {
+                // Drop the half-streamed root so the level-file fallback starts clean
+                Destroy(c);
+                tcp.Close();
+                LevelBuilder.ResetRoot();
+                Debug.LogError($"Chunk server {address} failed during the initial load ({e.GetBaseException().Message}); loading the level file instead.");
+                return false;
+            }
+            tcp.ReceiveTimeout = 0;
+            c.reader = new Thread(c.ReadLoop) { IsBackground = true, Name = "ChunkStreamClient" };
+            c.reader.Start();
+            return true;
+        }
+
+        void LoadInitial()
+        {
+            BuildOffsets();
+            int n = 0;
+            for (int i = 0; i < offsets.Length; i++)
+            {
+                if (Mathf.Max(Mathf.Abs(offsets[i].x), Mathf.Abs(offsets[i].y)) > 1) break;
+                Request(offsets[i]);
+                n++;
+            }
+            var header = new byte[8];
+            for (int i = 0; i < n; i++)
+            {
+                ReadExactly(stream, header, 8);
+                var cells = new byte[chunkSize * chunkSize];
+                ReadExactly(stream, cells, cells.Length);
+                var coord = new Vector2Int(ReadInt(header, 0), ReadInt(header, 4));
+                requested.Remove(coord);
+                loaded[coord] = Build(coord, cells, true);
+            }
+
+            // The streamed world has no player cell: start on the open cell nearest to the origin
+            var open = LevelBuilder.OpenCells;
+            int nearest = -1;
+            for (int i = 0; i < open.Count; i++)
+            {
+                if (nearest < 0 || open[i].sqrMagnitude < open[nearest].sqrMagnitude) nearest = i;
+            }
+            if (nearest >= 0) Player.PlayerFactory.SetPreferredSpawn(open[nearest]);
+        }
+
+        void BuildOffsets()
+        {
+            var list = new List<Vector2Int>();
+            for (int y = -viewRadius; y <= viewRadius; y++)
+                for (int x = -viewRadius; x <= viewRadius; x++)
+                    list.Add(new Vector2Int(x, y));
+            list.Sort((a, b) => a.sqrMagnitude.CompareTo(b.sqrMagnitude));
+            offsets = list.ToArray();
+        }
+
+        void Update()
+        {
+            if (error != null)
+            {
+                Debug.LogWarning("Chunk server connection lost: " + error);
+                error = null;
+                enabled = false;
+                return;
+            }
+            if (offsets == null || offsets.Length != (2 * viewRadius + 1) * (2 * viewRadius + 1)) BuildOffsets();
+
+            if (player == null && Time.frameCount % 30 == 0)
+            {
+                var p = GameObject.FindGameObjectWithTag("Player");
+                if (p != null) player = p.transform;
+            }
+            if (player != null)
+            {
+                var c = ChunkOf(player.position);
+                if (c != center)
+                {
+                    center = c;
+                    UnloadFar();
+                }
+            }
+
+            KeyValuePair<Vector2Int, byte[]> chunk;
+            for (int i = 0; i < buildsPerFrame && arrived.TryDequeue(out chunk); i++)
+            {
+                requested.Remove(chunk.Key);
+                if (InRange(chunk.Key, viewRadius) && !loaded.ContainsKey(chunk.Key))
+                    loaded[chunk.Key] = Build(chunk.Key, chunk.Value, false);
+            }
+
+            for (int i = 0; i < offsets.Length && requested.Count < maxInFlight; i++)
+            {
+                var c = center + offsets[i];
+                if (!loaded.ContainsKey(c) && !requested.Contains(c)) Request(c);
+            }
+        }
+
+        Vector2Int ChunkOf(Vector3 pos)
+        {
+            int x = Mathf.FloorToInt(pos.x / LevelBuilder.Tile + 0.5f);
+            int y = Mathf.FloorToInt(pos.z / LevelBuilder.Tile + 0.5f);
+            return new Vector2Int(FloorDiv(x, chunkSize), FloorDiv(y, chunkSize));
+        }
+
+        static int FloorDiv(int a, int b) => a >= 0 ? a / b : -((-a + b - 1) / b);
+
+        bool InRange(Vector2Int c, int radius) => Mathf.Abs(c.x - center.x) <= radius && Mathf.Abs(c.y - center.y) <= radius;
+
+        // One chunk of slack beyond viewRadius so walking along a chunk border does not rebuild chunks
+        void UnloadFar()
+        {
+            unload.Clear();
+            foreach (var kv in loaded)
+            {
+                if (!InRange(kv.Key, viewRadius + 1)) unload.Add(kv.Key);
+            }
+            for (int i = 0; i < unload.Count; i++)
+            {
+                if (loaded[unload[i]] != null) Destroy(loaded[unload[i]]);
+                loaded.Remove(unload[i]);
+            }
+        }
+
+        void Request(Vector2Int c)
+        {
+            WriteInt(request, 0, c.x);
+            WriteInt(request, 4, c.y);
+            try
+            {
+                stream.Write(request, 0, 8);
+                requested.Add(c);
+            }
+            catch (Exception e)
+            {
+                if (error == null && !closing) error = e.Message;
+            }
+        }
+
+        // Initial chunks also seed the spawn index so EnemyFactory places the first enemies on streamed ground
+        GameObject Build(Vector2Int c, byte[] cells, bool index)
+        {
+            var parent = new GameObject($"Chunk_{c.x}_{c.y}").transform;
+            parent.SetParent(transform);
+            int x0 = c.x * chunkSize, y0 = c.y * chunkSize;
+            for (int i = 0; i < cells.Length; i++)
+            {
+                var t = (CellType)cells[i];
+                if (t == CellType.Empty) continue;
+                int x = x0 + i % chunkSize, y = y0 + i / chunkSize;
+                LevelBuilder.CreateCell(parent, x, y, 0, t, out _, out _);
+                if (!index || !LevelGrid.IsOpen(t)) continue;
+                LevelBuilder.OpenCells.Add(LevelBuilder.CellToWorld(x, y));
+                if (t == CellType.Enemy) LevelBuilder.EnemySpawns.Add(LevelBuilder.CellToWorld(x, y));
+            }
+            return parent.gameObject;
+        }
+
+        void ReadLoop()
+        {
+            var header = new byte[8];
+            try
+            {
+                while (!closing)
+                {
+                    ReadExactly(stream, header, 8);
+                    var cells = new byte[chunkSize * chunkSize];
+                    ReadExactly(stream, cells, cells.Length);
+                    arrived.Enqueue(new KeyValuePair<Vector2Int, byte[]>(new Vector2Int(ReadInt(header, 0), ReadInt(header, 4)), cells));
+                }
+            }
+            catch (Exception e)
+            {
+                if (!closing) error = e.Message;
             }
+        }
+
+        void OnDestroy()
+        {
+            closing = true;
+            if (client != null) client.Close(); // unblocks the reader thread
+        }
 
-            if (spawnMarker != null)
+        static void ReadExactly(NetworkStream s, byte[] buf, int count)
+        {
+            int read = 0;
+            while (read < count)
             {
-                Player.PlayerFactory.SetPreferredSpawn(spawnMarker.transform.position);
+                int got = s.Read(buf, read, count - read);
+                if (got <= 0) throw new System.IO.EndOfStreamException("chunk server closed the connection");
+                read += got;
             }
         }
+
+        static int ReadInt(byte[] b, int at) => b[at] | b[at + 1] << 8 | b[at + 2] << 16 | b[at + 3] << 24;
+
+        static void WriteInt(byte[] b, int at, int v)
+        {
+            b[at] = (byte)v;
+            b[at + 1] = (byte)(v >> 8);
+            b[at + 2] = (byte)(v >> 16);
+            b[at + 3] = (byte)(v >> 24);
+        }
     }
 }
 ''',
@@ -417,6 +2407,9 @@ namespace Player
     {
         private static Vector3 preferredSpawn = new Vector3(2f, 0f, 2f);
 
+        // Retained (uGUI, allocation-free per frame) by default; Immediate keeps the OnGUI HUD
+        public static UI.HudMode HudMode = UI.HudMode.Retained;
+
         public static void SetPreferredSpawn(Vector3 pos) => preferredSpawn = pos;
 
         public static void EnsurePlayerAtSpawn()
@@ -454,9 +2447,18 @@ namespace Player
             var gun = camGo.AddComponent<Weapons.HitscanGun>();
 
             // HUD
-            var hud = camGo.AddComponent<UI.SimpleHUD>();
-            hud.TargetHealth = health;
-            hud.TargetGun = gun;
+            if (HudMode == UI.HudMode.Retained)
+            {
+                var hud = camGo.AddComponent<UI.RetainedHUD>();
+                hud.TargetHealth = health;
+                hud.TargetGun = gun;
+            }
+            else
+            {
+                var hud = camGo.AddComponent<UI.SimpleHUD>();
+                hud.TargetHealth = health;
+                hud.TargetGun = gun;
+            }
 
             // Position
             body.transform.position = preferredSpawn + Vector3.up * 1.1f;
@@ -474,6 +2476,17 @@ namespace Weapons
         public int Mag;
         public int Reserve;
         public int MagSize;
+
+        // Raised by Set when Mag/Reserve actually change; HUDs cache their text from it
+        public System.Action OnChanged;
+
+        public void Set(int mag, int reserve)
+        {
+            if (mag == Mag && reserve == Reserve) return;
+            Mag = mag;
+            Reserve = reserve;
+            OnChanged?.Invoke();
+        }
     }
 }
 ''',
@@ -484,7 +2497,8 @@ using System.IO;
 
 namespace Weapons
 {
-    // Basic hitscan rifle reading defaults from weapons.json (first weapon)
+    // Basic hitscan rifle reading defaults from weapons.json (first weapon). Each shot fires `pellets` rays;
+    // they are resolved with every other ray of the frame by ShotBatch.
     public class HitscanGun : MonoBehaviour
     {
         public float damage = 20f;
@@ -494,6 +2508,7 @@ namespace Weapons
         public float reloadTime = 1.7f;
         public float range = 110f;
         public float spreadDegrees = 1.2f;
+        public int pellets = 1; // rays per shot, each dealing full damage (shotgun > 1)
         public LayerMask hitMask = ~0;
         public Transform firePoint;
 
@@ -509,9 +2524,8 @@ namespace Weapons
             LoadDefaults();
             mag = magSize;
             reserve = reserveAmmo;
-            State.Mag = mag;
-            State.Reserve = reserve;
             State.MagSize = magSize;
+            State.Set(mag, reserve);
 
             if (firePoint == null)
             {
@@ -541,25 +2555,21 @@ namespace Weapons
                 StartReload();
                 return;
             }
+            PerfLog.Begin(PerfLog.Section.HitscanFire);
 
-            Vector3 dir = firePoint.forward;
-            dir = Quaternion.Euler(Random.Range(-spreadDegrees, spreadDegrees),
-                                   Random.Range(-spreadDegrees, spreadDegrees), 0f) * dir;
-
-            if (Physics.Raycast(firePoint.position, dir, out RaycastHit hit, range, hitMask, QueryTriggerInteraction.Ignore))
-            {
-                var h = hit.collider.GetComponentInParent<Health>();
-                if (h != null) h.Damage(damage);
-                Debug.DrawLine(firePoint.position, hit.point, Color.red, 0.1f);
-            }
-            else
+            Vector3 origin = firePoint.position;
+            Vector3 forward = firePoint.forward;
+            for (int i = Mathf.Max(1, pellets); i > 0; i--)
             {
-                Debug.DrawRay(firePoint.position, dir * range, Color.yellow, 0.1f);
+                Vector3 dir = Quaternion.Euler(Random.Range(-spreadDegrees, spreadDegrees),
+                                               Random.Range(-spreadDegrees, spreadDegrees), 0f) * forward;
+                ShotBatch.Enqueue(origin, dir, range, damage, hitMask);
             }
 
             mag--;
-            State.Mag = mag;
+            State.Set(mag, reserve);
             nextFireTime = Time.time + 1f / Mathf.Max(0.01f, fireRate);
+            PerfLog.End(PerfLog.Section.HitscanFire);
         }
 
         void StartReload()
@@ -577,13 +2587,13 @@ namespace Weapons
             int toLoad = Mathf.Min(need, reserve);
             mag += toLoad;
             reserve -= toLoad;
-            State.Mag = mag;
-            State.Reserve = reserve;
+            State.Set(mag, reserve);
             reloading = false;
         }
 
         void LoadDefaults()
         {
+            if (LoadFromBundle()) return;
             try
             {
                 string path = ConfigIO.ReadWeaponsJsonPath();
@@ -599,11 +2609,31 @@ namespace Weapons
                     reloadTime = a.reloadTime;
                     range = a.range;
                     spreadDegrees = a.spreadDegrees;
+                    pellets = Mathf.Max(1, a.pellets); // absent in older configs
                 }
             }
             catch { /* ignore */ }
         }
 
+        // First WEAP record of the compiled config bundle (layout in Tools/config_bundle.py)
+        bool LoadFromBundle()
+        {
+            var bundle = ConfigIO.Bundle();
+            long at;
+            int length;
+            if (bundle == null || !bundle.TryGetSection("WEAP", "weapons", out at, out length) || bundle.ReadInt(at) < 1) return false;
+            long r = at + 8 + 64; // count, record size; id, displayName
+            damage = bundle.ReadFloat(r);
+            fireRate = bundle.ReadFloat(r + 4);
+            magSize = bundle.ReadInt(r + 8);
+            reserveAmmo = bundle.ReadInt(r + 12);
+            reloadTime = bundle.ReadFloat(r + 16);
+            range = bundle.ReadFloat(r + 20);
+            spreadDegrees = bundle.ReadFloat(r + 24);
+            pellets = bundle.ReadInt(at + 4) >= 100 ? Mathf.Max(1, bundle.ReadInt(r + 32)) : 1; // record size; bundles before pellets used 96
+            return true;
+        }
+
         [System.Serializable]
         public class WeaponsConfig
         {
@@ -622,10 +2652,104 @@ namespace Weapons
             public float reloadTime;
             public float range;
             public float spreadDegrees;
+            public int pellets;
             public bool isHitscan;
         }
     }
 }
+''',
+
+    "Assets/Scripts/Weapons/ShotBatch.cs": r'''
+using System.Collections.Generic;
+using Unity.Collections;
+using UnityEngine;
+
+namespace Weapons
+{
+    // Collects the hitscan rays fired during a frame (every pellet of every gun) and resolves them together
+    // in LateUpdate with one RaycastCommand.ScheduleBatch; hits go to DamageQueue, which runs after it.
+    // Command/result buffers are persistent and only grow, so a steady fire rate allocates nothing.
+    [DefaultExecutionOrder(1000)]
+    public class ShotBatch : MonoBehaviour
+    {
+        struct Shot
+        {
+            public Vector3 Origin;
+            public Vector3 Direction;
+            public float Range;
+            public float Damage;
+            public int Mask;
+        }
+
+        public static int MinCommandsPerJob = 16;
+
+        static ShotBatch instance;
+        static readonly List<Shot> pending = new List<Shot>();
+
+        private NativeArray<RaycastCommand> commands;
+        private NativeArray<RaycastHit> results;
+
+        // Queues one ray; it is resolved (and its damage applied) at the end of this frame's updates
+        public static void Enqueue(Vector3 origin, Vector3 direction, float range, float damage, LayerMask mask)
+        {
+            if (instance == null)
+            {
+                var go = new GameObject("ShotBatch");
+                DontDestroyOnLoad(go);
+                instance = go.AddComponent<ShotBatch>();
+            }
+            pending.Add(new Shot { Origin = origin, Direction = direction, Range = range, Damage = damage, Mask = mask });
+        }
+
+        void LateUpdate()
+        {
+            int n = pending.Count;
+            if (n == 0) return;
+            if (!commands.IsCreated || commands.Length < n)
+            {
+                int size = Mathf.NextPowerOfTwo(n);
+                if (commands.IsCreated) commands.Dispose();
+                if (results.IsCreated) results.Dispose();
+                commands = new NativeArray<RaycastCommand>(size, Allocator.Persistent);
+                results = new NativeArray<RaycastHit>(size, Allocator.Persistent);
+            }
+
+            for (int i = 0; i < n; i++)
+            {
+                var s = pending[i];
+#if UNITY_2022_2_OR_NEWER
+                var query = new QueryParameters(s.Mask, false, QueryTriggerInteraction.Ignore, false);
+                commands[i] = new RaycastCommand(s.Origin, s.Direction, query, s.Range);
+#else
+                commands[i] = new RaycastCommand(s.Origin, s.Direction, s.Range, s.Mask); // triggers follow Physics.queriesHitTriggers
+#endif
+            }
+            RaycastCommand.ScheduleBatch(commands.GetSubArray(0, n), results.GetSubArray(0, n), MinCommandsPerJob).Complete();
+
+            for (int i = 0; i < n; i++)
+            {
+                var s = pending[i];
+                var hit = results[i];
+                if (hit.collider == null)
+                {
+                    Debug.DrawRay(s.Origin, s.Direction * s.Range, Color.yellow, 0.1f);
+                    continue;
+                }
+                Debug.DrawLine(s.Origin, hit.point, Color.red, 0.1f);
+                var h = hit.collider.GetComponentInParent<Health>();
+                if (h != null) h.Damage(s.Damage);
+            }
+            pending.Clear();
+        }
+
+        void OnDestroy()
+        {
+            if (commands.IsCreated) commands.Dispose();
+            if (results.IsCreated) results.Dispose();
+            if (instance == this) instance = null;
+        }
+    }
+}
 ''',
 
     "Assets/Scripts/AI/ChaserAI.cs": r'''
@@ -653,6 +2777,7 @@ namespace AI
         void Update()
         {
             if (player == null) return;
+            PerfLog.Begin(PerfLog.Section.ChaserAI);
 
             Vector3 to = (player.position - transform.position);
             Vector3 planar = new Vector3(to.x, 0f, to.z);
@@ -671,6 +2796,7 @@ namespace AI
                 if (h != null) h.Damage(damage);
                 nextAttack = Time.time + attackCooldown;
             }
+            PerfLog.End(PerfLog.Section.ChaserAI);
         }
     }
 }
@@ -685,24 +2811,24 @@ namespace AI
     {
         public static void SpawnInitialEnemies(int count)
         {
-            var levelRoot = GameObject.Find("LevelRoot");
-            if (levelRoot == null) return;
+            if (Level.LevelBuilder.Root == null) return;
 
+            // Spawn index recorded by LevelBuilder (marker sphere sits 0.5 above the cell, capsule 1.0 above that)
+            var spawns = Level.LevelBuilder.EnemySpawns;
             int spawned = 0;
-            foreach (Transform t in levelRoot.transform)
+            for (int i = 0; i < spawns.Count && spawned < count; i++, spawned++)
             {
-                if (t.name.StartsWith("enemySpawn_"))
-                {
-                    SpawnAt(t.position + Vector3.up * 1.0f);
-                    spawned++;
-                    if (spawned >= count) break;
-                }
+                SpawnAt(spawns[i] + Vector3.up * 1.5f);
             }
 
-            // If not enough spawn markers, drop a few near center
+            // If not enough spawn points, drop the rest on random open cells (never inside walls)
+            var open = Level.LevelBuilder.OpenCells;
             for (; spawned < count; spawned++)
             {
-                SpawnAt(new Vector3(6f + Random.Range(-2f, 2f), 1f, 6f + Random.Range(-2f, 2f)));
+                if (open.Count > 0)
+                    SpawnAt(open[Random.Range(0, open.Count)] + Vector3.up * 1f);
+                else
+                    SpawnAt(new Vector3(6f + Random.Range(-2f, 2f), 1f, 6f + Random.Range(-2f, 2f)));
             }
         }
 
@@ -718,6 +2844,17 @@ namespace AI
         }
     }
 }
+''',
+
+    "Assets/Scripts/UI/HudMode.cs": r'''
+namespace UI
+{
+    public enum HudMode
+    {
+        Retained,  // RetainedHUD: uGUI canvas, text rebuilt only on change events
+        Immediate  // SimpleHUD: OnGUI, redrawn every GUI event
+    }
+}
 ''',
 
     "Assets/Scripts/UI/SimpleHUD.cs": r'''
@@ -725,32 +2862,76 @@ using UnityEngine;
 
 namespace UI
 {
-    // Simple OnGUI HUD: crosshair + health + ammo
+    // Simple OnGUI HUD: crosshair + health + ammo.
+    // Label text is cached and only rebuilt from Health/AmmoState change events.
     public class SimpleHUD : MonoBehaviour
     {
         public Health TargetHealth;
         public Weapons.HitscanGun TargetGun;
 
+        private Health boundHealth;
+        private Weapons.AmmoState boundAmmo;
+        private string healthText = "HP: ?";
+        private string ammoText = "Ammo: ?";
+
+        void Start()
+        {
+            Bind();
+        }
+
+        void OnDestroy()
+        {
+            Unbind();
+        }
+
         void OnGUI()
         {
-            var sw = Screen.width;
-            var sh = Screen.height;
+            if (TargetHealth != boundHealth || (TargetGun != null ? TargetGun.State : null) != boundAmmo) Bind();
+            if (Event.current.type != EventType.Repaint) return;
+            PerfLog.Begin(PerfLog.Section.HudGui);
 
-            // Crosshair
-            var cx = sw / 2; var cy = sh / 2;
-            DrawLine(cx - 8, cy, cx + 8, cy, 2, Color.white);
-            DrawLine(cx, cy - 8, cx, cy + 8, 2, Color.white);
+            // Crosshair (axis-aligned, no GUI matrix rotation)
+            var cx = Screen.width / 2; var cy = Screen.height / 2;
+            DrawRect(cx - 8, cy - 1, 16, 2, Color.white);
+            DrawRect(cx - 1, cy - 8, 2, 16, Color.white);
 
             // Health & Ammo
-            string health = TargetHealth != null ? $"HP: {Mathf.CeilToInt(TargetHealth.Current)}" : "HP: ?";
-            string ammo = TargetGun != null && TargetGun.State != null ? $"Ammo: {TargetGun.State.Mag}/{TargetGun.State.Reserve}" : "Ammo: ?";
+            GUI.Label(new Rect(10, 10, 200, 30), healthText);
+            GUI.Label(new Rect(10, 30, 200, 30), ammoText);
+            PerfLog.End(PerfLog.Section.HudGui);
+        }
+
+        void Bind()
+        {
+            Unbind();
+            boundHealth = TargetHealth;
+            boundAmmo = TargetGun != null ? TargetGun.State : null;
+            if (boundHealth != null) boundHealth.OnChanged += OnHealthChanged;
+            if (boundAmmo != null) boundAmmo.OnChanged += OnAmmoChanged;
+            OnHealthChanged(boundHealth != null ? boundHealth.Current : 0f);
+            OnAmmoChanged();
+        }
+
+        void Unbind()
+        {
+            if (boundHealth != null) boundHealth.OnChanged -= OnHealthChanged;
+            if (boundAmmo != null) boundAmmo.OnChanged -= OnAmmoChanged;
+            boundHealth = null;
+            boundAmmo = null;
+        }
+
+        void OnHealthChanged(float current)
+        {
+            healthText = boundHealth != null ? "HP: " + Mathf.CeilToInt(current) : "HP: ?";
+        }
 
-            GUI.Label(new Rect(10, 10, 200, 30), health);
-            GUI.Label(new Rect(10, 30, 200, 30), ammo);
+        void OnAmmoChanged()
+        {
+            ammoText = boundAmmo != null ? "Ammo: " + boundAmmo.Mag + "/" + boundAmmo.Reserve : "Ammo: ?";
         }
 
         static Texture2D _lineTex;
-        static void DrawLine(int x1, int y1, int x2, int y2, int thickness, Color color)
+        static void DrawRect(int x, int y, int w, int h, Color color)
         {
             if (_lineTex == null)
             {
@@ -760,15 +2941,140 @@ namespace UI
             }
             var savedColor = GUI.color;
             GUI.color = color;
-            Matrix4x4 saved = GUI.matrix;
+            GUI.DrawTexture(new Rect(x, y, w, h), _lineTex);
+            GUI.color = savedColor;
+        }
+    }
+}
+''',
 
-            float angle = Mathf.Atan2(y2 - y1, x2 - x1) * Mathf.Rad2Deg;
-            float length = Vector2.Distance(new Vector2(x1, y1), new Vector2(x2, y2));
+    "Assets/Scripts/UI/RetainedHUD.cs": r'''
+using UnityEngine;
+using UnityEngine.UI;
 
-            GUIUtility.RotateAroundPivot(angle, new Vector2(x1, y1));
-            GUI.DrawTexture(new Rect(x1, y1 - (thickness / 2), length, thickness), _lineTex);
-            GUI.matrix = saved;
-            GUI.color = savedColor;
+namespace UI
+{
+    // Retained uGUI HUD: crosshair + health + ammo built once on a screen-space canvas.
+    // No per-frame work: labels are rewritten only when Health.OnChanged / AmmoState.OnChanged fire.
+    public class RetainedHUD : MonoBehaviour
+    {
+        public Health TargetHealth;
+        public Weapons.HitscanGun TargetGun;
+
+        private GameObject canvasGo;
+        private Text healthLabel;
+        private Text ammoLabel;
+        private Health boundHealth;
+        private Weapons.AmmoState boundAmmo;
+        private int shownHealth = int.MinValue;
+
+        void Start()
+        {
+            BuildCanvas();
+            SetTargets(TargetHealth, TargetGun);
+        }
+
+        void OnDestroy()
+        {
+            Unbind();
+            if (canvasGo != null) Destroy(canvasGo);
+        }
+
+        // Rebinds to new targets (e.g. after respawn); safe to call at any time after Start
+        public void SetTargets(Health health, Weapons.HitscanGun gun)
+        {
+            Unbind();
+            TargetHealth = health;
+            TargetGun = gun;
+            boundHealth = health;
+            boundAmmo = gun != null ? gun.State : null;
+            if (boundHealth != null) boundHealth.OnChanged += OnHealthChanged;
+            if (boundAmmo != null) boundAmmo.OnChanged += OnAmmoChanged;
+            shownHealth = int.MinValue;
+            OnHealthChanged(boundHealth != null ? boundHealth.Current : 0f);
+            OnAmmoChanged();
+        }
+
+        void Unbind()
+        {
+            if (boundHealth != null) boundHealth.OnChanged -= OnHealthChanged;
+            if (boundAmmo != null) boundAmmo.OnChanged -= OnAmmoChanged;
+            boundHealth = null;
+            boundAmmo = null;
+        }
+
+        void OnHealthChanged(float current)
+        {
+            if (healthLabel == null) return;
+            if (boundHealth == null) { healthLabel.text = "HP: ?"; return; }
+            int hp = Mathf.CeilToInt(current);
+            if (hp == shownHealth) return;
+            shownHealth = hp;
+            healthLabel.text = "HP: " + hp;
+        }
+
+        void OnAmmoChanged()
+        {
+            if (ammoLabel == null) return;
+            ammoLabel.text = boundAmmo != null ? "Ammo: " + boundAmmo.Mag + "/" + boundAmmo.Reserve : "Ammo: ?";
+        }
+
+        void BuildCanvas()
+        {
+            canvasGo = new GameObject("HUDCanvas", typeof(Canvas), typeof(CanvasScaler));
+            canvasGo.transform.SetParent(transform, false);
+            var canvas = canvasGo.GetComponent<Canvas>();
+            canvas.renderMode = RenderMode.ScreenSpaceOverlay;
+            canvas.sortingOrder = 100;
+
+            // Crosshair: two static quads, never rebuilt
+            CreateBar("CrosshairH", new Vector2(16f, 2f));
+            CreateBar("CrosshairV", new Vector2(2f, 16f));
+
+            var font = BuiltinFont();
+            healthLabel = CreateLabel("Health", font, new Vector2(10f, -10f));
+            ammoLabel = CreateLabel("Ammo", font, new Vector2(10f, -30f));
+        }
+
+        void CreateBar(string name, Vector2 size)
+        {
+            var go = new GameObject(name, typeof(RectTransform), typeof(Image));
+            go.transform.SetParent(canvasGo.transform, false);
+            var rt = (RectTransform)go.transform;
+            rt.anchorMin = rt.anchorMax = new Vector2(0.5f, 0.5f);
+            rt.pivot = new Vector2(0.5f, 0.5f);
+            rt.anchoredPosition = Vector2.zero;
+            rt.sizeDelta = size;
+            var img = go.GetComponent<Image>();
+            img.color = Color.white;
+            img.raycastTarget = false;
+        }
+
+        Text CreateLabel(string name, Font font, Vector2 topLeft)
+        {
+            var go = new GameObject(name, typeof(RectTransform), typeof(Text));
+            go.transform.SetParent(canvasGo.transform, false);
+            var rt = (RectTransform)go.transform;
+            rt.anchorMin = rt.anchorMax = new Vector2(0f, 1f);
+            rt.pivot = new Vector2(0f, 1f);
+            rt.anchoredPosition = topLeft;
+            rt.sizeDelta = new Vector2(200f, 30f);
+            var text = go.GetComponent<Text>();
+            text.font = font;
+            text.fontSize = 14;
+            text.color = Color.white;
+            text.raycastTarget = false;
+            text.horizontalOverflow = HorizontalWrapMode.Overflow;
+            return text;
+        }
+
+        static Font BuiltinFont()
+        {
+#if UNITY_2022_2_OR_NEWER
+            return Resources.GetBuiltinResource<Font>("LegacyRuntime.ttf");
+#else
+            return Resources.GetBuiltinResource<Font>("Arial.ttf");
+#endif
         }
     }
 }
@@ -778,6 +3084,10 @@ namespace UI
 {
   "width": 12,
   "height": 12,
+  "spawns": {
+    "player": [{ "x": 2, "y": 2 }],
+    "enemies": [{ "x": 9, "y": 1 }, { "x": 6, "y": 2 }, { "x": 10, "y": 3 }, { "x": 1, "y": 4 }, { "x": 4, "y": 4 }, { "x": 8, "y": 5 }, { "x": 3, "y": 6 }, { "x": 6, "y": 7 }, { "x": 2, "y": 8 }, { "x": 9, "y": 8 }, { "x": 1, "y": 9 }, { "x": 5, "y": 10 }]
+  },
   "cells": [
     { "type": "wall" }, { "type": "wall" }, { "type": "wall" }, { "type": "wall" }, { "type": "wall" }, { "type": "wall" }, { "type": "wall" }, { "type": "wall" }, { "type": "wall" }, { "type": "wall" }, { "type": "wall" }, { "type": "wall" },
     { "type": "wall" }, { "type": "floor" }, { "type": "floor" }, { "type": "floor" }, { "type": "floor" }, { "type": "door" }, { "type": "floor" }, { "type": "floor" }, { "type": "floor" }, { "type": "enemy" }, { "type": "floor" }, { "type": "wall" },
@@ -808,6 +3118,7 @@ namespace UI
       "reloadTime": 1.7,
       "range": 110,
       "spreadDegrees": 1.2,
+      "pellets": 1,
       "isHitscan": true
     }
   ]
@@ -817,33 +3128,465 @@ namespace UI
     "Tools/map_generator.py": r'''
 #!/usr/bin/env python3
 # Simple optional map generator to produce a new JSON grid.
+# --chunked switches to a counter-based generator: every cell is drawn from a hash keyed by
+# (seed, x, y), so any chunk of an arbitrarily large map is a pure function of (seed, chunk_x, chunk_y)
+# and comes out identical whatever the chunk size, order or worker process that produced it.
+# --style cave grows an open cave with a NumPy cellular automaton (random fill + 3x3 smoothing,
+# small pockets and pillars removed); NumPy is only imported for that style.
+# --floors N adds storeys above the ground grid, stored sparsely as per-storey run-length codes
+# ("floors": [{"z": 1, "runs": [code, count, ...]}]); code 0 = empty (no geometry).
+# Every style produces the map once as row-major cell codes; export() then streams it row by row to
+# the requested sinks in a single pass: the level JSON (--out), a compact text grid (--grid), a
+# stats/validation report (--stats) and a PNG preview (--preview).
 
 import argparse, json, random
+from concurrent.futures import ProcessPoolExecutor
 
-def gen(w, h, seed=None):
+CODES = {"wall": 1, "floor": 2, "door": 3, "enemy": 4, "player": 5}
+EMPTY = 0
+NAMES = {v: k for k, v in CODES.items()}
+
+DOOR_RATE = 1 / 50    # same densities as gen(): (w*h)//50 doors, (w*h)//20 enemy attempts
+ENEMY_RATE = 1 / 20
+
+def gen_grid(w, h, seed=None):
+    # Rooms style as row-major cell codes
     rnd = random.Random(seed)
-    cells = []
+    cells = bytearray(w * h)
     for y in range(h):
         for x in range(w):
             if x == 0 or y == 0 or x == w-1 or y == h-1:
-                t = "wall"
+                cells[y*w + x] = CODES["wall"]
             else:
-                t = "floor"
-            cells.append({"type": t})
+                cells[y*w + x] = CODES["floor"]
     # place player
     px, py = rnd.randint(1, w-2), rnd.randint(1, h-2)
-    cells[py*w + px]["type"] = "player"
+    cells[py*w + px] = CODES["player"]
     # place doors
     for _ in range(max(2, (w*h)//50)):
         dx, dy = rnd.randint(1, w-2), rnd.randint(1, h-2)
-        cells[dy*w + dx]["type"] = "door"
+        cells[dy*w + dx] = CODES["door"]
     # place enemies
     for _ in range(max(5, (w*h)//20)):
         ex, ey = rnd.randint(1, w-2), rnd.randint(1, h-2)
         idx = ey*w + ex
-        if cells[idx]["type"] == "floor":
-            cells[idx]["type"] = "enemy"
-    return {"width": w, "height": h, "cells": cells}
+        if cells[idx] == CODES["floor"]:
+            cells[idx] = CODES["enemy"]
+    return bytes(cells)
+
+def gen(w, h, seed=None):
+    grid = gen_grid(w, h, seed)
+    cells = [{"type": NAMES[c]} for c in grid]
+    return {"width": w, "height": h, "spawns": spawn_table(grid, w), "cells": cells}
+
+def spawn_table(grid, w):
+    # Explicit spawn list so LevelBuilder/EnemyFactory never have to scan the grid for markers
+    spawns = {"player": [], "enemies": []}
+    for code, key in ((CODES["player"], "player"), (CODES["enemy"], "enemies")):
+        idx = grid.find(code)
+        while idx >= 0:
+            spawns[key].append({"x": idx % w, "y": idx // w})
+            idx = grid.find(code, idx + 1)
+    return spawns
+
+# --- storeys ---
+
+def rle(codes):
+    # [code, count, code, count, ...] over row-major cell codes (bytes or a NumPy array)
+    if hasattr(codes, "dtype"):
+        import numpy as np
+        flat = codes.ravel()
+        starts = np.flatnonzero(np.r_[True, flat[1:] != flat[:-1]])
+        counts = np.diff(np.r_[starts, flat.size])
+        return np.stack([flat[starts].astype(np.int64), counts], axis=1).ravel().tolist()
+    runs = []
+    for c in codes:
+        if runs and runs[-2] == c:
+            runs[-1] += 1
+        else:
+            runs += [c, 1]
+    return runs
+
+def gen_storey(w, h, rnd):
+    # Upper storey for the rooms style: a few floor platforms (walled on the map border) over empty space
+    cells = bytearray(w * h)
+    for _ in range(max(1, (w * h) // 64)):
+        pw, ph = rnd.randint(2, max(2, w // 3)), rnd.randint(2, max(2, h // 3))
+        px, py = rnd.randint(0, w - pw), rnd.randint(0, h - ph)
+        for y in range(py, py + ph):
+            for x in range(px, px + pw):
+                border = x == 0 or y == 0 or x == w-1 or y == h-1
+                cells[y * w + x] = CODES["wall"] if border else CODES["floor"]
+    for idx in range(w * h):
+        if cells[idx] == CODES["floor"] and rnd.random() < ENEMY_RATE / 4:
+            cells[idx] = CODES["enemy"]
+    return cells
+
+def storey_spawns(codes, w, z, spawns):
+    # Adds the enemy markers of storey z to the spawn table
+    for idx, c in enumerate(codes):
+        if c == CODES["enemy"]:
+            spawns["enemies"].append({"x": idx % w, "y": idx // w, "z": z})
+
+# --- counter-based (chunked) generation ---
+
+MASK64 = (1 << 64) - 1
+MASK32 = (1 << 32) - 1
+
+def mix64(z):
+    # splitmix64 finalizer
+    z = (z + 0x9E3779B97F4A7C15) & MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+    return z ^ (z >> 31)
+
+def key_hash(seed, stream, x):
+    # Partial key (seed, stream, x); finish with cell_unit(partial, y). Negative coordinates wrap to 32 bits.
+    return mix64(mix64((seed & MASK64) ^ (stream << 56)) ^ (x & MASK32))
+
+def cell_unit(partial, y):
+    # Uniform float in [0, 1) for (partial key, y)
+    return (mix64(partial ^ ((y & MASK32) << 32)) >> 11) * (1.0 / (1 << 53))
+
+STREAM_CELL, STREAM_PLAYER_X, STREAM_PLAYER_Y = 1, 2, 3
+
+def player_cell(seed, w, h):
+    ux = cell_unit(key_hash(seed, STREAM_PLAYER_X, 0), 0)
+    uy = cell_unit(key_hash(seed, STREAM_PLAYER_Y, 0), 0)
+    return 1 + int(ux * (w - 2)), 1 + int(uy * (h - 2))
+
+def gen_chunk(seed, cx, cy, size, w=None, h=None):
+    # Cell codes (row-major bytes, size*size) of chunk (cx, cy). With w/h the map is bounded: border
+    # cells are walls, cells past the edge are 0 and the player spawn is placed; without them the
+    # world is unbounded (no border, no player), as used by the chunk server.
+    out = bytearray(size * size)
+    x0, y0 = cx * size, cy * size
+    bounded = w is not None
+    player = player_cell(seed, w, h) if bounded else None
+    for lx in range(size):
+        x = x0 + lx
+        if bounded and not 0 <= x < w:
+            continue
+        partial = key_hash(seed, STREAM_CELL, x)
+        for ly in range(size):
+            y = y0 + ly
+            if bounded:
+                if not 0 <= y < h:
+                    continue
+                if x == 0 or y == 0 or x == w - 1 or y == h - 1:
+                    out[ly * size + lx] = CODES["wall"]
+                    continue
+            u = cell_unit(partial, y)
+            if u < DOOR_RATE:
+                code = CODES["door"]
+            elif u < DOOR_RATE + ENEMY_RATE:
+                code = CODES["enemy"]
+            else:
+                code = CODES["floor"]
+            out[ly * size + lx] = code
+    if bounded and x0 <= player[0] < x0 + size and y0 <= player[1] < y0 + size:
+        out[(player[1] - y0) * size + (player[0] - x0)] = CODES["player"]
+    return bytes(out)
+
+def _chunk_job(args):
+    return args[1], args[2], gen_chunk(*args)
+
+def gen_grid_chunked(w, h, seed, chunk=32, workers=1):
+    # Whole bounded map as row-major cell codes, assembled from independently generated chunks
+    jobs = [(seed, cx, cy, chunk, w, h)
+            for cy in range((h + chunk - 1) // chunk) for cx in range((w + chunk - 1) // chunk)]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            parts = list(ex.map(_chunk_job, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+    else:
+        parts = [_chunk_job(j) for j in jobs]
+    grid = bytearray(w * h)
+    for cx, cy, data in parts:
+        x0, y0 = cx * chunk, cy * chunk
+        cw = min(chunk, w - x0)
+        for ly in range(min(chunk, h - y0)):
+            row = (y0 + ly) * w + x0
+            grid[row:row + cw] = data[ly * chunk:ly * chunk + cw]
+    return bytes(grid)
+
+def gen_chunked(w, h, seed, chunk=32, workers=1):
+    grid = gen_grid_chunked(w, h, seed, chunk, workers)
+    cells = [{"type": NAMES[c]} for c in grid]
+    return {"width": w, "height": h, "spawns": spawn_table(grid, w), "cells": cells}
+
+# --- cellular-automaton caves (NumPy) ---
+
+def smooth(solid, iterations):
+    # 4-5 rule: a cell becomes wall with more than 4 wall neighbours, stays as it is with exactly 4.
+    # Neighbour counts are summed from 8 shifted views of the padded grid (outside counts as wall).
+    import numpy as np
+    for _ in range(iterations):
+        p = np.pad(solid, 1, constant_values=True).view(np.uint8)
+        n = (p[:-2, :-2] + p[:-2, 1:-1] + p[:-2, 2:] + p[1:-1, :-2] + p[1:-1, 2:]
+             + p[2:, :-2] + p[2:, 1:-1] + p[2:, 2:])
+        solid = (n > 4) | ((n == 4) & solid)
+    return solid
+
+def label(mask):
+    # 4-connected components of a boolean grid: (labels, sizes), label 0 = outside the mask.
+    # Uses scipy.ndimage when installed; otherwise labels horizontal runs, links runs that overlap
+    # vertically and merges them with min-label hooking plus pointer jumping (a few passes).
+    import numpy as np
+    try:
+        from scipy import ndimage
+    except ImportError:
+        ndimage = None
+    if ndimage is not None:
+        labels, _ = ndimage.label(mask)
+        return labels, np.bincount(labels.ravel())
+    starts = mask.copy()
+    starts[:, 1:] &= ~mask[:, :-1]
+    run = np.cumsum(starts.ravel(), dtype=np.int32).reshape(mask.shape)
+    run[~mask] = 0
+    # One link per pair of overlapping runs: the first column of each overlap
+    both = mask[:-1] & mask[1:]
+    link = both.copy()
+    link[:, 1:] &= ~both[:, :-1] | starts[:-1, 1:] | starts[1:, 1:]
+    a, b = run[:-1][link], run[1:][link]
+    parent = np.arange(int(run.max()) + 1, dtype=np.int32)
+    while True:
+        pa, pb = parent[a], parent[b]
+        split = pa != pb
+        if not split.any():
+            break
+        a, b, pa, pb = a[split], b[split], pa[split], pb[split]
+        np.minimum.at(parent, np.maximum(pa, pb), np.minimum(pa, pb))
+        while True:
+            jumped = parent[parent]
+            if np.array_equal(jumped, parent):
+                break
+            parent = jumped
+    labels = parent[run]
+    return labels, np.bincount(labels.ravel())
+
+def gen_cave_grid(w, h, seed, fill=0.45, iterations=5, min_region=32):
+    # Row-major uint8 cell codes (h, w) plus the label mask of the largest cavern
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    solid = rng.random((h, w), dtype=np.float32) < fill
+    solid = smooth(solid, iterations)
+    solid[0, :] = solid[-1, :] = solid[:, 0] = solid[:, -1] = True
+    # Fill pockets too small to play in, then clear pillars too small to matter
+    labels, sizes = label(~solid)
+    sizes[0] = 0
+    solid |= (sizes < min_region)[labels]
+    main = labels == sizes.argmax() if sizes.max() >= min_region else np.zeros_like(solid)
+    labels, sizes = label(solid)
+    small = sizes < min_region
+    small[labels[0, 0]] = small[0] = False   # the border ring is never removed
+    pillars = small[labels]
+    solid &= ~pillars
+    main |= pillars
+    grid = np.where(solid, CODES["wall"], CODES["floor"]).astype(np.uint8)
+    return grid, main
+
+def gen_cave_storey(w, h, seed, z, fill=0.45, iterations=5, min_region=32, enemy_rate=ENEMY_RATE / 10):
+    # Upper cave storey: only the open cells become floor (ledges over the storey below), rock stays empty
+    import numpy as np
+    grid, _ = gen_cave_grid(w, h, [seed, z], fill, iterations, min_region)
+    rng = np.random.default_rng([seed, z, 1])
+    grid[grid == CODES["wall"]] = EMPTY
+    grid[(grid == CODES["floor"]) & (rng.random(grid.shape) < enemy_rate)] = CODES["enemy"]
+    return grid
+
+def gen_cave(w, h, seed, fill=0.45, iterations=5, min_region=32, enemy_rate=ENEMY_RATE / 10):
+    # Cell codes (h, w) and spawn table: the player starts in the largest cavern, enemies on open cells
+    import numpy as np
+    grid, main = gen_cave_grid(w, h, seed, fill, iterations, min_region)
+    rng = np.random.default_rng([seed, 1])
+    spawns = {"player": [], "enemies": []}
+    candidates = np.flatnonzero(main)
+    if candidates.size == 0:
+        print("warning: no open cavern - lower --fill or --min-region")
+        return grid, spawns
+    player = int(candidates[rng.integers(candidates.size)])
+    open_cells = np.flatnonzero(grid.ravel() == CODES["floor"])
+    enemies = open_cells[(rng.random(open_cells.size) < enemy_rate) & (open_cells != player)]
+    grid.ravel()[player] = CODES["player"]
+    grid.ravel()[enemies] = CODES["enemy"]
+    spawns["player"].append({"x": player % w, "y": player // w})
+    ey, ex = np.divmod(enemies, w)
+    spawns["enemies"] = [{"x": x, "y": y} for x, y in zip(ex.tolist(), ey.tolist())]
+    return grid, spawns
+
+# --- export pipeline ---
+
+def make_level(args):
+    # The map, generated once: width, height, grid (row-major ground codes), spawns, floors ({z: codes}
+    # of the other storeys) and storeyHeight
+    w, h = args.width, args.height
+    floors = {}
+    if args.style == "cave":
+        grid, spawns = gen_cave(w, h, args.seed, args.fill, args.iterations, args.min_region)
+        for z in range(1, args.floors):
+            floors[z] = gen_cave_storey(w, h, args.seed, z, args.fill, args.iterations, args.min_region)
+        grid = grid.tobytes()
+    else:
+        if args.chunked:
+            grid = gen_grid_chunked(w, h, args.seed, args.chunk_size, args.workers)
+        else:
+            grid = gen_grid(w, h, args.seed)
+        spawns = spawn_table(grid, w)
+        # One random stream per storey: the ground grid is the same as with --floors 1
+        for z in range(1, args.floors):
+            floors[z] = gen_storey(w, h, random.Random("%s/%d" % (args.seed, z)))
+    for z in sorted(floors):
+        storey_spawns(bytes(floors[z]), w, z, spawns)
+    return {"width": w, "height": h, "grid": grid, "spawns": spawns, "floors": floors,
+            "storeyHeight": args.storey_height}
+
+class Sink:
+    # One output of export(): begin(level) once, row(y, codes) for every ground row (y = 0 first, codes =
+    # bytes of that row's cell codes), then end(), which returns the sink's summary (or None)
+    path = None
+
+    def begin(self, level):
+        pass
+
+    def row(self, y, codes):
+        pass
+
+    def end(self):
+        return None
+
+def export(level, sinks):
+    # The single pass: each ground row is sliced once and handed to every sink
+    grid, w = level["grid"], level["width"]
+    for sink in sinks:
+        sink.begin(level)
+    for y in range(level["height"]):
+        codes = grid[y * w:(y + 1) * w]
+        for sink in sinks:
+            sink.row(y, codes)
+    return [sink.end() for sink in sinks]
+
+class JsonSink(Sink):
+    # The LevelData JSON, written straight from the cell codes: one pre-serialized token per code joined
+    # row by row, so huge grids never become per-cell dicts. Other storeys are written as runs.
+    TOKENS = [json.dumps({"type": NAMES.get(c, "floor")}, separators=(",", ":")) for c in range(256)]
+
+    def __init__(self, path):
+        self.path = path
+
+    def begin(self, level):
+        self.h = level["height"]
+        self.f = open(self.path, "w", encoding="utf-8")
+        self.f.write('{"width":%d,"height":%d,"spawns":' % (level["width"], level["height"]))
+        json.dump(level["spawns"], self.f, separators=(",", ":"))
+        floors = level["floors"]
+        if floors:
+            self.f.write(',"storeyHeight":%s,"floors":[' % json.dumps(level["storeyHeight"]))
+            for i, z in enumerate(sorted(floors)):
+                self.f.write('%s\n{"z":%d,"runs":' % ("," if i else "", z))
+                json.dump(rle(floors[z]), self.f, separators=(",", ":"))
+                self.f.write("}")
+            self.f.write("]")
+        self.f.write(',"cells":[\n')
+
+    def row(self, y, codes):
+        self.f.write(",".join([self.TOKENS[c] for c in codes]))
+        self.f.write(",\n" if y < self.h - 1 else "\n")
+
+    def end(self):
+        self.f.write("]}\n")
+        self.f.close()
+
+class GridSink(Sink):
+    # Compact text grid, one character per cell and one line per row (y = 0 first), ground storey then
+    # each upper storey: "FPSGRID 1 <width> <height> <storeys>", then per storey "z <z>" and its rows.
+    GLYPHS = {0: " ", 1: "#", 2: ".", 3: "D", 4: "E", 5: "P"}
+    TABLE = bytes.maketrans(bytes(GLYPHS), "".join(GLYPHS.values()).encode("ascii"))
+
+    def __init__(self, path):
+        self.path = path
+
+    def begin(self, level):
+        self.level = level
+        self.f = open(self.path, "wb")
+        self.f.write(b"FPSGRID 1 %d %d %d\nz 0\n" % (level["width"], level["height"], 1 + len(level["floors"])))
+
+    def row(self, y, codes):
+        self.f.write(codes.translate(self.TABLE) + b"\n")
+
+    def end(self):
+        w = self.level["width"]
+        for z, codes in sorted(self.level["floors"].items()):
+            data = bytes(codes).translate(self.TABLE)
+            self.f.write(b"z %d\n" % z)
+            self.f.write(b"".join(data[i:i + w] + b"\n" for i in range(0, len(data), w)))
+        self.f.close()
+
+class StatsSink(Sink):
+    # Cell counts and a validation report: exactly one player, a closed wall border on the ground storey,
+    # and a spawn table that matches the enemy/player cells. Written as JSON to path when given.
+    def __init__(self, path=None):
+        self.path = path
+
+    def begin(self, level):
+        self.level = level
+        self.counts = [0] * 256
+        self.open_border = []
+        self.w, self.h = level["width"], level["height"]
+
+    def row(self, y, codes):
+        for c in set(codes):
+            self.counts[c] += codes.count(c)
+        wall = CODES["wall"]
+        if (codes.count(wall) != self.w) if y in (0, self.h - 1) else (codes[0] != wall or codes[-1] != wall):
+            self.open_border.append(y)
+
+    def end(self):
+        level, counts = self.level, self.counts
+        cells = {NAMES.get(c, "empty" if c == EMPTY else str(c)): n for c, n in enumerate(counts) if n}
+        storeys = {}
+        for z, codes in sorted(level["floors"].items()):
+            data = bytes(codes)
+            storeys[z] = {NAMES.get(c, "empty" if c == EMPTY else str(c)): data.count(c) for c in set(data)}
+        spawns = level["spawns"]
+        ground_enemies = sum(1 for e in spawns["enemies"] if not e.get("z"))
+        problems = []
+        if counts[CODES["player"]] != 1:
+            problems.append("%d player cells (expected 1)" % counts[CODES["player"]])
+        if len(spawns["player"]) != counts[CODES["player"]]:
+            problems.append("spawn table lists %d players, grid has %d" % (len(spawns["player"]), counts[CODES["player"]]))
+        if ground_enemies != counts[CODES["enemy"]]:
+            problems.append("spawn table lists %d ground enemies, grid has %d" % (ground_enemies, counts[CODES["enemy"]]))
+        if self.open_border:
+            problems.append("border not closed on %d rows (first: y = %d)" % (len(self.open_border), self.open_border[0]))
+        walkable = sum(counts[c] for c in (CODES["floor"], CODES["door"], CODES["enemy"], CODES["player"]))
+        report = {"width": self.w, "height": self.h, "storeys": 1 + len(storeys), "cells": cells,
+                  "upper_storeys": storeys, "walkable_fraction": walkable / float(self.w * self.h),
+                  "enemies": len(spawns["enemies"]), "valid": not problems, "problems": problems}
+        if self.path:
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+        return report
+
+class PreviewSink(Sink):
+    # PNG of the ground storey drawn by Tools/map_thumbnails.py (same palette, block reduction and encoder;
+    # requires NumPy, imported only when a preview is asked for), north up (row y = 0 at the bottom)
+    def __init__(self, path, size=128):
+        self.path = path
+        self.size = size
+
+    def begin(self, level):
+        self.shape = (level["height"], level["width"])
+        self.cells = bytearray()
+
+    def row(self, y, codes):
+        self.cells += codes
+
+    def end(self):
+        import numpy as np
+        from map_thumbnails import encode_png, render
+        grid = np.frombuffer(self.cells, dtype=np.uint8).reshape(self.shape)[::-1]
+        with open(self.path, "wb") as f:
+            f.write(encode_png(render([(0, grid)], self.size)))
 
 def main():
     ap = argparse.ArgumentParser()
@@ -851,94 +3594,2426 @@ def main():
     ap.add_argument("--height", type=int, default=16)
     ap.add_argument("--seed", type=int, default=42)
     ap.add_argument("--out", type=str, default="Assets/StreamingAssets/Configs/level1.json")
+    ap.add_argument("--chunked", action="store_true",
+                    help="counter-based generation: chunks independent of map size, order and worker")
+    ap.add_argument("--chunk-size", type=int, default=32)
+    ap.add_argument("--workers", type=int, default=1, help="processes for --chunked")
+    ap.add_argument("--style", choices=("rooms", "cave"), default="rooms")
+    ap.add_argument("--fill", type=float, default=0.45, help="cave: initial wall probability")
+    ap.add_argument("--iterations", type=int, default=5, help="cave: smoothing passes")
+    ap.add_argument("--min-region", type=int, default=32, help="cave: smallest pocket/pillar kept, in cells")
+    ap.add_argument("--floors", type=int, default=1, help="storeys, including the ground grid")
+    ap.add_argument("--storey-height", type=float, default=3.0)
+    ap.add_argument("--grid", type=str, default=None, help="also write a compact text grid (one character per cell)")
+    ap.add_argument("--stats", type=str, default=None, help="also write a JSON stats/validation report ('-': print it)")
+    ap.add_argument("--preview", type=str, default=None, help="also write a PNG preview")
+    ap.add_argument("--preview-size", type=int, default=128, help="longest side of the preview, in pixels")
+    args = ap.parse_args()
+    sinks = [JsonSink(args.out)]
+    if args.grid:
+        sinks.append(GridSink(args.grid))
+    if args.preview:
+        sinks.append(PreviewSink(args.preview, args.preview_size))
+    if args.stats:
+        sinks.append(StatsSink(None if args.stats == "-" else args.stats))
+    results = export(make_level(args), sinks)
+    for sink, result in zip(sinks, results):
+        if sink.path:
+            print("Wrote", sink.path)
+        if isinstance(sink, StatsSink):
+            if args.stats == "-":
+                print(json.dumps(result, indent=2))
+            for problem in result["problems"]:
+                print("warning:", problem)
+
+if __name__ == "__main__":
+    main()
+''',
+
+    "Tools/combat_sim.py": r'''
+#!/usr/bin/env python3
+# Headless combat simulator for balance testing (requires NumPy).
+# Runs many seeded encounters at once on NumPy arrays, mirroring the generated C# logic:
+# ChaserAI (straight-line chase through walls, touch damage with cooldown), EnemyFactory spawn order,
+# HitscanGun (fire rate, per-axis spread, pellets, range, auto reload on empty mag) and Health.
+# Assumptions: the player stands on the spawn, always aims at the nearest visible enemy in range,
+# and holds fire whenever one exists. Walls/doors block shots, sampled on a sub-tile grid.
+
+import argparse, json, math
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+TILE = 2.0            # LevelBuilder.Tile
+ENEMY_RADIUS = 0.5    # capsule primitive
+ENEMY_HALF_HEIGHT = 1.0
+CHUNK = 1024          # runs per RNG stream; results do not depend on --workers
+CODES = {"wall": 1, "floor": 2, "door": 3, "enemy": 4, "player": 5}
+
+# HitscanGun field defaults, overridden by weapons.json
+WEAPON_DEFAULTS = {"id": "default", "damage": 20.0, "fireRate": 9.0, "magSize": 30, "reserveAmmo": 120,
+                   "reloadTime": 1.7, "range": 110.0, "spreadDegrees": 1.2,
+                   "pellets": 1}
+
+def load_level(path):
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    w, h = data["width"], data["height"]
+    grid = np.array([CODES.get(c.get("type"), 2) for c in data["cells"]], dtype=np.uint8).reshape(h, w)
+    spawns = data.get("spawns") or {}
+    players = [(p["x"], p["y"]) for p in spawns.get("player") or []]
+    enemies = [(p["x"], p["y"]) for p in spawns.get("enemies") or []]
+    # Same rules as LevelBuilder: table entries inside walls are dropped, missing tables fall back to cells
+    solid = (grid == 1) | (grid == 3)
+    ok = lambda p: 0 <= p[0] < w and 0 <= p[1] < h and not solid[p[1], p[0]]
+    if players:
+        players = [p for p in players if ok(p)]
+    else:
+        players = [(int(x), int(y)) for y, x in zip(*np.nonzero(grid == 5))]
+    if enemies:
+        enemies = [p for p in enemies if ok(p)]
+    else:
+        enemies = [(int(x), int(y)) for y, x in zip(*np.nonzero(grid == 4))]
+    oy, ox = np.nonzero(~solid)
+    return {
+        "grid": grid,
+        "solid": solid,
+        "player": np.array(players[0] if players else (1, 1), dtype=float) * TILE,
+        "enemies": np.array(enemies, dtype=float).reshape(-1, 2) * TILE,
+        "open": np.stack([ox, oy], axis=1).astype(float) * TILE,
+    }
+
+def load_weapon(path, weapon_id=None):
+    weapon = dict(WEAPON_DEFAULTS)
+    if path:
+        with open(path, encoding="utf-8") as f:
+            entries = json.load(f).get("weapons") or []
+        if weapon_id:
+            entries = [e for e in entries if e.get("id") == weapon_id]
+            if not entries:
+                raise SystemExit("weapon %r not found in %s" % (weapon_id, path))
+        if entries:
+            weapon.update({k: v for k, v in entries[0].items() if k in weapon})
+    return weapon
+
+def visibility_field(level, res):
+    # vis[j, i]: a ray from the player spawn reaches world point ((i + .5) / res - .5) * TILE, ... unblocked
+    solid = level["solid"]
+    h, w = solid.shape
+    gx = ((np.arange(w * res) + 0.5) / res - 0.5) * TILE
+    gy = ((np.arange(h * res) + 0.5) / res - 0.5) * TILE
+    px, py = level["player"]
+    vis = np.zeros((h * res, w * res), dtype=bool)
+    steps = int(math.ceil(math.hypot(w, h) * TILE / 0.25)) + 1
+    t = np.linspace(0.0, 1.0, steps)[None, :]
+    for j in range(h * res):
+        sx = px + (gx[:, None] - px) * t
+        sy = py + (gy[j] - py) * t
+        cx = np.floor(sx / TILE + 0.5).astype(np.int64)
+        cy = np.floor(sy / TILE + 0.5).astype(np.int64)
+        inside = (cx >= 0) & (cx < w) & (cy >= 0) & (cy < h)
+        blocked = ~inside | solid[np.clip(cy, 0, h - 1), np.clip(cx, 0, w - 1)]
+        vis[j] = ~blocked.any(axis=1)
+    return vis
+
+def simulate_chunk(level, vis, res, weapon, p, runs, seed_seq):
+    rng = np.random.default_rng(seed_seq)
+    E, dt = p.enemies, p.dt
+    R = runs
+    rows = np.arange(R)
+    player = level["player"]
+
+    # EnemyFactory: spawn index in order, then random open cells
+    spawn = level["enemies"][:E]
+    pos = np.broadcast_to(spawn, (R, len(spawn), 2)).copy()
+    if len(spawn) < E:
+        pick = rng.integers(0, len(level["open"]), size=(R, E - len(spawn)))
+        pos = np.concatenate([pos, level["open"][pick]], axis=1)
+    speed = rng.uniform(p.move_speed[0], p.move_speed[1], size=(R, E))
+    ehp = np.full((R, E), p.enemy_health)
+    next_attack = np.zeros((R, E))
+    kill_time = np.full((R, E), np.nan)
+
+    php = np.full(R, p.player_health)
+    mag = np.full(R, int(weapon["magSize"]))
+    reserve = np.full(R, int(weapon["reserveAmmo"]))
+    next_fire = np.zeros(R)
+    reload_done = np.full(R, np.inf)
+    shots = np.zeros(R, dtype=np.int64)
+    hits = np.zeros(R, dtype=np.int64)
+    done = np.zeros(R, dtype=bool)
+    clear_time = np.full(R, np.nan)
+    death_time = np.full(R, np.nan)
+
+    spread = float(weapon["spreadDegrees"])
+    pellets = max(1, int(weapon["pellets"]))
+    interval = 1.0 / max(0.01, float(weapon["fireRate"]))
+    vh, vw = vis.shape
+
+    for step in range(int(p.max_time / dt)):
+        t = step * dt
+        if done.all():
+            break
+        active = ~done
+
+        # ChaserAI.Update: distance before moving decides the attack
+        alive = (ehp > 0) & active[:, None]
+        to = player - pos
+        dist = np.hypot(to[..., 0], to[..., 1])
+        move = alive & (dist > 0.1)
+        pos += to * np.where(move, speed * dt / np.maximum(dist, 1e-9), 0.0)[..., None]
+        attack = alive & (dist <= p.touch_range) & (t >= next_attack)
+        php -= p.enemy_damage * attack.sum(axis=1)
+        next_attack = np.where(attack, t + p.attack_cooldown, next_attack)
+        died = active & (php <= 0)
+        death_time[died] = t
+        done |= died
+        active = ~done
+
+        # HitscanGun: Invoke(FinishReload) lands on the first frame after reloadTime
+        fin = active & (reload_done <= t)
+        load = np.minimum(int(weapon["magSize"]) - mag, reserve)
+        mag = np.where(fin, mag + load, mag)
+        reserve = np.where(fin, reserve - load, reserve)
+        reload_done[fin] = np.inf
+        reloading = reload_done < np.inf
+
+        to = player - pos
+        dist = np.hypot(to[..., 0], to[..., 1])
+        ix = np.clip(np.floor((pos[..., 0] / TILE + 0.5) * res).astype(np.int64), 0, vw - 1)
+        iy = np.clip(np.floor((pos[..., 1] / TILE + 0.5) * res).astype(np.int64), 0, vh - 1)
+        cand = alive & vis[iy, ix] & (dist <= float(weapon["range"]))
+        tgt = np.argmin(np.where(cand, dist, np.inf), axis=1)
+        want = active & ~reloading & cand.any(axis=1) & (t >= next_fire)
+
+        # TryFire on an empty mag starts a reload instead of shooting
+        empty = want & (mag <= 0) & (reserve > 0)
+        reload_done[empty] = t + float(weapon["reloadTime"])
+        fire = want & (mag > 0)
+        # Every pellet gets its own spread; ShotBatch calls Damage once per pellet that lands and DamageQueue
+        # merges them into one hit per target per frame, so the landed pellets are summed here
+        d = np.maximum(dist[rows, tgt], 1e-3)[:, None]
+        yaw = rng.uniform(-spread, spread, (R, pellets))
+        pitch = rng.uniform(-spread, spread, (R, pellets))
+        landed = ((np.abs(yaw) < np.degrees(np.arctan(ENEMY_RADIUS / d)))
+                  & (np.abs(pitch) < np.degrees(np.arctan(ENEMY_HALF_HEIGHT / d)))).sum(axis=1) * fire
+        hit = landed > 0
+        before = ehp[rows[hit], tgt[hit]] > 0
+        ehp[rows[hit], tgt[hit]] -= float(weapon["damage"]) * landed[hit]
+        killed = before & (ehp[rows[hit], tgt[hit]] <= 0)
+        kill_time[rows[hit][killed], tgt[hit][killed]] = t
+        mag = mag - fire
+        next_fire = np.where(fire, t + interval, next_fire)
+        shots += fire
+        hits += landed
+
+        cleared = active & ~(ehp > 0).any(axis=1)
+        clear_time[cleared] = t
+        done |= cleared
+
+    return {"clear": clear_time, "death": death_time, "hp": np.maximum(php, 0.0),
+            "kills": kill_time.ravel(), "shots": shots, "hits": hits}
+
+def _run_chunk(args):
+    return simulate_chunk(*args)
+
+def run(level, weapon, p):
+    vis = visibility_field(level, p.res)
+    sizes = [min(CHUNK, p.runs - i) for i in range(0, p.runs, CHUNK)]
+    seeds = np.random.SeedSequence(p.seed).spawn(len(sizes))
+    jobs = [(level, vis, p.res, weapon, p, n, s) for n, s in zip(sizes, seeds)]
+    if p.workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=p.workers) as ex:
+            parts = list(ex.map(_run_chunk, jobs))
+    else:
+        parts = [_run_chunk(j) for j in jobs]
+    return {k: np.concatenate([part[k] for part in parts]) for k in parts[0]}
+
+def percentiles(values):
+    values = values[~np.isnan(values)]
+    if values.size == 0:
+        return None
+    qs = (5, 25, 50, 75, 95)
+    return dict(zip(["p%d" % q for q in qs], np.percentile(values, qs).round(3).tolist()),
+                mean=round(float(values.mean()), 3), n=int(values.size))
+
+def summarize(res, weapon, p):
+    survived = ~np.isnan(res["clear"])
+    shots = int(res["shots"].sum())
+    rays = shots * max(1, int(weapon["pellets"]))
+    return {
+        "runs": p.runs, "seed": p.seed, "weapon": weapon["id"], "enemies": p.enemies,
+        "survival": round(float(survived.mean()), 4),
+        "time_to_clear": percentiles(res["clear"]),
+        "time_to_death": percentiles(res["death"]),
+        "enemy_time_to_kill": percentiles(res["kills"]),
+        "player_hp_left": percentiles(np.where(survived, res["hp"], np.nan)),
+        "timeouts": int((np.isnan(res["clear"]) & np.isnan(res["death"])).sum()),
+        "accuracy": round(res["hits"].sum() / rays, 4) if rays else None,   # per pellet
+        "shots_per_run": round(shots / p.runs, 2),
+    }
+
+def histogram(values, bins=12, width=40):
+    values = values[~np.isnan(values)]
+    if values.size == 0:
+        return []
+    counts, edges = np.histogram(values, bins=bins)
+    top = max(1, counts.max())
+    return ["  %7.2f-%-7.2f %s %d" % (edges[i], edges[i + 1], "#" * int(width * c / top), c)
+            for i, c in enumerate(counts)]
+
+def main():
+    ap = argparse.ArgumentParser(description="Seeded headless encounters: level JSON + weapons.json.")
+    ap.add_argument("--level", type=str, default="Assets/StreamingAssets/Configs/level1.json")
+    ap.add_argument("--weapons", type=str, default="Assets/StreamingAssets/Configs/weapons.json")
+    ap.add_argument("--weapon", type=str, default=None, help="weapon id (default: first entry, as HitscanGun)")
+    ap.add_argument("--runs", type=int, default=5000)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--workers", type=int, default=1)
+    ap.add_argument("--enemies", type=int, default=5, help="Game spawns 5")
+    ap.add_argument("--move-speed", type=float, nargs=2, default=[2.1, 3.2], metavar=("MIN", "MAX"))
+    ap.add_argument("--touch-range", type=float, default=1.5)
+    ap.add_argument("--enemy-damage", type=float, default=8.0)
+    ap.add_argument("--attack-cooldown", type=float, default=1.2)
+    ap.add_argument("--enemy-health", type=float, default=60.0)
+    ap.add_argument("--player-health", type=float, default=100.0)
+    ap.add_argument("--dt", type=float, default=1.0 / 60.0)
+    ap.add_argument("--max-time", type=float, default=120.0)
+    ap.add_argument("--res", type=int, default=4, help="line-of-sight samples per tile")
+    ap.add_argument("--json", type=str, default=None, help="also write the summary here")
+    args = ap.parse_args()
+
+    level = load_level(args.level)
+    weapon = load_weapon(args.weapons, args.weapon)
+    res = run(level, weapon, args)
+    summary = summarize(res, weapon, args)
+
+    print("runs %d  seed %d  weapon %s  enemies/run %d" % (args.runs, args.seed, weapon["id"], args.enemies))
+    print("survival %.1f%%  timeouts %d  accuracy %s  shots/run %.1f" % (
+        100 * summary["survival"], summary["timeouts"],
+        "-" if summary["accuracy"] is None else "%.1f%%" % (100 * summary["accuracy"]), summary["shots_per_run"]))
+    for key in ("time_to_clear", "time_to_death", "enemy_time_to_kill", "player_hp_left"):
+        s = summary[key]
+        if s:
+            print("%-20s n=%-6d mean %-8.2f p5 %-7.2f p25 %-7.2f p50 %-7.2f p75 %-7.2f p95 %.2f" % (
+                key, s["n"], s["mean"], s["p5"], s["p25"], s["p50"], s["p75"], s["p95"]))
+    print("time to clear (s):")
+    for line in histogram(res["clear"]):
+        print(line)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        print("Wrote", args.json)
+
+if __name__ == "__main__":
+    main()
+''',
+
+    "Tools/pvs_bake.py": r'''
+#!/usr/bin/env python3
+# Bakes a potentially-visible set (PVS) into a level JSON (requires NumPy).
+# For every open cell, finds the cells visible from anywhere inside it by casting vectorized
+# grid rays between sample points of the two cells (walls and doors block). Visibility is stored
+# as one bitset row per cell (bit j of row i: cell j visible from cell i), raw-deflated and
+# base64-encoded under "pvs"; Level.PvsCuller toggles renderers from it when the player changes cell.
+# Size limit: every open cell is tested against every later open cell (and the walls bordering open
+# space), with up to samples^2 rays per hidden pair, so bake time grows with open cells^2 x samples^2:
+# about 15 s for a 40x40 level at --samples 5. Beyond ~60x60 use --samples 1 or bake per chunk; the
+# PVS itself holds cells^2 / 8 bytes before deflate (320 KB at 40x40, 8 MB at 90x90).
+
+import argparse, base64, json, zlib
+
+import numpy as np
+
+CODES = {"wall": 1, "floor": 2, "door": 3, "enemy": 4, "player": 5}
+STEP = 0.25   # ray sample spacing, in cells
+BLOCK = 8     # samples per marching step
+LARGE = 3600  # cells (60x60) past which main warns about bake time
+
+def sample_offsets(samples):
+    # Points inside a cell (cell units, center = 0): center first, then inset corners
+    pts = [(0.0, 0.0)]
+    if samples > 1:
+        pts += [(-0.45, -0.45), (0.45, -0.45), (-0.45, 0.45), (0.45, 0.45)]
+    return np.array(pts)
+
+def march(solid, p, q, target):
+    # p, q: (n, 2) ray endpoints in cell units. True where no solid cell other than the target lies
+    # on the segment. Rays advance together a block of samples at a time and are dropped once blocked
+    # or finished, so the work follows the distance to the first wall rather than the full ray length.
+    w = solid.shape[1]
+    flat = solid.ravel()
+    p = p.astype(np.float32) + np.float32(0.5)  # floor(x + 0.5) = cell index; endpoints lie inside the grid
+    d = (q - p + np.float32(0.5)).astype(np.float32)
+    steps = np.ceil(np.hypot(d[:, 0], d[:, 1]) / STEP).astype(np.int32) + 1
+    clear = np.zeros(len(p), dtype=bool)
+    live = np.arange(len(p))
+    k0 = 0
+    block = np.arange(BLOCK, dtype=np.float32)
+    while live.size:
+        last = (steps[live] - 1).astype(np.float32)[:, None]
+        t = np.minimum(k0 + block[None, :], last) / np.maximum(last, 1)
+        sx = (p[live, 0, None] + d[live, 0, None] * t).astype(np.int32)
+        sy = (p[live, 1, None] + d[live, 1, None] * t).astype(np.int32)
+        idx = sy * w + sx
+        blocked = (flat[idx] & (idx != target[live, None])).any(axis=1)
+        finished = ~blocked & (steps[live] <= k0 + BLOCK)
+        clear[live[finished]] = True
+        live = live[~blocked & ~finished]
+        k0 += BLOCK
+    return clear
+
+def visible_pairs(solid, centers, offs, s, t):
+    # True where any sample ray between cells s and t is clear. One (source point, target point) combination
+    # runs at a time over the pairs not proven visible yet, center to center first, so a visible pair
+    # usually costs one ray and only hidden pairs are tested with every combination.
+    seen = np.zeros(s.size, dtype=bool)
+    for a in offs:
+        for b in offs:
+            live = np.flatnonzero(~seen)
+            if live.size == 0:
+                return seen
+            seen[live[march(solid, centers[s[live]] + a, centers[t[live]] + b, t[live])]] = True
+    return seen
+
+def bake(grid, samples=5, batch=1 << 20):
+    # Pairs (open source, target) are marched in batches of about batch pairs; open-to-open visibility is
+    # symmetric, so only later open cells are targets of each source, plus the solid cells that touch an
+    # open cell (a wall with solid cells all around is hidden from everywhere)
+    h, w = grid.shape
+    n = h * w
+    solid = (grid == 1) | (grid == 3)
+    is_open = ~solid.ravel()
+    cy, cx = np.divmod(np.arange(n), w)
+    centers = np.stack([cx, cy], axis=1).astype(float)
+    offs = sample_offsets(samples)
+    rows = np.zeros((n, (n + 7) // 8), dtype=np.uint8)
+    opens = np.flatnonzero(is_open)
+    padded = np.pad(~solid, 1)
+    touching = np.zeros_like(solid)
+    for dy in (0, 1, 2):
+        for dx in (0, 1, 2):
+            touching |= padded[dy:dy + h, dx:dx + w]
+    facing = (solid & touching).ravel()
+
+    def mark(s, t):
+        np.bitwise_or.at(rows, (s, t >> 3), (0x80 >> (t & 7)).astype(np.uint8))
+
+    def run(sources, targets):
+        s, t = np.concatenate(sources), np.concatenate(targets)
+        ok = visible_pairs(solid, centers, offs, s, t)
+        s, t = s[ok], t[ok]
+        back = is_open[t]
+        mark(s, t)
+        mark(t[back], s[back])
+
+    sources, targets, pending = [], [], 0
+    cells = np.arange(n)
+    for s in opens:
+        todo = np.flatnonzero(((cells > s) & is_open) | facing)
+        sources.append(np.full(todo.size, s))
+        targets.append(todo)
+        pending += todo.size
+        if pending >= batch:
+            run(sources, targets)
+            sources, targets, pending = [], [], 0
+    if pending:
+        run(sources, targets)
+    mark(opens, opens)
+    return rows
+
+def encode(rows):
+    packer = zlib.compressobj(9, zlib.DEFLATED, -15)
+    data = packer.compress(rows.tobytes()) + packer.flush()
+    return {"cells": int(rows.shape[0]), "rowBytes": int(rows.shape[1]),
+            "encoding": "deflate-base64", "data": base64.b64encode(data).decode("ascii")}
+
+def decode(pvs):
+    raw = zlib.decompress(base64.b64decode(pvs["data"]), -15)
+    return np.frombuffer(raw, dtype=np.uint8).reshape(pvs["cells"], pvs["rowBytes"])
+
+def level_grid(data):
+    return np.array([CODES.get(c.get("type"), 2) for c in data["cells"]],
+                    dtype=np.uint8).reshape(data["height"], data["width"])
+
+def main():
+    ap = argparse.ArgumentParser(description="Bake cell-to-cell visibility into a level JSON.")
+    ap.add_argument("--level", type=str, default="Assets/StreamingAssets/Configs/level1.json")
+    ap.add_argument("--out", type=str, default=None, help="default: rewrite --level in place")
+    ap.add_argument("--samples", type=int, choices=(1, 5), default=5,
+                    help="sample points per cell: 1 = centers only (faster, less conservative)")
     args = ap.parse_args()
-    data = gen(args.width, args.height, args.seed)
-    with open(args.out, "w", encoding="utf-8") as f:
+
+    with open(args.level, encoding="utf-8") as f:
+        data = json.load(f)
+    grid = level_grid(data)
+    if grid.size > LARGE and args.samples > 1:
+        print("warning: %dx%d level, the %d-sample bake may take minutes (try --samples 1)" % (
+            grid.shape[1], grid.shape[0], args.samples))
+    rows = bake(grid, args.samples)
+    data["pvs"] = encode(rows)
+
+    is_open = ~((grid == 1) | (grid == 3)).ravel()
+    visible = np.unpackbits(rows, axis=1, count=rows.shape[0]).sum(axis=1)[is_open]
+    out = args.out or args.level
+    with open(out, "w", encoding="utf-8") as f:
         json.dump(data, f, ensure_ascii=False, indent=2)
-    print("Wrote", args.out)
+    print("Wrote", out, "- %d cells, %.1f visible per open cell (max %d), %d bytes packed" % (
+        rows.shape[0], visible.mean() if visible.size else 0, visible.max() if visible.size else 0,
+        len(data["pvs"]["data"])))
+
+if __name__ == "__main__":
+    main()
+''',
+
+    "Tools/level_diff.py": r'''
+#!/usr/bin/env python3
+# Cell-level delta between two level files, for hot-reloading layout edits into a running game.
+#   diff:  python Tools/level_diff.py diff old.json new.json --out Assets/StreamingAssets/Configs/level1.delta.json
+#   apply: python Tools/level_diff.py apply level.json delta.json [--out merged.json]
+# Level.LevelHotReload polls <level>.delta.json and rebuilds only the listed cells. baseHash/resultHash are
+# FNV-1a over the per-cell type codes (LevelGrid.ContentHash), so a delta is only applied to the grid it was made from.
+
+import argparse, json, os, sys, tempfile
+
+CODES = {"wall": 1, "floor": 2, "door": 3, "enemy": 4, "player": 5}
+NAMES = {v: k for k, v in CODES.items()}
+
+def load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def codes(level):
+    # Unknown or missing types load as floor in LevelJsonReader
+    return bytes(CODES.get(c.get("type"), 2) for c in level["cells"])
+
+def fnv1a(data):
+    h = 0x811C9DC5
+    for b in data:
+        h = ((h ^ b) * 0x01000193) & 0xFFFFFFFF
+    return h
+
+def diff(old, new):
+    if (old["width"], old["height"]) != (new["width"], new["height"]):
+        raise SystemExit("level sizes differ (%dx%d -> %dx%d); copy the file instead for a full rebuild" % (
+            old["width"], old["height"], new["width"], new["height"]))
+    if (old.get("floors"), old.get("storeyHeight")) != (new.get("floors"), new.get("storeyHeight")):
+        raise SystemExit("upper storeys differ; deltas only cover the ground grid, copy the file instead for a full rebuild")
+    a, b = codes(old), codes(new)
+    indices = [i for i in range(len(b)) if a[i] != b[i]]
+    delta = {"width": new["width"], "height": new["height"], "baseHash": fnv1a(a), "resultHash": fnv1a(b),
+             "indices": indices, "types": [NAMES[b[i]] for i in indices]}
+    if new.get("spawns") != old.get("spawns") and new.get("spawns") is not None:
+        # hasSpawns: the game cannot tell a missing "spawns" from an empty one
+        delta["hasSpawns"] = True
+        delta["spawns"] = new["spawns"]
+    return delta
+
+def apply(level, delta, force=False):
+    if (level["width"], level["height"]) != (delta["width"], delta["height"]):
+        raise SystemExit("delta is for a %dx%d level" % (delta["width"], delta["height"]))
+    if fnv1a(codes(level)) != delta["baseHash"] and not force:
+        raise SystemExit("level does not match the delta's baseHash (use --force to apply anyway)")
+    cells = level["cells"]
+    for i, t in zip(delta["indices"], delta["types"]):
+        cells[i] = {"type": t}
+    if "spawns" in delta:
+        level["spawns"] = delta["spawns"]
+    # The baked visibility no longer describes the layout
+    level.pop("pvs", None)
+    return level
+
+def write_json(path, data, indent=None):
+    # Write-then-rename so the polling game never reads a half-written file
+    folder = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=folder, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=indent, separators=None if indent else (",", ":"))
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+def main():
+    ap = argparse.ArgumentParser(description="Compact cell deltas between level files.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    d = sub.add_parser("diff", help="write the cells that differ from OLD to NEW")
+    d.add_argument("old")
+    d.add_argument("new")
+    d.add_argument("--out", type=str, default=None, help="default: print to stdout")
+    a = sub.add_parser("apply", help="apply a delta to a level file")
+    a.add_argument("level")
+    a.add_argument("delta")
+    a.add_argument("--out", type=str, default=None, help="default: rewrite LEVEL in place")
+    a.add_argument("--force", action="store_true")
+    args = ap.parse_args()
+
+    if args.cmd == "diff":
+        delta = diff(load(args.old), load(args.new))
+        if args.out:
+            write_json(args.out, delta)
+            print("Wrote", args.out, "- %d cells changed" % len(delta["indices"]))
+        else:
+            json.dump(delta, sys.stdout, separators=(",", ":"))
+            print()
+    else:
+        delta = load(args.delta)
+        out = args.out or args.level
+        write_json(out, apply(load(args.level), delta, args.force), indent=2)
+        print("Wrote", out, "- %d cells changed" % len(delta["indices"]))
+
+if __name__ == "__main__":
+    main()
+''',
+
+    "Tools/chunk_server.py": r'''
+#!/usr/bin/env python3
+# Local chunk server for the endless-arena mode: serves an unbounded world generated on demand by
+# map_generator.gen_chunk (same counter-based cells as --chunked, without border or player cell).
+#   python Tools/chunk_server.py --seed 42 --port 7777
+# then start the game with -chunkServer 127.0.0.1:7777 (Level.ChunkStreamClient).
+# Chunks are kept in an LRU cache of --cache entries, so memory stays constant however far players roam;
+# a chunk requested again while it is still being generated waits for that one generation, and the
+# result is cached even if every client that asked for it has gone.
+#
+# Protocol (little-endian, localhost TCP):
+#   server hello:  b"FPSC", u16 version, u16 chunk size
+#   request:       i32 cx, i32 cy
+#   reply:         i32 cx, i32 cy, then size*size cell codes (one byte each, row-major)
+# Replies can arrive in any order; clients match them by coordinates.
+
+import argparse, asyncio, struct, sys, time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from map_generator import gen_chunk
+
+MAGIC = b"FPSC"
+VERSION = 1
+HELLO = struct.Struct("<4sHH")
+COORD = struct.Struct("<ii")
+
+class ChunkCache:
+    def __init__(self, seed, size, capacity, executor=None):
+        self.seed, self.size, self.capacity = seed, size, capacity
+        self.executor = executor
+        self.chunks = OrderedDict()   # (cx, cy) -> bytes, least recently used first
+        self.pending = {}             # (cx, cy) -> future of a generation in progress
+        self.hits = self.misses = 0
+
+    async def get(self, cx, cy):
+        key = (cx, cy)
+        data = self.chunks.get(key)
+        if data is not None:
+            self.chunks.move_to_end(key)
+            self.hits += 1
+            return data
+        fut = self.pending.get(key)
+        if fut is None:
+            self.misses += 1
+            loop = asyncio.get_running_loop()
+            fut = loop.run_in_executor(self.executor, gen_chunk, self.seed, cx, cy, self.size)
+            self.pending[key] = fut
+            fut.add_done_callback(lambda f: self._finished(key, f))
+        else:
+            self.hits += 1
+        # Every waiter shares the generation: cancelling one waiter (its client left) must not cancel it
+        return await asyncio.shield(fut)
+
+    def _finished(self, key, fut):
+        del self.pending[key]
+        if fut.cancelled() or fut.exception() is not None:
+            return
+        self.chunks[key] = fut.result()
+        if len(self.chunks) > self.capacity:
+            self.chunks.popitem(last=False)
+
+async def serve_client(cache, reader, writer, verbose):
+    peer = writer.get_extra_info("peername")
+    if verbose:
+        print("client", peer)
+    writer.write(HELLO.pack(MAGIC, VERSION, cache.size))
+    replies = set()
+
+    def replied(task):
+        replies.discard(task)
+        if task.cancelled():
+            return
+        e = task.exception()
+        if e is not None and (verbose or not isinstance(e, ConnectionError)):
+            print("reply to %s failed: %s: %s" % (peer, type(e).__name__, e), file=sys.stderr)
+
+    async def reply(cx, cy):
+        data = await cache.get(cx, cy)
+        writer.write(COORD.pack(cx, cy) + data)
+        await writer.drain()
+
+    try:
+        while True:
+            cx, cy = COORD.unpack(await reader.readexactly(COORD.size))
+            task = asyncio.ensure_future(reply(cx, cy))
+            replies.add(task)
+            task.add_done_callback(replied)
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        for task in replies:
+            task.cancel()
+        writer.close()
+        if verbose:
+            print("closed", peer)
+
+async def report(cache, every):
+    served = 0
+    while True:
+        await asyncio.sleep(every)
+        total = cache.hits + cache.misses
+        print("%s  %d chunks/s, cache %d/%d, hit rate %.1f%%" % (
+            time.strftime("%H:%M:%S"), (total - served) / every, len(cache.chunks), cache.capacity,
+            100.0 * cache.hits / total if total else 0.0))
+        served = total
+
+async def run(args):
+    executor = ProcessPoolExecutor(max_workers=args.workers) if args.workers > 1 else None
+    cache = ChunkCache(args.seed, args.chunk_size, args.cache, executor)
+    server = await asyncio.start_server(
+        lambda r, w: serve_client(cache, r, w, args.verbose), args.host, args.port)
+    print("Serving %dx%d chunks (seed %d) on %s:%d" % (args.chunk_size, args.chunk_size, args.seed, args.host, args.port))
+    if args.stats > 0:
+        asyncio.ensure_future(report(cache, args.stats))
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+def main():
+    ap = argparse.ArgumentParser(description="Serve procedurally generated level chunks to the game.")
+    ap.add_argument("--host", type=str, default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=7777)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--chunk-size", type=int, default=16)
+    ap.add_argument("--cache", type=int, default=4096, help="chunks kept in memory (LRU)")
+    ap.add_argument("--workers", type=int, default=1, help="generator processes (1 = a thread next to the event loop)")
+    ap.add_argument("--stats", type=float, default=0, help="print throughput every N seconds")
+    ap.add_argument("--verbose", action="store_true")
+    args = ap.parse_args()
+    if not 1 <= args.chunk_size <= 256:
+        raise SystemExit("--chunk-size must be 1..256")
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
+''',
+
+    "Tools/config_bundle.py": r'''
+#!/usr/bin/env python3
+# Compiles the JSON configs under StreamingAssets/Configs into one binary bundle (configs.bundle) that
+# ConfigIO memory-maps at startup: grids, storeys, spawn tables, baked PVS and weapons are read in place
+# through an offset table instead of being parsed.
+#   python Tools/config_bundle.py compile [--configs DIR] [--out PATH]
+#   python Tools/config_bundle.py info [PATH]
+# ConfigIO ignores the bundle while any JSON config is newer than it, so re-run compile after editing.
+#
+# Layout (little-endian, payloads 8-byte aligned):
+#   header   b"FPSB", u16 version, u16 section count, u32 file length, u32 0
+#   entries  kind[4], u32 offset, u32 length, u32 crc32(payload), name[32] (UTF-8, zero padded)
+#   GRID     i32 width, i32 height, f32 storey height, i32 0, width*height cell codes (row-major)
+#   FLRS     i32 count, then per storey: i32 z, i32 run count, run count x (i32 code, i32 length)
+#   SPWN     i32 players, i32 enemies, then (players + enemies) x (i32 x, i32 y, i32 z)
+#   PVS      i32 cells, i32 row bytes, cells*row bytes visibility bits (inflated)
+#   WEAP     i32 count, i32 record size, records: id[32], displayName[32], f32 damage, f32 fireRate,
+#            i32 magSize, i32 reserveAmmo, f32 reloadTime, f32 range, f32 spreadDegrees, u32 flags (1 = hitscan),
+#            i32 pellets (readers check the record size: version 1 bundles written before pellets have 96-byte records)
+# Level sections are named after the level file (level1.json -> "level1"), weapons after weapons.json.
+
+import argparse, base64, glob, json, os, struct, tempfile, zlib
+
+MAGIC = b"FPSB"
+VERSION = 1
+HEADER = struct.Struct("<4sHHII")
+ENTRY = struct.Struct("<4sIII32s")
+WEAPON = struct.Struct("<32s32sffiifffIi")
+
+CODES = {"wall": 1, "floor": 2, "door": 3, "enemy": 4, "player": 5}
+
+def load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def is_level(data):
+    return isinstance(data, dict) and "width" in data and ("cells" in data or "floors" in data)
+
+def ground_codes(level):
+    # Unknown or missing types load as floor, as in LevelJsonReader; a z = 0 storey may replace "cells"
+    if "cells" in level:
+        return bytes(CODES.get(c.get("type"), 2) for c in level["cells"])
+    for f in level.get("floors") or []:
+        if f["z"] == 0:
+            runs = f["runs"]
+            return b"".join(bytes([runs[i]]) * runs[i + 1] for i in range(0, len(runs), 2))
+    raise SystemExit("level has neither cells nor a z = 0 floor")
+
+def level_sections(name, level):
+    w, h = level["width"], level["height"]
+    cells = ground_codes(level)
+    if len(cells) != w * h:
+        raise SystemExit("%s: expected %d cells, found %d" % (name, w * h, len(cells)))
+    out = [(b"GRID", name, struct.pack("<iifi", w, h, level.get("storeyHeight", 3.0), 0) + cells)]
+
+    floors = sorted((f for f in level.get("floors") or [] if f["z"] != 0), key=lambda f: f["z"])
+    if floors:
+        parts = [struct.pack("<i", len(floors))]
+        for f in floors:
+            runs = f["runs"]
+            if any(not 0 <= c <= CODES["player"] for c in runs[0::2]) or any(n <= 0 for n in runs[1::2]):
+                raise SystemExit("%s: floor %d has invalid runs (codes 0-%d, positive lengths)" % (name, f["z"], CODES["player"]))
+            if sum(runs[1::2]) != w * h:
+                raise SystemExit("%s: floor %d runs do not cover the grid" % (name, f["z"]))
+            parts.append(struct.pack("<ii%di" % len(runs), f["z"], len(runs) // 2, *runs))
+        out.append((b"FLRS", name, b"".join(parts)))
+
+    spawns = level.get("spawns") or {}
+    players, enemies = spawns.get("player") or [], spawns.get("enemies") or []
+    if players or enemies:
+        points = [(p.get("x", 0), p.get("y", 0), p.get("z", 0)) for p in players + enemies]
+        out.append((b"SPWN", name, struct.pack("<ii", len(players), len(enemies))
+                    + b"".join(struct.pack("<iii", *p) for p in points)))
+
+    pvs = level.get("pvs")
+    if pvs:
+        raw = zlib.decompress(base64.b64decode(pvs["data"]), -15)
+        out.append((b"PVS ", name, struct.pack("<ii", pvs["cells"], pvs["rowBytes"]) + raw))
+    return out
+
+def fixed(text, size):
+    data = (text or "").encode("utf-8")[:size - 1]
+    return data + b"\0" * (size - len(data))
+
+def weapon_section(name, config):
+    weapons = config.get("weapons") or []
+    records = [WEAPON.pack(fixed(wp.get("id"), 32), fixed(wp.get("displayName"), 32),
+                           wp.get("damage", 0), wp.get("fireRate", 0), wp.get("magSize", 0), wp.get("reserveAmmo", 0),
+                           wp.get("reloadTime", 0), wp.get("range", 0), wp.get("spreadDegrees", 0),
+                           1 if wp.get("isHitscan") else 0, max(1, wp.get("pellets", 1)))
+               for wp in weapons]
+    return (b"WEAP", name, struct.pack("<ii", len(records), WEAPON.size) + b"".join(records))
+
+def collect(configs):
+    sections = []
+    for path in sorted(glob.glob(os.path.join(configs, "*.json"))):
+        if path.endswith(".delta.json"):
+            continue
+        name = os.path.splitext(os.path.basename(path))[0]
+        data = load(path)
+        if is_level(data):
+            sections += level_sections(name, data)
+        elif isinstance(data, dict) and "weapons" in data:
+            sections.append(weapon_section(name, data))
+    return sections
+
+def pack(sections):
+    table = HEADER.size + ENTRY.size * len(sections)
+    offset = (table + 7) & ~7
+    entries, payloads = [], []
+    for kind, name, payload in sections:
+        entries.append(ENTRY.pack(kind, offset, len(payload), zlib.crc32(payload), fixed(name, 32)))
+        pad = (-len(payload)) & 7
+        payloads.append(payload + b"\0" * pad)
+        offset += len(payload) + pad
+    head = HEADER.pack(MAGIC, VERSION, len(sections), offset, 0) + b"".join(entries)
+    return head + b"\0" * (((table + 7) & ~7) - table) + b"".join(payloads)
+
+def read_table(data):
+    magic, version, count, length, _ = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION or length != len(data):
+        raise SystemExit("not a version %d config bundle (or truncated)" % VERSION)
+    table = []
+    for i in range(count):
+        kind, offset, size, crc, name = ENTRY.unpack_from(data, HEADER.size + i * ENTRY.size)
+        table.append((kind.decode("ascii"), name.rstrip(b"\0").decode("utf-8"), offset, size, crc))
+    return table
+
+def write_bytes(path, data):
+    # Write-then-rename: a running game never maps a half-written bundle
+    folder = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=folder, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+def main():
+    ap = argparse.ArgumentParser(description="Compile configs into a memory-mappable binary bundle.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    c = sub.add_parser("compile", help="bundle every level and weapons JSON in --configs")
+    c.add_argument("--configs", type=str, default="Assets/StreamingAssets/Configs")
+    c.add_argument("--out", type=str, default=None, help="default: <configs>/configs.bundle")
+    i = sub.add_parser("info", help="list the sections of a bundle and check their CRCs")
+    i.add_argument("bundle", nargs="?", default="Assets/StreamingAssets/Configs/configs.bundle")
+    args = ap.parse_args()
+
+    if args.cmd == "compile":
+        sections = collect(args.configs)
+        if not sections:
+            raise SystemExit("no level or weapons JSON in " + args.configs)
+        out = args.out or os.path.join(args.configs, "configs.bundle")
+        data = pack(sections)
+        write_bytes(out, data)
+        print("Wrote", out, "- %d sections, %d bytes" % (len(sections), len(data)))
+    else:
+        with open(args.bundle, "rb") as f:
+            data = f.read()
+        for kind, name, offset, size, crc in read_table(data):
+            ok = zlib.crc32(data[offset:offset + size]) == crc
+            print("%-4s %-24s offset %8d  %8d bytes  %s" % (kind, name, offset, size, "ok" if ok else "CRC MISMATCH"))
+
+if __name__ == "__main__":
+    main()
+''',
+
+    "Tools/perf_analyzer.py": r'''
+#!/usr/bin/env python3
+# Summarizes PerfLog frame logs (perf_*.bin, written by builds generated with --instrument; requires NumPy).
+#   python Tools/perf_analyzer.py perf_20250101_120000.bin [more.bin ...] [--hitch-ms 50] [--json]
+# Logs are streamed in fixed-size record blocks and timings go into fixed log-spaced histograms,
+# so memory stays constant however large the logs are. Reports p50/p95/p99/max frame time and
+# per-section time (over the frames where the section ran), hitches and GC collections.
+
+import argparse, heapq, json, struct, sys
+
+import numpy as np
+
+MAGIC = b"FPSP"
+VERSION = 1
+BLOCK = 1 << 16          # records per read
+BINS = np.geomspace(1e-3, 1e4, 2001)   # ms; ~0.7% wide buckets
+
+class Hist:
+    def __init__(self):
+        self.counts = np.zeros(len(BINS) + 1, dtype=np.int64)
+        self.n = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, values):
+        if values.size == 0:
+            return
+        self.counts += np.bincount(np.searchsorted(BINS, values), minlength=len(self.counts))
+        self.n += values.size
+        self.total += float(values.sum(dtype=np.float64))
+        self.max = max(self.max, float(values.max()))
+
+    def percentile(self, q):
+        if self.n == 0:
+            return 0.0
+        i = int(np.searchsorted(np.cumsum(self.counts), q / 100.0 * self.n))
+        return min(float(BINS[min(i, len(BINS) - 1)]), self.max)   # upper edge of the bucket
+
+    def summary(self):
+        return {"n": self.n, "mean": self.total / self.n if self.n else 0.0,
+                "p50": self.percentile(50), "p95": self.percentile(95), "p99": self.percentile(99), "max": self.max}
+
+def read_header(f, path):
+    head = f.read(8)
+    if len(head) < 8 or head[:4] != MAGIC:
+        raise SystemExit("%s: not a PerfLog file" % path)
+    version, count = struct.unpack("<HH", head[4:])
+    if version != VERSION:
+        raise SystemExit("%s: PerfLog version %d, expected %d" % (path, version, VERSION))
+    names = []
+    for _ in range(count):
+        n = f.read(1)[0]
+        names.append(f.read(n).decode("ascii"))
+    return names
+
+def record_dtype(names):
+    fields = [("frame", "<u4"), ("ms", "<f4"), ("gc", "<i4"), ("heap", "<i8")]
+    for name in names:
+        fields += [(name + "_ms", "<f4"), (name + "_calls", "<u4")]
+    return np.dtype(fields)
+
+def analyze(paths, hitch_ms, worst):
+    names = None
+    frame = Hist()
+    sections = {}
+    frames = hitches = gc_frames = gc_hitches = gc_total = 0
+    heap_min, heap_max = None, 0
+    seconds = 0.0
+    top = []   # min-heap of (ms, file, frame, slowest section)
+
+    for path in paths:
+        with open(path, "rb") as f:
+            file_names = read_header(f, path)
+            if names is None:
+                names = file_names
+                sections = {n: Hist() for n in names}
+                calls = {n: 0 for n in names}
+            elif file_names != names:
+                raise SystemExit("%s: sections differ from the first log" % path)
+            dt = record_dtype(names)
+            last_gc = None
+            while True:
+                buf = f.read(dt.itemsize * BLOCK)
+                n = len(buf) // dt.itemsize
+                if n == 0:
+                    break
+                rec = np.frombuffer(buf, dtype=dt, count=n)   # a trailing partial record (crash) is dropped
+                ms = rec["ms"].astype(np.float64)
+                frame.add(ms)
+                frames += n
+                seconds += ms.sum() / 1000.0
+                for name in names:
+                    c = rec[name + "_calls"]
+                    ran = c > 0
+                    sections[name].add(rec[name + "_ms"][ran].astype(np.float64))
+                    calls[name] += int(c.sum())
+
+                # GC: collection counter increments between consecutive frames
+                gc = rec["gc"].astype(np.int64)
+                prev = np.concatenate([[gc[0] if last_gc is None else last_gc], gc[:-1]])
+                collected = gc - prev
+                last_gc = int(gc[-1])
+                gc_total += int(collected.sum())
+                gc_frame = collected > 0
+                gc_frames += int(gc_frame.sum())
+
+                slow = ms > hitch_ms
+                hitches += int(slow.sum())
+                gc_hitches += int((slow & gc_frame).sum())
+                heap = rec["heap"]
+                heap_min = int(heap.min()) if heap_min is None else min(heap_min, int(heap.min()))
+                heap_max = max(heap_max, int(heap.max()))
+
+                # Worst frames, with the section that took longest in each (none for worst = 0)
+                for i in np.argsort(ms)[-worst:] if worst > 0 else ():
+                    item = (float(ms[i]), path, int(rec["frame"][i]),
+                            max(names, key=lambda s: rec[s + "_ms"][i]) if names else "")
+                    if len(top) < worst:
+                        heapq.heappush(top, item)
+                    elif item > top[0]:
+                        heapq.heapreplace(top, item)
+
+    return {
+        "frames": frames, "seconds": seconds, "fps": frames / seconds if seconds else 0.0,
+        "frame_ms": frame.summary(),
+        "sections": {n: dict(sections[n].summary(), calls=calls[n]) for n in names or []},
+        "hitch_ms": hitch_ms, "hitches": hitches, "hitches_with_gc": gc_hitches,
+        "gc_collections": gc_total, "gc_frames": gc_frames,
+        "heap_bytes": {"min": heap_min or 0, "max": heap_max},
+        "worst": [{"ms": m, "file": p, "frame": fr, "slowest_section": s} for m, p, fr, s in sorted(top, reverse=True)],
+    }
+
+def main():
+    ap = argparse.ArgumentParser(description="Frame-time report for PerfLog binary logs.")
+    ap.add_argument("logs", nargs="+")
+    ap.add_argument("--hitch-ms", type=float, default=50.0, help="frames slower than this count as hitches")
+    ap.add_argument("--worst", type=int, default=10, help="slowest frames to list (0 = none)")
+    ap.add_argument("--json", action="store_true", help="machine-readable output")
+    args = ap.parse_args()
+    if args.worst < 0:
+        ap.error("--worst must be 0 or more")
+
+    r = analyze(args.logs, args.hitch_ms, args.worst)
+    if args.json:
+        json.dump(r, sys.stdout, indent=2)
+        print()
+        return
+    print("%d frames over %.1f s (%.1f fps)" % (r["frames"], r["seconds"], r["fps"]))
+    print("%-14s %9s %9s %9s %9s %9s %10s" % ("ms", "mean", "p50", "p95", "p99", "max", "frames"))
+    rows = [("frame", r["frame_ms"])] + list(r["sections"].items())
+    for name, s in rows:
+        print("%-14s %9.3f %9.3f %9.3f %9.3f %9.3f %10d" % (name, s["mean"], s["p50"], s["p95"], s["p99"], s["max"], s["n"]))
+    print("hitches (> %.0f ms): %d, %d of them in a frame with a GC" % (r["hitch_ms"], r["hitches"], r["hitches_with_gc"]))
+    print("GC collections: %d in %d frames; mono heap %.1f-%.1f MB" % (
+        r["gc_collections"], r["gc_frames"], r["heap_bytes"]["min"] / 1e6, r["heap_bytes"]["max"] / 1e6))
+    for w in r["worst"]:
+        print("  %8.2f ms  frame %d (%s), slowest section %s" % (w["ms"], w["frame"], w["file"], w["slowest_section"]))
+
+if __name__ == "__main__":
+    main()
+''',
+
+    "Tools/map_thumbnails.py": r'''
+#!/usr/bin/env python3
+# Renders level JSONs to small PNG thumbnails and an HTML contact sheet (index.html), for reviewing
+# generated level corpora without opening Unity (requires NumPy).
+#   python Tools/map_thumbnails.py levels/ more.json [--out thumbnails] [--size 128] [--storeys] [--jobs N]
+# Cells are colored through a palette lookup over the whole grid (north up: row y = 0 at the bottom);
+# grids larger than --size are reduced in blocks that keep the most important cell (player > enemy >
+# door > wall > floor). PNGs are paletted and encoded with zlib + struct; levels are spread over a
+# process pool. Folders are scanned for *.json; deltas and non-level JSON (weapons.json) are skipped.
+
+import argparse, glob, html, json, os, struct, sys, time, zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+CODES = {"wall": 1, "floor": 2, "door": 3, "enemy": 4, "player": 5}
+# RGB per cell code (0 = empty: outside the level / no geometry on an upper storey)
+PALETTE = np.array([(24, 24, 28), (88, 88, 100), (206, 204, 190), (214, 150, 60), (220, 52, 52), (60, 150, 255)],
+                   dtype=np.uint8)
+RANK = np.array([0, 2, 1, 3, 4, 5], dtype=np.uint8)    # block reduction keeps the highest rank
+UNRANK = np.argsort(RANK).astype(np.uint8)
+GAP = 2             # pixels between storeys
+
+def load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def is_level(data):
+    # Level files only: map_generator --stats reports also carry width/height, with a dict under "cells"
+    if not isinstance(data, dict) or "width" not in data or "height" not in data:
+        return False
+    cells, floors = data.get("cells"), data.get("floors")
+    if cells is None and floors is None:
+        return False
+    return ((cells is None or isinstance(cells, list))
+            and (floors is None or (isinstance(floors, list) and all(isinstance(f, dict) for f in floors))))
+
+def storeys(level, upper):
+    # [(z, (h, w) codes)], ground first; unknown or missing types load as floor, as in LevelJsonReader.
+    # A z = 0 storey in "floors" may replace "cells".
+    w, h = level["width"], level["height"]
+    out = []
+    if "cells" in level:
+        cells = level["cells"]
+        out.append((0, np.fromiter((CODES.get(c.get("type"), 2) for c in cells), np.uint8, len(cells))))
+    for f in sorted(level.get("floors") or [], key=lambda f: f["z"]):
+        if (f["z"] == 0 and out) or (f["z"] != 0 and not upper):
+            continue
+        runs = np.asarray(f["runs"], dtype=np.int64)
+        out.append((f["z"], np.repeat(runs[0::2].astype(np.uint8), runs[1::2])))
+    if not out or min(z for z, _ in out) != 0:
+        raise ValueError("level has neither cells nor a z = 0 floor")
+    for z, codes in out:
+        if codes.size != w * h:
+            raise ValueError("storey %d has %d cells, expected %d" % (z, codes.size, w * h))
+    return [(z, codes.reshape(h, w)[::-1]) for z, codes in sorted(out, key=lambda s: s[0])]
+
+def reduce(grid, size):
+    # Blocks of k x k cells -> one cell, so the longer side fits in size; k = 1 for small grids
+    h, w = grid.shape
+    k = -(-max(h, w) // size)
+    if k <= 1:
+        return grid
+    padded = np.zeros((-(-h // k) * k, -(-w // k) * k), dtype=np.uint8)
+    padded[:h, :w] = RANK[grid]
+    blocks = padded.reshape(padded.shape[0] // k, k, padded.shape[1] // k, k)
+    return UNRANK[blocks.max(axis=(1, 3))]
+
+def chunk(tag, data):
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+def encode_png(index):
+    # Paletted (colour type 3) PNG of an (h, w) array of cell codes; filter byte 0 on every row
+    h, w = index.shape
+    raw = np.zeros((h, w + 1), dtype=np.uint8)
+    raw[:, 1:] = index
+    return (b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", w, h, 8, 3, 0, 0, 0))
+            + chunk(b"PLTE", PALETTE.tobytes())
+            + chunk(b"IDAT", zlib.compress(raw.tobytes(), 6))
+            + chunk(b"IEND", b""))
+
+def render(layers, size):
+    # Storeys side by side, each scaled up (whole pixels per cell) or reduced to fit size
+    images = []
+    for _, grid in layers:
+        img = reduce(grid, size)
+        scale = max(1, size // max(img.shape))
+        images.append(np.repeat(np.repeat(img, scale, axis=0), scale, axis=1))
+    height = max(img.shape[0] for img in images)
+    sheet = np.zeros((height, sum(img.shape[1] for img in images) + GAP * (len(images) - 1)), dtype=np.uint8)
+    x = 0
+    for img in images:
+        sheet[height - img.shape[0]:, x:x + img.shape[1]] = img
+        x += img.shape[1] + GAP
+    return sheet
+
+def thumbnail(job):
+    # Worker: one level file -> PNG; returns its contact-sheet entry, or None for non-level JSON
+    path, png, size, upper = job
+    try:
+        level = load(path)
+        if not is_level(level):
+            return None
+        layers = storeys(level, upper)
+        sheet = render(layers, size)
+        counts = np.bincount(layers[0][1].ravel(), minlength=len(PALETTE))     # ground storey
+    except Exception as e:
+        # Any malformed file is reported and skipped; it must not abort the whole pool run
+        return {"source": path, "error": "%s: %s" % (type(e).__name__, e)}
+    with open(png, "wb") as f:
+        f.write(encode_png(sheet))
+    return {"source": path, "png": png, "width": level["width"], "height": level["height"],
+            "storeys": 1 + len([f for f in level.get("floors") or [] if f["z"] != 0]),
+            "pixels": sheet.shape[::-1], "walls": int(counts[1]), "doors": int(counts[3]), "enemies": int(counts[4])}
+
+def find_levels(paths):
+    found = []
+    for p in paths:
+        if os.path.isdir(p):
+            found += sorted(glob.glob(os.path.join(p, "**", "*.json"), recursive=True))
+        else:
+            found.append(p)
+    return [p for p in found if not p.endswith(".delta.json")]
+
+def output_names(sources, out):
+    # Thumbnail per source, named after the file; repeated names get a numeric suffix
+    used, names = set(), []
+    for src in sources:
+        stem = os.path.splitext(os.path.basename(src))[0]
+        name, n = stem, 1
+        while name in used:
+            n += 1
+            name = "%s-%d" % (stem, n)
+        used.add(name)
+        names.append(os.path.join(out, name + ".png"))
+    return names
+
+def write_sheet(out, entries, size):
+    rows = []
+    for e in entries:
+        w, h = e["pixels"]
+        caption = "%s<br>%dx%d%s, %d enemies" % (html.escape(os.path.basename(e["source"])), e["width"], e["height"],
+                                                 " x%d storeys" % e["storeys"] if e["storeys"] > 1 else "", e["enemies"])
+        rows.append('<figure><a href="%s"><img src="%s" width="%d" height="%d" loading="lazy" title="%s"></a>'
+                    '<figcaption>%s</figcaption></figure>' % (
+                        html.escape(os.path.basename(e["png"])), html.escape(os.path.basename(e["png"])), w, h,
+                        html.escape(e["source"]), caption))
+    page = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Level thumbnails</title>
+<style>
+body { background: #111; color: #ccc; font: 12px sans-serif; margin: 12px; }
+main { display: grid; grid-template-columns: repeat(auto-fill, minmax(%dpx, max-content)); gap: 12px; }
+figure { margin: 0; }
+img { image-rendering: pixelated; display: block; }
+</style></head>
+<body><p>%d levels</p><main>
+%s
+</main></body></html>
+""" % (size, len(entries), "\n".join(rows))
+    with open(os.path.join(out, "index.html"), "w", encoding="utf-8") as f:
+        f.write(page)
+
+def main():
+    ap = argparse.ArgumentParser(description="PNG thumbnails and an HTML contact sheet for level JSON files.")
+    ap.add_argument("levels", nargs="+", help="level files or folders to scan for *.json")
+    ap.add_argument("--out", type=str, default="thumbnails")
+    ap.add_argument("--size", type=int, default=128, help="longest side of one storey, in pixels")
+    ap.add_argument("--storeys", action="store_true", help="draw upper storeys next to the ground grid")
+    ap.add_argument("--jobs", type=int, default=None, help="worker processes (default: one per CPU)")
+    args = ap.parse_args()
+
+    start = time.perf_counter()
+    sources = find_levels(args.levels)
+    if not sources:
+        raise SystemExit("no level JSON found")
+    os.makedirs(args.out, exist_ok=True)
+    jobs = [(src, png, args.size, args.storeys) for src, png in zip(sources, output_names(sources, args.out))]
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        results = [r for r in pool.map(thumbnail, jobs, chunksize=max(1, len(jobs) // (4 * (os.cpu_count() or 1))))
+                   if r is not None]
+    entries = [r for r in results if "error" not in r]
+    for r in results:
+        if "error" in r:
+            print("skipped %s (%s)" % (r["source"], r["error"]), file=sys.stderr)
+    write_sheet(args.out, entries, args.size)
+    print("Rendered %d thumbnails into %s in %.2f s; open %s" % (
+        len(entries), args.out, time.perf_counter() - start, os.path.join(args.out, "index.html")))
+
+if __name__ == "__main__":
+    main()
+''',
+
+    "Tools/level_catalog.py": r'''
+#!/usr/bin/env python3
+# Incremental SQLite catalog of a level library, for finding levels without parsing every JSON
+# (requires NumPy; uses map_thumbnails and map_generator from the same folder).
+#   python Tools/level_catalog.py index levels/ [--db levels.sqlite] [--jobs N]
+#   python Tools/level_catalog.py query [--db levels.sqlite] --width 20- --height 20- --enemies 8-12 --regions 1
+# index stores per level: size, storeys, ground cell counts, spawn positions, connectivity (4-connected
+# regions of walkable ground cells, the largest one, enemies reachable from the player) and a SHA-1 of
+# the file. Files whose mtime and size are unchanged are skipped; changed ones are hashed and only
+# re-analysed when the content differs; deleted files are dropped. JSON that is not a level (weapons.json)
+# is remembered the same way in "others", so it is not re-read either. Paths are stored relative to the
+# database's folder. Ranges are A-B, A- (at least), -B (at most) or A.
+
+import argparse, hashlib, json, os, sqlite3, sys, time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from map_generator import label
+from map_thumbnails import CODES, find_levels, is_level, storeys
+
+SCHEMA_VERSION = 1
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS levels (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    sha1 TEXT NOT NULL,
+    width INTEGER, height INTEGER, storeys INTEGER,
+    wall_cells INTEGER, floor_cells INTEGER, door_cells INTEGER, enemy_cells INTEGER, player_cells INTEGER,
+    enemies INTEGER,            -- spawn table, every storey
+    regions INTEGER, largest_region INTEGER, player_region INTEGER, reachable_enemies INTEGER
+);
+CREATE TABLE IF NOT EXISTS others (   -- scanned JSON that is not a level
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    sha1 TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS spawns (
+    level_id INTEGER NOT NULL,
+    kind TEXT NOT NULL,         -- player | enemy
+    x INTEGER, y INTEGER, z INTEGER
+);
+CREATE INDEX IF NOT EXISTS levels_size ON levels (width, height);
+CREATE INDEX IF NOT EXISTS levels_enemies ON levels (enemies);
+CREATE INDEX IF NOT EXISTS levels_regions ON levels (regions);
+CREATE INDEX IF NOT EXISTS spawns_level ON spawns (level_id);
+"""
+STATS = ("width", "height", "storeys", "wall_cells", "floor_cells", "door_cells", "enemy_cells", "player_cells",
+         "enemies", "regions", "largest_region", "player_region", "reachable_enemies")
+WALKABLE = [CODES["floor"], CODES["door"], CODES["enemy"], CODES["player"]]
+
+def open_db(path):
+    db = sqlite3.connect(path)
+    version = db.execute("PRAGMA user_version").fetchone()[0]
+    if version not in (0, SCHEMA_VERSION):
+        raise SystemExit("%s: catalog schema %d, expected %d (delete it to rebuild)" % (path, version, SCHEMA_VERSION))
+    db.executescript(SCHEMA)
+    db.execute("PRAGMA user_version = %d" % SCHEMA_VERSION)
+    return db
+
+def spawn_list(level, ground):
+    # [(kind, x, y, z)] from the spawn table; levels without one fall back to the ground markers
+    spawns = level.get("spawns")
+    if spawns:
+        return ([("player", p.get("x", 0), p.get("y", 0), p.get("z", 0)) for p in spawns.get("player") or []]
+                + [("enemy", e.get("x", 0), e.get("y", 0), e.get("z", 0)) for e in spawns.get("enemies") or []])
+    w = ground.shape[1]
+    flat = ground.ravel()
+    return [(kind, int(i % w), int(i // w), 0)
+            for kind, code in (("player", CODES["player"]), ("enemy", CODES["enemy"]))
+            for i in np.flatnonzero(flat == code)]
+
+def analyze(level):
+    # Catalog columns and spawn rows of a parsed level
+    layers = storeys(level, False)
+    ground = layers[0][1][::-1]             # storeys() flips rows for drawing; back to y = 0 first
+    counts = np.bincount(ground.ravel(), minlength=256)
+    labels, sizes = label(np.isin(ground, WALKABLE))
+    sizes[0] = 0
+    spawns = spawn_list(level, ground)
+    h, w = ground.shape
+
+    def region(x, y):
+        return int(labels[y, x]) if 0 <= x < w and 0 <= y < h else 0
+
+    player = next((region(x, y) for kind, x, y, z in spawns if kind == "player" and not z), 0)
+    stats = {
+        "width": w, "height": h, "storeys": 1 + len([f for f in level.get("floors") or [] if f["z"] != 0]),
+        "wall_cells": int(counts[CODES["wall"]]), "floor_cells": int(counts[CODES["floor"]]),
+        "door_cells": int(counts[CODES["door"]]), "enemy_cells": int(counts[CODES["enemy"]]),
+        "player_cells": int(counts[CODES["player"]]),
+        "enemies": sum(1 for s in spawns if s[0] == "enemy"),
+        "regions": int(np.count_nonzero(sizes)), "largest_region": int(sizes.max()),
+        "player_region": int(sizes[player]) if player else 0,
+        "reachable_enemies": sum(1 for kind, x, y, z in spawns if kind == "enemy" and not z and player and region(x, y) == player),
+    }
+    return stats, spawns
+
+def index_job(job):
+    # Worker: (path, stored sha1) -> (path, sha1, stats, spawns); stats is None when the content is unchanged,
+    # "skip" for files that are not levels, or an error message
+    path, known = job
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError as e:
+        return path, None, "error: %s" % e, None
+    sha1 = hashlib.sha1(data).hexdigest()
+    if sha1 == known:
+        return path, sha1, None, None
+    try:
+        level = json.loads(data)
+        if not is_level(level):
+            return path, sha1, "skip", None
+        stats, spawns = analyze(level)
+    except Exception as e:
+        # A malformed file is reported and left out; it must not abort the pool (and roll back the run)
+        return path, sha1, "error: %s: %s" % (type(e).__name__, e), None
+    return path, sha1, stats, spawns
+
+def index(db_path, folders, jobs=None):
+    start = time.perf_counter()
+    base = os.path.dirname(os.path.abspath(db_path))
+    db = open_db(db_path)
+    known = {row[0]: row[1:] for row in db.execute("SELECT path, id, mtime_ns, size, sha1 FROM levels")}
+    others = {row[0]: row[1:] for row in db.execute("SELECT path, mtime_ns, size, sha1 FROM others")}
+
+    found = {}
+    for path in find_levels(folders):
+        if not os.path.isfile(path):
+            continue        # a deleted file named on the command line
+        st = os.stat(path)
+        found[os.path.relpath(os.path.abspath(path), base).replace(os.sep, "/")] = (path, st.st_mtime_ns, st.st_size)
+    todo = []
+    for rel, (path, mtime, size) in found.items():
+        stored = known[rel][1:] if rel in known else others.get(rel)
+        if stored is None or stored[:2] != (mtime, size):
+            todo.append((path, stored[2] if stored else None))
+
+    # Rows under the indexed folders (or naming the indexed files) whose file is gone
+    scopes = []
+    for folder in folders:
+        rel = os.path.relpath(os.path.abspath(folder), base).replace(os.sep, "/")
+        scopes.append((rel, False) if not os.path.isdir(folder) else ("" if rel == "." else rel + "/", True))
+    def in_scope(rel):
+        return any(rel.startswith(scope) if is_dir else rel == scope for scope, is_dir in scopes)
+
+    gone = [known[rel][0] for rel in known if rel not in found and in_scope(rel)]
+    gone_others = [rel for rel in others if rel not in found and in_scope(rel)]
+
+    counts = {"added": 0, "updated": 0, "touched": 0, "skipped": 0, "removed": len(gone), "unchanged": len(found) - len(todo)}
+    with ProcessPoolExecutor(max_workers=jobs) as pool, db:
+        for path, sha1, stats, spawns in pool.map(index_job, todo, chunksize=max(1, len(todo) // (4 * (os.cpu_count() or 1)))):
+            rel = os.path.relpath(os.path.abspath(path), base).replace(os.sep, "/")
+            _, mtime, size = found[rel]
+            row = known.get(rel)
+            if stats is None:
+                if row:
+                    db.execute("UPDATE levels SET mtime_ns = ?, size = ? WHERE id = ?", (mtime, size, row[0]))
+                else:
+                    db.execute("UPDATE others SET mtime_ns = ?, size = ? WHERE path = ?", (mtime, size, rel))
+                counts["touched"] += 1
+                continue
+            if isinstance(stats, str):
+                if stats == "skip":
+                    db.execute("INSERT OR REPLACE INTO others (path, mtime_ns, size, sha1) VALUES (?, ?, ?, ?)",
+                               (rel, mtime, size, sha1))
+                else:
+                    # Errors are not remembered: the file is read again next run (it may be mid-write)
+                    print("skipped %s (%s)" % (path, stats[7:]), file=sys.stderr)
+                    db.execute("DELETE FROM others WHERE path = ?", (rel,))
+                if row:
+                    gone.append(row[0])
+                    counts["removed"] += 1
+                counts["skipped"] += 1
+                continue
+            if rel in others:
+                db.execute("DELETE FROM others WHERE path = ?", (rel,))
+            values = [mtime, size, sha1] + [stats[k] for k in STATS]
+            if row:
+                db.execute("UPDATE levels SET mtime_ns = ?, size = ?, sha1 = ?, %s WHERE id = ?"
+                           % ", ".join(k + " = ?" for k in STATS), values + [row[0]])
+                db.execute("DELETE FROM spawns WHERE level_id = ?", (row[0],))
+                level_id = row[0]
+                counts["updated"] += 1
+            else:
+                level_id = db.execute("INSERT INTO levels (path, mtime_ns, size, sha1, %s) VALUES (%s)"
+                                      % (", ".join(STATS), ", ".join("?" * (len(STATS) + 4))), [rel] + values).lastrowid
+                counts["added"] += 1
+            db.executemany("INSERT INTO spawns (level_id, kind, x, y, z) VALUES (?, ?, ?, ?, ?)",
+                           [(level_id,) + s for s in spawns])
+        for level_id in gone:
+            db.execute("DELETE FROM spawns WHERE level_id = ?", (level_id,))
+            db.execute("DELETE FROM levels WHERE id = ?", (level_id,))
+        db.executemany("DELETE FROM others WHERE path = ?", [(rel,) for rel in gone_others])
+    total = db.execute("SELECT COUNT(*) FROM levels").fetchone()[0]
+    db.close()
+    return dict(counts, total=total, seconds=time.perf_counter() - start)
+
+def parse_range(text):
+    # "A-B", "A-", "-B" or "A" -> (min or None, max or None)
+    try:
+        if "-" not in text:
+            return int(text), int(text)
+        lo, hi = text.split("-", 1)
+        return (int(lo) if lo else None), (int(hi) if hi else None)
+    except ValueError:
+        raise SystemExit("bad range %r (use A-B, A-, -B or A)" % text)
+
+def query(db_path, ranges, where=None, order="path", limit=50):
+    # ranges: {column: "A-B"}; where: an extra SQL condition on the levels columns
+    clauses, params = [], []
+    for column, text in ranges.items():
+        lo, hi = parse_range(text)
+        if lo is not None:
+            clauses.append(column + " >= ?")
+            params.append(lo)
+        if hi is not None:
+            clauses.append(column + " <= ?")
+            params.append(hi)
+    if where:
+        clauses.append("(%s)" % where)
+    sql = "SELECT path, %s FROM levels%s ORDER BY %s" % (", ".join(STATS), " WHERE " + " AND ".join(clauses) if clauses else "", order)
+    if limit:
+        sql += " LIMIT %d" % limit
+    db = sqlite3.connect("file:%s?mode=ro" % os.path.abspath(db_path), uri=True)
+    try:
+        start = time.perf_counter()
+        rows = [dict(zip(("path",) + STATS, row)) for row in db.execute(sql, params)]
+        matches = db.execute("SELECT COUNT(*) FROM levels" + (" WHERE " + " AND ".join(clauses) if clauses else ""),
+                             params).fetchone()[0]
+        return rows, matches, time.perf_counter() - start
+    except sqlite3.Error as e:
+        raise SystemExit("query failed: %s" % e)
+    finally:
+        db.close()
+
+def main():
+    ap = argparse.ArgumentParser(description="Incremental SQLite index of level JSON files.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    i = sub.add_parser("index", help="add new and changed levels, drop deleted ones")
+    i.add_argument("folders", nargs="+", help="level files or folders to scan for *.json")
+    i.add_argument("--db", type=str, default="levels.sqlite")
+    i.add_argument("--jobs", type=int, default=None, help="worker processes (default: one per CPU)")
+    q = sub.add_parser("query", help="list levels matching every given filter")
+    q.add_argument("--db", type=str, default="levels.sqlite")
+    for column in ("width", "height", "storeys", "enemies", "regions", "largest_region", "reachable_enemies"):
+        q.add_argument("--" + column.replace("_", "-"), type=str, default=None, metavar="RANGE")
+    q.add_argument("--where", type=str, default=None, help="extra SQL condition, e.g. \"door_cells > 10\"")
+    q.add_argument("--order", type=str, default="path", help="SQL ORDER BY, e.g. \"enemies DESC\"")
+    q.add_argument("--limit", type=int, default=50, help="rows to list (0 = all)")
+    q.add_argument("--json", action="store_true", help="machine-readable output")
+    args = ap.parse_args()
+
+    if args.cmd == "index":
+        r = index(args.db, args.folders, args.jobs)
+        print("%d levels in %s: %d added, %d updated, %d unchanged, %d touched (same content), %d removed, %d skipped; %.2f s"
+              % (r["total"], args.db, r["added"], r["updated"], r["unchanged"], r["touched"], r["removed"], r["skipped"], r["seconds"]))
+        return
+    if not os.path.exists(args.db):
+        raise SystemExit("no catalog at %s; run index first" % args.db)
+    ranges = {c: getattr(args, c) for c in ("width", "height", "storeys", "enemies", "regions", "largest_region",
+                                            "reachable_enemies") if getattr(args, c)}
+    rows, matches, seconds = query(args.db, ranges, args.where, args.order, args.limit)
+    if args.json:
+        json.dump({"matches": matches, "levels": rows}, sys.stdout, indent=2)
+        print()
+        return
+    for r in rows:
+        print("%-40s %4dx%-4d %d storeys, %3d enemies (%d reachable), %d regions" % (
+            r["path"], r["width"], r["height"], r["storeys"], r["enemies"], r["reachable_enemies"], r["regions"]))
+    print("%d matches%s in %.1f ms" % (matches, " (first %d listed)" % len(rows) if matches > len(rows) else "", seconds * 1000))
 
 if __name__ == "__main__":
     main()
 '''
 }
 
-def write_file(path: str, content: str):
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with io.open(path, "w", encoding="utf-8") as f:
-        # Normalize leading/trailing newlines
-        f.write(dedent(content).strip() + "\n")
-
-def count_lines_in_dir(root: str, exts=(".cs", ".json", ".py", ".md")) -> int:
-    total = 0
-    for base, _, files in os.walk(root):
-        for name in files:
-            if name.endswith(exts):
-                p = os.path.join(base, name)
-                with io.open(p, "r", encoding="utf-8", errors="ignore") as f:
-                    total += sum(1 for _ in f)
-    return total
+FSYNC_MODES = ("none", "batch", "each")
+
+def fsync_dir(folder: str):
+    if os.name == "nt":
+        return  # directories cannot be opened for fsync on Windows; NTFS journals the rename
+    fd = os.open(folder, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+# Output backends. Paths are project-relative with "/" separators; generate() only talks to a backend, so
+# the same run can target the disk, memory (tests and tools inspecting a project without touching the
+# disk), a zip archive or a git commit.
+class Backend:
+    newline = "\n"
+
+    def __init__(self):
+        self.files_written = 0
+        self.bytes_written = 0
+
+    def write(self, rel: str, data: bytes):
+        self.files_written += 1
+        self.bytes_written += len(data)
+        self._write(rel, data)
+
+    def close(self) -> dict:
+        return {}
+
+class DiskBackend(Backend):
+    newline = os.linesep    # same newline translation as a text-mode write
+
+    def __init__(self, root: str, fsync: str = "none"):
+        super().__init__()
+        if fsync not in FSYNC_MODES:
+            raise ValueError("fsync must be one of " + ", ".join(FSYNC_MODES))
+        self.root = os.path.abspath(root)
+        self.fsync = fsync
+        self._batch_dirs = set()    # batch mode: directories whose renames still need syncing
+        self._batch_files = []      # batch mode without os.sync (Windows): files to sync at the end
+
+    def path(self, rel: str) -> str:
+        return os.path.join(self.root, *rel.split("/"))
+
+    def _write(self, rel: str, data: bytes):
+        # Temp file + os.replace: an interrupted run leaves either the old file or the new one, never half
+        # of one. The temp name starts with "." so Unity ignores it if a crash leaves it behind.
+        path = self.path(rel)
+        folder = os.path.dirname(path)
+        os.makedirs(folder, exist_ok=True)
+        tmp = os.path.join(folder, f".{os.path.basename(path)}.{os.getpid()}.tmp")
+        try:
+            with io.open(tmp, "wb") as f:
+                f.write(data)
+                if self.fsync == "each":
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        if self.fsync == "each":
+            fsync_dir(folder)
+        elif self.fsync == "batch":
+            self._batch_dirs.add(folder)
+            if not hasattr(os, "sync"):
+                self._batch_files.append(path)
+
+    def remove(self, rel: str):
+        if os.path.exists(self.path(rel)):
+            os.remove(self.path(rel))
+
+    def exists(self, rel: str) -> bool:
+        return os.path.isfile(self.path(rel))
+
+    def read(self, rel: str) -> bytes:
+        with io.open(self.path(rel), "rb") as f:
+            return f.read()
+
+    def listdir(self, rel: str):
+        folder = self.path(rel)
+        return [n for n in os.listdir(folder) if os.path.isfile(os.path.join(folder, n))] if os.path.isdir(folder) else []
+
+    def count_lines(self, exts, skip=()) -> int:
+        skip = {self.path(d) for d in skip}
+        total = 0
+        for base, dirs, files in os.walk(self.root):
+            dirs[:] = [d for d in dirs if os.path.join(base, d) not in skip]
+            for name in files:
+                if name.endswith(exts):
+                    with io.open(os.path.join(base, name), "r", encoding="utf-8", errors="ignore") as f:
+                        total += sum(1 for _ in f)
+        return total
+
+    def close(self) -> dict:
+        # batch: one system-wide sync for the file data, then one fsync per directory for the renames
+        if self.fsync == "batch":
+            if hasattr(os, "sync"):
+                os.sync()
+            for path in self._batch_files:
+                with io.open(path, "rb+") as f:
+                    os.fsync(f.fileno())
+            for folder in sorted(self._batch_dirs):
+                fsync_dir(folder)
+            self._batch_dirs.clear()
+            del self._batch_files[:]
+        return {"root": self.root}
+
+class MemoryBackend(Backend):
+    # files: {relative path: bytes}; pass an existing dict to generate over a pre-populated project
+    def __init__(self, files=None):
+        super().__init__()
+        self.files = {} if files is None else files
+
+    def _write(self, rel: str, data: bytes):
+        self.files[rel] = data
+
+    def remove(self, rel: str):
+        self.files.pop(rel, None)
+
+    def exists(self, rel: str) -> bool:
+        return rel in self.files
+
+    def read(self, rel: str) -> bytes:
+        return self.files[rel]
+
+    def listdir(self, rel: str):
+        prefix = rel.rstrip("/") + "/"
+        return [p[len(prefix):] for p in self.files if p.startswith(prefix) and "/" not in p[len(prefix):]]
+
+    def count_lines(self, exts, skip=()) -> int:
+        skip = tuple(d.rstrip("/") + "/" for d in skip)
+        return sum(data.count(b"\n") + (1 if data and not data.endswith(b"\n") else 0)
+                   for p, data in self.files.items() if p.endswith(exts) and not p.startswith(skip))
+
+class ArchiveBackend(MemoryBackend):
+    # Builds the project in memory and writes it as one zip archive on close (atomically); an existing
+    # archive at path is loaded first, like an existing target folder
+    def __init__(self, path: str, compression=zipfile.ZIP_DEFLATED):
+        super().__init__()
+        self.path = os.path.abspath(path)
+        self.compression = compression
+        if os.path.exists(self.path):
+            with zipfile.ZipFile(self.path) as z:
+                self.files = {n: z.read(n) for n in z.namelist() if not n.endswith("/")}
+
+    def close(self) -> dict:
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, "w", self.compression) as z:
+            for rel in sorted(self.files):
+                z.writestr(rel, self.files[rel])
+        DiskBackend(os.path.dirname(self.path))._write(os.path.basename(self.path), buf.getvalue())
+        return {"archive": self.path, "archive_bytes": buf.tell()}
+
+class OverlayBackend(DiskBackend):
+    # Reads the tree at root but keeps every write and removal pending in memory (staged / removed), so a
+    # run can be evaluated without touching the disk. Base of --verify and of GitBackend.
+    keep_data = True            # False: staged holds line counts only
+
+    def __init__(self, root: str):
+        super().__init__(root)
+        self.staged = {}        # rel -> bytes (or line count)
+        self.removed = set()
+
+    def _write(self, rel: str, data: bytes):
+        self.staged[rel] = data if self.keep_data else data.count(b"\n")
+        self.removed.discard(rel)
+
+    def remove(self, rel: str):
+        self.staged.pop(rel, None)
+        self.removed.add(rel)
+
+    def exists(self, rel: str) -> bool:
+        return rel in self.staged or (rel not in self.removed and self.base_exists(rel))
+
+    def read(self, rel: str) -> bytes:
+        if rel in self.staged:
+            if not self.keep_data:
+                raise ValueError(rel + " is only in the pending commit")
+            return self.staged[rel]
+        return self.base_read(rel)
+
+    # The tree under the overlay: base_* read it as it was before this run (the folder at root here)
+    def base_exists(self, rel: str) -> bool:
+        return super().exists(rel)
+
+    def base_read(self, rel: str) -> bytes:
+        return super().read(rel)
+
+    def base_listdir(self, rel: str):
+        return super().listdir(rel)
+
+    def listdir(self, rel: str):
+        prefix = rel.rstrip("/") + "/"
+        names = set(self.base_listdir(rel))
+        names.update(p[len(prefix):] for p in self.staged if p.startswith(prefix) and "/" not in p[len(prefix):])
+        return sorted(n for n in names if prefix + n not in self.removed)
+
+    def base_count_lines(self, exts, skip=()) -> int:
+        # Base files that are neither staged nor removed
+        skip_abs = {self.path(d) for d in skip}
+        total = 0
+        for base, dirs, files in os.walk(self.root):
+            dirs[:] = [d for d in dirs if os.path.join(base, d) not in skip_abs]
+            for name in files:
+                if name.endswith(exts):
+                    rel = os.path.relpath(os.path.join(base, name), self.root).replace(os.sep, "/")
+                    if rel in self.staged or rel in self.removed:
+                        continue
+                    with io.open(os.path.join(base, name), "r", encoding="utf-8", errors="ignore") as f:
+                        total += sum(1 for _ in f)
+        return total
+
+    def count_lines(self, exts, skip=()) -> int:
+        # Staged files are counted instead of their base versions
+        total = self.base_count_lines(exts, skip)
+        skip = tuple(d.rstrip("/") + "/" for d in skip)
+        for p, v in self.staged.items():
+            if p.endswith(exts) and not p.startswith(skip):
+                total += v if not self.keep_data else v.count(b"\n") + (1 if v and not v.endswith(b"\n") else 0)
+        return total
+
+    def close(self) -> dict:
+        return {}
+
+class GitBackend(OverlayBackend):
+    # Streams every generated file into `git fast-import` as one commit on a branch of the repository at
+    # root. Nothing touches the working tree or the index, so there is no `git add -A` rehash of thousands
+    # of files; the commit reuses the branch tip's tree for everything else. Reads see that parent tree
+    # overlaid with what has been staged so far; the working tree is never read, so untracked or modified
+    # files there cannot leak into the README check or the line count.
+    newline = "\n"
+    keep_data = False
+
+    def __init__(self, root: str, branch: str, message: str = None):
+        super().__init__(root)
+        self.branch = branch
+        self.ref = "refs/heads/" + branch
+        self.tree = None        # rel -> blob id in the parent commit, listed on first use
+        self.parent = (self._git("rev-parse", "--verify", "-q", self.ref + "^{commit}")
+                       or self._git("rev-parse", "--verify", "-q", "HEAD^{commit}"))
+        ident = self._git("var", "GIT_COMMITTER_IDENT")
+        if ident is None:
+            raise SystemExit("git has no committer identity here; set user.name and user.email")
+        self.proc = subprocess.Popen(["git", "fast-import", "--quiet", "--done"], cwd=self.root, stdin=subprocess.PIPE)
+        self.out = self.proc.stdin
+        msg = (message or "build: generate Unity FPS project").encode("utf-8")
+        self.out.write(b"commit %s\ncommitter %s\ndata %d\n%s\n" % (self.ref.encode(), ident.encode("utf-8"), len(msg), msg))
+        if self.parent:
+            self.out.write(b"from %s\n" % self.parent.encode())
+
+    def _git(self, *args):
+        r = subprocess.run(("git",) + args, cwd=self.root, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        return r.stdout.decode("utf-8").strip() if r.returncode == 0 else None
+
+    def _write(self, rel: str, data: bytes):
+        self.out.write(b"M 100644 inline %s\ndata %d\n" % (rel.encode("utf-8"), len(data)))
+        self.out.write(data)
+        self.out.write(b"\n")
+        super()._write(rel, data)
+
+    def remove(self, rel: str):
+        self.out.write(b"D %s\n" % rel.encode("utf-8"))
+        super().remove(rel)
+
+    def _blobs(self) -> dict:
+        if self.tree is None:
+            self.tree = {}
+            if self.parent:
+                listed = subprocess.run(["git", "ls-tree", "-r", "-z", self.parent], cwd=self.root,
+                                        stdout=subprocess.PIPE, check=True).stdout
+                for entry in listed.split(b"\0"):
+                    if entry:
+                        meta, rel = entry.split(b"\t", 1)
+                        _, kind, blob = meta.split()
+                        if kind == b"blob":
+                            self.tree[rel.decode("utf-8")] = blob.decode()
+        return self.tree
+
+    def base_exists(self, rel: str) -> bool:
+        return rel in self._blobs()
+
+    def base_read(self, rel: str) -> bytes:
+        return subprocess.run(["git", "cat-file", "blob", self._blobs()[rel]], cwd=self.root,
+                              stdout=subprocess.PIPE, check=True).stdout
+
+    def base_listdir(self, rel: str):
+        prefix = rel.rstrip("/") + "/"
+        return sorted(p[len(prefix):] for p in self._blobs() if p.startswith(prefix) and "/" not in p[len(prefix):])
+
+    def base_count_lines(self, exts, skip=()) -> int:
+        # Every counted blob of the parent tree through one `git cat-file --batch`
+        skip = tuple(d.rstrip("/") + "/" for d in skip)
+        blobs = [b for p, b in self._blobs().items() if p.endswith(exts) and not p.startswith(skip)
+                 and p not in self.staged and p not in self.removed]
+        if not blobs:
+            return 0
+        out = subprocess.run(["git", "cat-file", "--batch"], cwd=self.root, input="".join(b + "\n" for b in blobs).encode(),
+                             stdout=subprocess.PIPE, check=True).stdout
+        total, at = 0, 0
+        for _ in blobs:
+            end = out.index(b"\n", at)
+            size = int(out[at:end].split()[2])
+            data = out[end + 1:end + 1 + size]
+            total += data.count(b"\n") + (1 if data and not data.endswith(b"\n") else 0)
+            at = end + 2 + size
+        return total
+
+    def close(self) -> dict:
+        # A commit whose tree equals its parent's is dropped again
+        self.out.write(b"\ndone\n")
+        self.out.close()
+        if self.proc.wait() != 0:
+            raise SystemExit("git fast-import failed")
+        commit = self._git("rev-parse", self.ref)
+        if self.parent and self._git("rev-parse", commit + "^{tree}") == self._git("rev-parse", self.parent + "^{tree}"):
+            subprocess.run(["git", "update-ref", self.ref, self.parent, commit], cwd=self.root, check=True)
+            return {"branch": self.branch, "commit": self.parent, "changed": False}
+        return {"branch": self.branch, "commit": commit, "changed": True}
+
+LINKABLE_EXTS = (".cs", ".asmdef")     # generator-owned code; configs, csc.rsp and README stay separate copies
+
+class LinkingBackend(DiskBackend):
+    # DiskBackend for fan_out(): generated code whose bytes were already written to another target of the
+    # run is hard-linked to that copy instead of written again, falling back to a normal write where links
+    # fail (other filesystem, no hard links). Rewrites replace the link and never touch the shared file,
+    # but an in-place edit of a linked file shows in every target, hence only LINKABLE_EXTS are linked.
+    def __init__(self, root: str, links: dict, fsync: str = "none"):
+        super().__init__(root, fsync)
+        self.links = links      # sha1 of the content -> path of its first copy; one dict for the whole run
+        self.linked = 0
+        self.linked_bytes = 0
+
+    def _write(self, rel: str, data: bytes):
+        if not rel.endswith(LINKABLE_EXTS):
+            return super()._write(rel, data)
+        key = hashlib.sha1(data).digest()
+        path = self.path(rel)
+        source = self.links.get(key)
+        if source is not None and source != path and self._link(source, path):
+            self.linked += 1
+            self.linked_bytes += len(data)
+            return
+        super()._write(rel, data)
+        self.links.setdefault(key, path)
+
+    def _link(self, source: str, path: str) -> bool:
+        folder = os.path.dirname(path)
+        tmp = os.path.join(folder, f".{os.path.basename(path)}.{os.getpid()}.tmp")
+        try:
+            if os.path.exists(path) and os.path.samefile(source, path):
+                return True     # still linked from an earlier run
+            os.makedirs(folder, exist_ok=True)
+            os.link(source, tmp)
+        except OSError:
+            return False
+        try:
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+        if self.fsync == "each":
+            fsync_dir(folder)
+        elif self.fsync == "batch":
+            self._batch_dirs.add(folder)
+        return True
+
+    def close(self) -> dict:
+        return dict(super().close(), linked=self.linked, linked_bytes=self.linked_bytes)
+
+def write_text(backend: Backend, rel: str, text: str):
+    backend.write(rel, text.replace("\n", backend.newline).encode("utf-8"))
+
+def write_file(backend: Backend, rel: str, content: str):
+    # Normalize leading/trailing newlines
+    write_text(backend, rel, dedent(content).strip() + "\n")
+
+COUNTED_EXTS = (".cs", ".json", ".py", ".md")
+
+# One assembly per gameplay folder (plus the fillers), so an edit recompiles only its own assembly and the
+# ones referencing it. Game.cs and Bootstrap.cs wire every module together and stay in Assembly-CSharp.
+ASSEMBLY_PREFIX = "FPS."
+ASSEMBLIES = {
+    "Core": [],
+    "Weapons": ["Core"],
+    "UI": ["Core", "Weapons", "UnityEngine.UI"],
+    "Player": ["Core", "Weapons", "UI"],
+    "Level": ["Core", "Player"],
+    "AI": ["Core", "Level"],
+    "Generated": [],
+}
+MOVED_FILES = ["Assets/Scripts/Core/Game.cs", "Assets/Scripts/Core/Bootstrap.cs"]  # left by older runs
+
+# Project variants: the BASE_FILES prefixes each one leaves out. "lite" is the Version5 file set.
+VARIANTS = {
+    "full": (),
+    "lite": ("Assets/Scripts/AI/", "Assets/Scripts/UI/",
+             "Assets/StreamingAssets/Configs/level1.json", "Assets/StreamingAssets/Configs/weapons.json"),
+}
+
+def variant_files(variant: str) -> dict:
+    if variant not in VARIANTS:
+        raise ValueError("variant must be one of " + ", ".join(VARIANTS))
+    return {rel: content for rel, content in BASE_FILES.items() if not (VARIANTS[variant] and rel.startswith(VARIANTS[variant]))}
+
+def assembly_folders(files=None):
+    # Folders this generator emits (Version5 and the lite variant have no AI/UI); the fillers always get one
+    emitted = {rel.split("/")[2] for rel in (BASE_FILES if files is None else files)
+               if rel.startswith("Assets/Scripts/") and rel.count("/") > 2}
+    return {name: "Assets/Scripts/" + name for name in ASSEMBLIES if name in emitted or name == "Generated"}
+
+def remove_moved_files(backend: Backend):
+    for rel in MOVED_FILES:
+        for path in (rel, rel + ".meta"):
+            if backend.exists(path):
+                backend.remove(path)
+
+def write_assembly_definitions(backend: Backend, files=None):
+    folders = assembly_folders(files)
+    for name, folder in folders.items():
+        refs = []
+        for r in ASSEMBLIES[name]:
+            if r not in ASSEMBLIES:
+                refs.append(r)                      # engine/package assembly
+            elif r in folders:
+                refs.append(ASSEMBLY_PREFIX + r)    # folders this generator variant does not emit are dropped
+        asmdef = {
+            "name": ASSEMBLY_PREFIX + name,
+            "rootNamespace": "" if name == "Core" else name,
+            "references": refs,
+            "autoReferenced": name != "Generated",
+            "noEngineReferences": name == "Generated",
+        }
+        write_file(backend, f"{folder}/{ASSEMBLY_PREFIX}{name}.asmdef", json.dumps(asmdef, indent=4))
 
-def generate_fillers(target_root: str, target_lines: int):
-    gen_dir = os.path.join(target_root, "Assets", "Scripts", "Generated")
-    os.makedirs(gen_dir, exist_ok=True)
+PERF_DEFINE = "-define:FPS_PERF"
 
-    # Each file will add around ~120 lines by comments and small code.
-    # We'll keep classes minimal and safe (no gameplay impact).
-    idx = 0
-    def gen_file_content(k: int) -> str:
+def write_compiler_defines(backend: Backend, instrument: bool, files=None):
+    # csc.rsp carries the FPS_PERF define (PerfLog instrumentation); any other lines in it are kept.
+    # Assets/csc.rsp only reaches Assembly-CSharp, so every gameplay assembly folder gets its own copy.
+    paths = ["Assets/csc.rsp"] + [folder + "/csc.rsp" for name, folder in assembly_folders(files).items() if name != "Generated"]
+    for path in paths:
         lines = []
-        lines.append("using System;")
-        lines.append("namespace Generated {")
-        lines.append(f"  /// <summary>Auto-generated filler class #{k} for documentation and structure.</summary>")
-        lines.append(f"  public static class Doc_{k} {{")
-        lines.append(f"    public static int Id => {k};")
-        lines.append(f"    public static string Info => \"Generated filler to meet line budget. Class #{k}\";")
-        # Add a harmless method
-        lines.append("    public static int Fibonacci(int n) {")
-        lines.append("      if (n <= 1) return n;")
-        lines.append("      int a = 0, b = 1;")
-        lines.append("      for (int i = 2; i <= n; i++) { int t = a + b; a = b; b = t; }")
-        lines.append("      return b;")
-        lines.append("    }")
-        # Add many comment lines
-        for i in range(1, 101):
-            lines.append(f"    // filler line {i} for class {k}")
-        lines.append("  }")
-        lines.append("}")
-        return "\n".join(lines) + "\n"
-
-    current = count_lines_in_dir(target_root)
-    # Safety cap to prevent runaway
-    max_files = 3000
-    while current < target_lines and idx < max_files:
-        idx += 1
-        path = os.path.join(gen_dir, f"Doc_{idx:04d}.cs")
-        write_file(path, gen_file_content(idx))
-        current = count_lines_in_dir(target_root)
+        if backend.exists(path):
+            text = backend.read(path).decode("utf-8")
+            lines = [l for l in text.splitlines() if l.strip() and l.strip() != PERF_DEFINE]
+        if instrument:
+            lines.append(PERF_DEFINE)
+        if lines:
+            write_file(backend, path, "\n".join(lines))
+        elif backend.exists(path):
+            backend.remove(path)
+
+MANIFEST_DIR = ".fpsgen"
+GENERATED_DIR = "Assets/Scripts/Generated"
+
+# Filler class k: FILLER_TEMPLATE with {k} and {comments}, the latter being FILLER_COMMENT_COUNT lines of
+# FILLER_COMMENT ({i}, {k}). Braces meant for C# are doubled.
+FILLER_TEMPLATE = """using System;
+namespace Generated {{
+  /// <summary>Auto-generated filler class #{k} for documentation and structure.</summary>
+  public static class Doc_{k} {{
+    public static int Id => {k};
+    public static string Info => "Generated filler to meet line budget. Class #{k}";
+    public static int Fibonacci(int n) {{
+      if (n <= 1) return n;
+      int a = 0, b = 1;
+      for (int i = 2; i <= n; i++) {{ int t = a + b; a = b; b = t; }}
+      return b;
+    }}
+{comments}
+  }}
+}}
+"""
+FILLER_COMMENT = "    // filler line {i} for class {k}"
+FILLER_COMMENT_COUNT = 100
+
+def render_filler(k: int) -> str:
+    # Every filler has the same number of lines, so the file count for a line target is known up front
+    comments = "\n".join(FILLER_COMMENT.format(i=i, k=k) for i in range(1, FILLER_COMMENT_COUNT + 1))
+    return FILLER_TEMPLATE.format(k=k, comments=comments)
+
+def filler_lines() -> int:
+    return render_filler(1).count("\n")
+
+def filler_name(k: int) -> str:
+    return f"Doc_{k:04d}.cs"
+
+def make_plan(target_lines: int, base: int, max_files: int) -> dict:
+    per_file = filler_lines()
+    files = max(0, -(-(target_lines - base) // per_file))
+    if max_files > 0:
+        files = min(files, max_files)
+    return {"lines": target_lines, "base_lines": base, "filler_lines": per_file, "files": files, "max_files": max_files}
+
+def plan_fillers(backend: Backend, target_lines: int, max_files: int) -> dict:
+    # Counts everything except the fillers themselves (and our manifests), so every run and every shard
+    # over the same base files arrives at the same file count
+    return make_plan(target_lines, backend.count_lines(COUNTED_EXTS, skip=(GENERATED_DIR, MANIFEST_DIR)), max_files)
+
+def shard_range(files: int, shard: int, shards: int):
+    # 1-based, contiguous and disjoint; the shards together cover 1..files
+    return files * (shard - 1) // shards + 1, files * shard // shards
+
+def write_fillers(backend: Backend, first: int, last: int):
+    for k in range(first, last + 1):
+        write_text(backend, f"{GENERATED_DIR}/{filler_name(k)}", render_filler(k))
+
+def write_manifest(backend: Backend, name: str, data: dict):
+    write_file(backend, f"{MANIFEST_DIR}/{name}", json.dumps(data, indent=2, sort_keys=True))
+
+def finish_fillers(backend: Backend, plan: dict) -> int:
+    # Drops fillers left by earlier runs with a larger target, checks none is missing, writes the manifest
+    present = set(backend.listdir(GENERATED_DIR))
+    for name in present:
+        if name.startswith("Doc_") and name.endswith(".cs") and name[4:-3].isdigit() and int(name[4:-3]) > plan["files"]:
+            backend.remove(f"{GENERATED_DIR}/{name}")
+    missing = [k for k in range(1, plan["files"] + 1) if filler_name(k) not in present]
+    if missing:
+        raise SystemExit("%d filler files missing (first: %s); copy every shard's output into the target before merging"
+                         % (len(missing), filler_name(missing[0])))
+    total = plan["base_lines"] + plan["files"] * plan["filler_lines"]
+    write_manifest(backend, "manifest.json", dict(plan, total_lines=total))
+    return total
 
-def main():
-    ap = argparse.ArgumentParser(description="Generate a full Unity FPS project and reach a target line count.")
-    ap.add_argument("--target", type=str, default=".")
-    ap.add_argument("--lines", type=int, default=25000, help="Total desired project line count across code/text files.")
-    args = ap.parse_args()
+def render_base(files: dict) -> dict:
+    # Output text of each base file, leading/trailing newlines normalized as in write_file
+    return {rel: dedent(content).strip() + "\n" for rel, content in files.items()}
 
-    target_root = os.path.abspath(args.target)
+def write_base(backend: Backend, rendered: dict, instrument: bool):
+    # Everything before the fillers: base files, csc.rsp defines, README, cleanup of older layouts
+    for rel, text in rendered.items():
+        write_text(backend, rel, text)
 
-    # Write base files
-    for rel, content in BASE_FILES.items():
-        write_file(os.path.join(target_root, rel), content)
+    write_compiler_defines(backend, instrument, rendered)
 
     # Ensure README if not exists
-    readme_path = os.path.join(target_root, "README.md")
-    if not os.path.exists(readme_path):
-        write_file(readme_path, "# FPS 3D Project (generated)\n")
+    if not backend.exists("README.md"):
+        write_file(backend, "README.md", "# FPS 3D Project (generated)\n")
+
+    remove_moved_files(backend)
+
+def open_backend(target: str, backend) -> Backend:
+    # backend: a Backend instance, or a callable taking the target path: DiskBackend, OverlayBackend,
+    # ArchiveBackend, or a factory such as functools.partial(GitBackend, branch="generated").
+    # MemoryBackend has no target, so it is only accepted as an instance (MemoryBackend() or MemoryBackend(files)).
+    if backend is None:
+        backend = DiskBackend
+    if backend is MemoryBackend:
+        raise TypeError("pass a MemoryBackend instance (MemoryBackend()), not the class")
+    return backend if isinstance(backend, Backend) else backend(target)
+
+def merge(target: str = ".", backend=None) -> dict:
+    # Combines the shard manifests of a tree assembled from --shard runs into the final manifest
+    backend = open_backend(target, backend)
+    names = sorted(n for n in backend.listdir(MANIFEST_DIR) if n.startswith("shard-") and n.endswith(".json"))
+    if not names:
+        raise SystemExit("no shard manifests in " + os.path.join(target, MANIFEST_DIR))
+    parts = [json.loads(backend.read(f"{MANIFEST_DIR}/{name}").decode("utf-8")) for name in names]
+    plan = {k: parts[0][k] for k in ("lines", "base_lines", "filler_lines", "files", "max_files")}
+    shards = parts[0]["shards"]
+    for p in parts:
+        for k in list(plan) + ["shards"]:
+            if p[k] != (shards if k == "shards" else plan[k]):
+                raise SystemExit("shard %d/%d disagrees on %s (%r); were all shards run with the same arguments and base files?"
+                                 % (p["shard"], p["shards"], k, p[k]))
+    seen = sorted(p["shard"] for p in parts)
+    if seen != list(range(1, shards + 1)):
+        raise SystemExit("expected shards 1..%d, found %s" % (shards, seen))
+    total = finish_fillers(backend, plan)
+    for name in names:
+        backend.remove(f"{MANIFEST_DIR}/{name}")
+    return dict(plan, total_lines=total, shards=shards, **backend.close())
+
+def generate(target: str = ".", lines: int = 25000, backend=None, instrument: bool = False,
+             max_files: int = 3000, shard=(1, 1), variant: str = "full") -> dict:
+    # Public entry point. Writes the project through backend (default: DiskBackend(target); pass
+    # MemoryBackend() to get the files as a dict, ArchiveBackend for a zip) and returns stats:
+    # the filler plan (lines, base_lines, filler_lines, files, max_files), first/last filler written,
+    # total_lines (None for a shard), files_written, bytes_written, seconds, plus what the backend reports.
+    start = time.perf_counter()
+    backend = open_backend(target, backend)
+    index, shards = shard
+    rendered = render_base(variant_files(variant))
+
+    # Write base files
+    write_base(backend, rendered, instrument)
 
     # Generate filler files to meet target lines
-    generate_fillers(target_root, args.lines)
+    plan = plan_fillers(backend, lines, max_files)
+    first, last = shard_range(plan["files"], index, shards)
+    write_fillers(backend, first, last)
+    write_assembly_definitions(backend, rendered)
+
+    if shards > 1:
+        write_manifest(backend, f"shard-{index:04d}.json", dict(plan, shard=index, shards=shards, first=first, last=last))
+        total = None
+    else:
+        total = finish_fillers(backend, plan)
+    stats = dict(plan, first=first, last=last, total_lines=total,
+                 files_written=backend.files_written, bytes_written=backend.bytes_written)
+    stats.update(backend.close())
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+def parse_variant_spec(text: str):
+    # VARIANT:DIR:LINES; DIR may itself contain ":" (Windows drive letters)
+    try:
+        variant, rest = text.split(":", 1)
+        target, lines = rest.rsplit(":", 1)
+        spec = (variant, target, int(lines))
+    except ValueError:
+        raise SystemExit("--fan-out expects VARIANT:DIR:LINES, e.g. lite:out/lite:10000, got " + text)
+    if variant not in VARIANTS:
+        raise SystemExit("unknown variant %r (choose from %s)" % (variant, ", ".join(VARIANTS)))
+    return spec
+
+def fan_out(specs, instrument: bool = False, max_files: int = 3000, fsync: str = "none") -> dict:
+    # Generates several projects in one pass; specs: [(variant, target, lines), ...]. Base files and fillers
+    # are rendered once for all targets, and generated code already written to one target is hard-linked
+    # into the others (LinkingBackend), so extra variants cost directory entries rather than data.
+    # Returns {"runs": generate()-style stats per spec, files_written, bytes_written, linked, seconds}.
+    start = time.perf_counter()
+    roots = [os.path.abspath(target) for _, target, _ in specs]
+    if len(set(roots)) != len(roots):
+        raise SystemExit("fan-out targets must be distinct folders")
+    rendered = render_base(BASE_FILES)
+    links = {}
+    runs = []
+    for (variant, _, lines), root in zip(specs, roots):
+        backend = LinkingBackend(root, links, fsync)
+        files = {rel: rendered[rel] for rel in variant_files(variant)}
+        write_base(backend, files, instrument)
+        runs.append((backend, files, plan_fillers(backend, lines, max_files)))
+
+    # Each filler is rendered once and written to every target whose plan reaches it
+    for k in range(1, max((plan["files"] for _, _, plan in runs), default=0) + 1):
+        text = render_filler(k)
+        for backend, _, plan in runs:
+            if k <= plan["files"]:
+                write_text(backend, f"{GENERATED_DIR}/{filler_name(k)}", text)
+
+    results = []
+    for (variant, _, _), (backend, files, plan) in zip(specs, runs):
+        write_assembly_definitions(backend, files)
+        total = finish_fillers(backend, plan)
+        stats = dict(plan, variant=variant, first=1, last=plan["files"], total_lines=total,
+                     files_written=backend.files_written, bytes_written=backend.bytes_written - backend.linked_bytes)
+        stats.update(backend.close())
+        results.append(stats)
+    return {"runs": results, "files_written": sum(r["files_written"] for r in results),
+            "bytes_written": sum(r["bytes_written"] for r in results), "linked": sum(r["linked"] for r in results),
+            "seconds": time.perf_counter() - start}
+
+VERIFY_OWNED = ("Assets/Scripts/", MANIFEST_DIR + "/")     # any other file under these is reported as extra
+READ_CHUNK = 1 << 20
+
+def hash_file(path: str):
+    # (sha1, lines) of a file on disk, or None when it is missing; read in large chunks
+    h = hashlib.sha1()
+    lines = 0
+    last = b""
+    try:
+        with io.open(path, "rb", buffering=0) as f:
+            while True:
+                chunk = f.read(READ_CHUNK)
+                if not chunk:
+                    break
+                h.update(chunk)
+                lines += chunk.count(b"\n")
+                last = chunk
+    except FileNotFoundError:
+        return None
+    return h.hexdigest(), lines + (1 if last and not last.endswith(b"\n") else 0)
+
+def verify(target: str = ".", lines: int = 25000, instrument: bool = False, max_files: int = 3000, workers: int = None,
+           variant: str = "full") -> dict:
+    # Checks a tree against what generate() would produce for the same arguments, without writing: the
+    # expected files are rendered into an OverlayBackend, the files on disk are hashed on a thread pool.
+    # Returns sorted lists missing / extra / modified and line_mismatch entries (path, on disk, expected).
+    start = time.perf_counter()
+    expected = OverlayBackend(target)
+    stats = generate(target, lines, expected, instrument, max_files, variant=variant)
+    jobs = sorted(expected.staged)
+    with ThreadPoolExecutor(max_workers=workers or min(32, (os.cpu_count() or 1) * 4)) as pool:
+        actual = dict(zip(jobs, pool.map(lambda rel: hash_file(expected.path(rel)), jobs, chunksize=64)))
+
+    missing, modified, line_mismatch = [], [], []
+    for rel in jobs:
+        data = expected.staged[rel]
+        want = (hashlib.sha1(data).hexdigest(), data.count(b"\n") + (1 if data and not data.endswith(b"\n") else 0))
+        got = actual[rel]
+        if got is None:
+            missing.append(rel)
+        elif got != want:
+            modified.append(rel)
+            if got[1] != want[1]:
+                line_mismatch.append((rel, got[1], want[1]))
+
+    # Extra: files the generator would delete, and anything else in the folders it owns
+    extra = {rel for rel in expected.removed if DiskBackend.exists(expected, rel)}
+    for owned in VERIFY_OWNED:
+        root = expected.path(owned.rstrip("/"))
+        for base, _, files in os.walk(root):
+            for name in files:
+                rel = os.path.relpath(os.path.join(base, name), expected.root).replace(os.sep, "/")
+                if rel not in expected.staged and not name.endswith(".meta") and not name.startswith("."):
+                    extra.add(rel)
+    return {"checked": len(jobs), "missing": missing, "extra": sorted(extra), "modified": modified,
+            "line_mismatch": line_mismatch, "ok": not (missing or extra or modified),
+            "total_lines": stats["total_lines"], "seconds": time.perf_counter() - start}
+
+def template_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+def template_lines(content: str) -> int:
+    return (dedent(content).strip() + "\n").count("\n")
+
+def filler_hash() -> str:
+    return template_hash("\0".join((FILLER_TEMPLATE, FILLER_COMMENT, str(FILLER_COMMENT_COUNT))))
+
+def watch(target: str = ".", lines: int = 25000, backend=None, instrument: bool = False, max_files: int = 3000,
+          interval: float = 0.2, source: str = None):
+    # Keeps the generator resident: after one full run it polls source (this script) and, on save, rewrites
+    # only the outputs whose BASE_FILES entry or filler template hash changed, so Unity reimports just
+    # those. Edits to the templates are picked up live; edits to the generator's code need a restart.
+    global BASE_FILES, FILLER_TEMPLATE, FILLER_COMMENT, FILLER_COMMENT_COUNT
+    source = os.path.abspath(source or __file__)
+    backend = open_backend(target, backend)
+    stats = generate(target, lines, backend, instrument, max_files)
+    print(f"Generated {stats['files_written']} files in {stats['seconds'] * 1000:.0f} ms; watching {source} (Ctrl+C to stop).")
+    hashes = {rel: template_hash(content) for rel, content in BASE_FILES.items()}
+    fillers = filler_hash()
+    plan = make_plan(lines, stats["base_lines"], max_files)
+    mtime = os.stat(source).st_mtime_ns
+
+    while True:
+        time.sleep(interval)
+        try:
+            m = os.stat(source).st_mtime_ns
+        except OSError:
+            continue    # mid-save (editors that write a new file and rename it)
+        if m == mtime:
+            continue
+        mtime = m
+        start = time.perf_counter()
+        try:
+            ns = runpy.run_path(source, run_name="fpsgen_watch")
+        except Exception as e:
+            print(f"Not reloaded ({type(e).__name__}: {e}); fix the script and save again.")
+            continue
+
+        new_files = ns["BASE_FILES"]
+        changed = [rel for rel, content in new_files.items() if hashes.get(rel) != template_hash(content)]
+        removed = [rel for rel in BASE_FILES if rel not in new_files]
+        delta = sum(template_lines(new_files[rel]) - (template_lines(BASE_FILES[rel]) if rel in BASE_FILES else 0)
+                    for rel in changed if rel.endswith(COUNTED_EXTS))
+        delta -= sum(template_lines(BASE_FILES[rel]) for rel in removed if rel.endswith(COUNTED_EXTS))
+        folders = assembly_folders()
+        BASE_FILES = new_files
+        FILLER_TEMPLATE, FILLER_COMMENT, FILLER_COMMENT_COUNT = (
+            ns["FILLER_TEMPLATE"], ns["FILLER_COMMENT"], ns["FILLER_COMMENT_COUNT"])
+        filler_changed = filler_hash() != fillers
+
+        for rel in changed:
+            write_file(backend, rel, BASE_FILES[rel])
+            hashes[rel] = template_hash(BASE_FILES[rel])
+        for rel in removed:
+            backend.remove(rel)
+            del hashes[rel]
+        if assembly_folders() != folders:
+            write_assembly_definitions(backend)
+            write_compiler_defines(backend, instrument)
+
+        updated = len(changed) + len(removed)
+        if delta or filler_changed:
+            old_files = plan["files"]
+            plan = make_plan(lines, plan["base_lines"] + delta, max_files)
+            first = 1 if filler_changed else old_files + 1
+            write_fillers(backend, first, plan["files"])
+            finish_fillers(backend, plan)
+            updated += max(0, plan["files"] - first + 1) + max(0, old_files - plan["files"])
+            fillers = filler_hash()
+        backend.close()
+
+        if updated:
+            names = ", ".join(changed[:3] + ["-" + r for r in removed[:3]]) + (" ..." if len(changed) + len(removed) > 3 else "")
+            print(f"{time.strftime('%H:%M:%S')} updated {updated} file(s) in {(time.perf_counter() - start) * 1000:.1f} ms"
+                  + (f": {names}" if names else "") + (f"; {plan['files']} fillers" if delta or filler_changed else ""))
+
+def parse_shard(text: str):
+    try:
+        shard, shards = (int(v) for v in text.split("/"))
+    except ValueError:
+        raise SystemExit("--shard expects I/N, e.g. 2/8")
+    if not 1 <= shard <= shards:
+        raise SystemExit("--shard %s: I must be between 1 and N" % text)
+    return shard, shards
 
-    total = count_lines_in_dir(target_root)
-    print(f"Done. Total lines across project: ~{total}. Target was {args.lines}.")
+def main():
+    ap = argparse.ArgumentParser(description="Generate a full Unity FPS project and reach a target line count.")
+    ap.add_argument("--target", type=str, default=".")
+    ap.add_argument("--lines", type=int, default=25000, help="Total desired project line count across code/text files.")
+    ap.add_argument("--instrument", action="store_true",
+                    help="Compile in frame-time instrumentation (PerfLog, FPS_PERF define in the csc.rsp files).")
+    ap.add_argument("--max-files", type=int, default=3000, help="Cap on generated filler files (0 = no cap).")
+    ap.add_argument("--variant", choices=sorted(VARIANTS), default="full",
+                    help="full, or lite (the Version5 set: no AI, HUD or bundled level/weapon configs).")
+    ap.add_argument("--fan-out", nargs="+", default=None, metavar="VARIANT:DIR:LINES",
+                    help="Generate several projects in one pass, sharing rendered files and hard-linking identical "
+                         "generated code between them (e.g. full:out/full:25000 lite:out/lite:10000).")
+    ap.add_argument("--shard", type=str, default=None, metavar="I/N",
+                    help="Write only this worker's share (1-based) of the filler files; run --merge on the combined tree.")
+    ap.add_argument("--merge", action="store_true",
+                    help="Combine the shard manifests under --target into the final manifest (no generation).")
+    ap.add_argument("--fsync", choices=FSYNC_MODES, default="none",
+                    help="Durability of the (always atomic) writes: none, batch (one sync at the end) or each file.")
+    ap.add_argument("--git-branch", type=str, default=None, metavar="BRANCH",
+                    help="Commit the output to BRANCH of the git repository at --target via git fast-import instead of "
+                         "writing files (the working tree and index are left as they are).")
+    ap.add_argument("--git-message", type=str, default=None, help="Commit message for --git-branch.")
+    ap.add_argument("--archive", type=str, default=None, metavar="ZIP",
+                    help="Write the project into this zip archive instead of --target.")
+    ap.add_argument("--verify", action="store_true",
+                    help="Check --target against what this run would generate (missing, extra, modified files); writes nothing.")
+    ap.add_argument("--watch", action="store_true",
+                    help="Stay resident and rewrite only the outputs whose template changed whenever this script is saved.")
+    args = ap.parse_args()
+    if args.git_branch and (args.shard or args.merge):
+        ap.error("--git-branch cannot be combined with --shard or --merge")
+    if args.watch and (args.shard or args.merge or args.git_branch or args.archive):
+        ap.error("--watch writes to --target only (no --shard, --merge, --git-branch or --archive)")
+    if args.verify and (args.watch or args.shard or args.merge or args.git_branch or args.archive):
+        ap.error("--verify only reads --target")
+    if args.fan_out and (args.verify or args.watch or args.shard or args.merge or args.git_branch or args.archive):
+        ap.error("--fan-out writes its own folders (no --verify, --watch, --shard, --merge, --git-branch or --archive)")
+    if args.watch and args.variant != "full":
+        ap.error("--watch generates the full variant only")
+
+    if args.fan_out:
+        r = fan_out([parse_variant_spec(spec) for spec in args.fan_out], args.instrument, args.max_files, args.fsync)
+        for run in r["runs"]:
+            print(f"{run['variant']:>5} {run['root']}: ~{run['total_lines']} lines, {run['files_written']} files "
+                  f"({run['linked']} hard-linked)")
+        print(f"Done in {r['seconds']:.2f} s: {r['files_written']} files, {r['bytes_written'] / 1e6:.1f} MB written, "
+              f"{r['linked']} linked.")
+        return
+
+    target_root = os.path.abspath(args.target)
+    if args.verify:
+        r = verify(target_root, args.lines, args.instrument, args.max_files, variant=args.variant)
+        print(f"Checked {r['checked']} files in {r['seconds'] * 1000:.0f} ms.")
+        for label, items in (("missing", r["missing"]), ("extra", r["extra"]), ("modified", r["modified"])):
+            if items:
+                print(f"{label} ({len(items)}):")
+                for rel in items[:20]:
+                    print("  " + rel)
+                if len(items) > 20:
+                    print(f"  ... and {len(items) - 20} more")
+        for rel, got, want in r["line_mismatch"][:20]:
+            print(f"  lines differ: {rel} has {got}, expected {want}")
+        print("Tree matches the generator." if r["ok"] else "Tree differs from the generator.")
+        sys.exit(0 if r["ok"] else 1)
+    if args.archive:
+        backend = ArchiveBackend(args.archive)
+    elif args.git_branch:
+        backend = GitBackend(target_root, args.git_branch,
+                             args.git_message or f"build: generate Unity FPS project to {args.lines} lines")
+    else:
+        backend = DiskBackend(target_root, args.fsync)
+
+    if args.merge:
+        stats = merge(target_root, backend)
+        print(f"Merged. Total lines across project: ~{stats['total_lines']}.")
+        return
+
+    if args.watch:
+        try:
+            watch(target_root, args.lines, backend, args.instrument, args.max_files)
+        except KeyboardInterrupt:
+            print("Stopped.")
+        return
+
+    shard, shards = parse_shard(args.shard) if args.shard else (1, 1)
+    stats = generate(target_root, args.lines, backend, args.instrument, args.max_files, (shard, shards), args.variant)
+
+    if shards > 1:
+        first, last = stats["first"], stats["last"]
+        print(f"Shard {shard}/{shards}: wrote {filler_name(first)}..{filler_name(last)} ({last - first + 1} of {stats['files']} fillers).")
+        print(f"Copy every shard's {GENERATED_DIR} and {MANIFEST_DIR} into one tree, then run --merge there.")
+        return
+    if "commit" in stats:
+        print(f"{'Committed' if stats['changed'] else 'No changes; kept'} {stats['commit'][:12]} on {stats['branch']}.")
+    if "archive" in stats:
+        print("Wrote", stats["archive"])
+    print(f"Done. Total lines across project: ~{stats['total_lines']}. Target was {args.lines}.")
     print("Open the Unity project and press Play (empty scene is fine).")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()